@@ -1,5 +1,5 @@
 // 复制功能
-document.querySelectorAll('.copy-btn').forEach(btn => {
+function bindCopyButton(btn) {
     btn.addEventListener('click', async () => {
         const url = btn.dataset.url;
         const textEl = btn.querySelector('.copy-btn-text');
@@ -47,7 +47,9 @@ document.querySelectorAll('.copy-btn').forEach(btn => {
             }, 3000);
         }
     });
-});
+}
+
+document.querySelectorAll('.copy-btn').forEach(bindCopyButton);
 
 // Toast 提示
 function showToast(message) {
@@ -59,3 +61,53 @@ function showToast(message) {
         toast.classList.remove('show');
     }, 2000);
 }
+
+// 分包书源：读取分包清单，列出各分级分包
+const BUNDLE_BASE = 'https://cdn.jsdelivr.net/gh/tickmao/Novel@master/sources/legado/bundles/';
+const GRADE_ORDER = ['精选', '标准', '备用'];
+
+async function loadBundles() {
+    const section = document.getElementById('bundles');
+    if (!section) return;
+
+    let manifest;
+    try {
+        const response = await fetch(BUNDLE_BASE + 'manifest.json');
+        if (!response.ok) return;
+        manifest = await response.json();
+    } catch (err) {
+        return;
+    }
+
+    const grades = (manifest.bundles && manifest.bundles.grade) || {};
+    const names = Object.keys(grades).sort((a, b) => GRADE_ORDER.indexOf(a) - GRADE_ORDER.indexOf(b));
+    if (!names.length) return;
+
+    const body = section.querySelector('.section-body');
+    names.forEach(name => {
+        const entry = grades[name];
+        const item = document.createElement('div');
+        item.className = 'source-item';
+        item.innerHTML = `
+            <div class="source-info">
+                <div class="source-title-row">
+                    <span class="source-name"></span>
+                </div>
+                <span class="source-count"></span>
+            </div>
+            <button class="copy-btn">
+                <span class="copy-btn-text">复制</span>
+                <span class="copy-btn-icon">+</span>
+            </button>`;
+        item.querySelector('.source-name').textContent = `${name}书源`;
+        item.querySelector('.source-count').textContent =
+            `${entry.count} 个书源 · ${Math.ceil(entry.bytes / 1024)} KB`;
+        const btn = item.querySelector('.copy-btn');
+        btn.dataset.url = BUNDLE_BASE + entry.path.split('/').map(encodeURIComponent).join('/');
+        bindCopyButton(btn);
+        body.appendChild(item);
+    });
+    section.hidden = false;
+}
+
+loadBundles();
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+书源名称规范化基准与黄金输出校验
+- 输入：书源文件中的名称与分组，加上按固定种子生成的带装饰变体
+  （表情、括号、全角/圆圈字符、署名、版本号、描述性后缀、多余空格等）
+- --check：与 data/clean_golden.json 中记录的输出逐条比对，任何差异都视为失败
+- --write-golden：按当前实现重新生成黄金输出（仅在有意修改清洗规则时使用）
+- 计时：冷缓存（每个名称首次出现）与热缓存（上游名称大量重复）下的每秒名称数
+"""
+
+import time
+import random
+import argparse
+from pathlib import Path
+
+import jsonio
+import clean
+
+BASE_DIR = Path(__file__).parent.parent
+CORPUS = [BASE_DIR / "sources/legado/full.json", BASE_DIR / "sources/legado/invalid.json"]
+GOLDEN_PATH = Path(__file__).parent / "data" / "clean_golden.json"
+
+# 生成变体的随机种子与每个名称的变体数
+SEED = 20240601
+VARIANTS = 6
+
+# 变体用的装饰
+PREFIXES = ["🔥", "⭐ ", "✨", "+ ", "#", "·", "源社区出品-", "【推荐】", "(新)", "📚 ", "〖精〗", "  "]
+SUFFIXES = [
+    "🎉", "（备用）", "【自用】", "[VIP]", "<v2>", "{作者}", " #张三", "#12", " 破冰", "_biquge.com",
+    "_a_b", "-李四", "b13", "01", "007", "精品", "备用", "自制", "..", "_", "-", "①", "⑫", "Ⅲ",
+    "²", "ＡＢＣ", "１２３", "～", "|", "★★", "❤️", "  ", " 2", "VIP", "无广告", "（精）3", "手机版",
+]
+GROUPS = list(clean.GROUP_MAPPING) + ["🔰 正版,🎉 精选", "  精选  ", "【精选】", "综合2", "💠综合①", ""]
+
+
+def corpus_names() -> tuple:
+    """书源文件中的名称与分组（去重，保持顺序）"""
+    names, groups = {}, {}
+    for path in CORPUS:
+        if not path.exists():
+            continue
+        data = jsonio.load(path)
+        sources = data["sources"] if isinstance(data, dict) else data
+        for s in sources:
+            names.setdefault(s.get("bookSourceName") or "", None)
+            groups.setdefault(s.get("bookSourceGroup") or "", None)
+    return list(names), list(groups)
+
+
+def golden_inputs() -> tuple:
+    """名称与分组输入：语料原文 + 带装饰的变体"""
+    names, groups = corpus_names()
+    rng = random.Random(SEED)
+    variants = []
+    for name in names:
+        for _ in range(VARIANTS):
+            text = name
+            for _ in range(rng.randint(1, 3)):
+                if rng.random() < 0.3:
+                    text = rng.choice(PREFIXES) + text
+                else:
+                    text = text + rng.choice(SUFFIXES)
+            variants.append(text)
+    group_variants = [rng.choice(PREFIXES) + g + rng.choice(SUFFIXES) for g in groups + GROUPS]
+    return (list(dict.fromkeys(names + variants)),
+            list(dict.fromkeys(groups + GROUPS + group_variants)))
+
+
+def outputs(names: list, groups: list) -> dict:
+    return {
+        "names": [[n, clean.normalize_name(n)] for n in names],
+        "groups": [[g, clean.normalize_group(g)] for g in groups],
+    }
+
+
+def check(golden: dict) -> int:
+    """逐条比对黄金输出，返回不一致的数量"""
+    result = outputs([n for n, _ in golden["names"]], [g for g, _ in golden["groups"]])
+    failures = 0
+    for kind in ("names", "groups"):
+        for (raw, expected), (_, actual) in zip(golden[kind], result[kind]):
+            if expected != actual:
+                failures += 1
+                if failures <= 20:
+                    print(f"  不一致 {raw!r}: 期望 {expected!r}，实际 {actual!r}")
+    return failures
+
+
+def clear_caches():
+    clean.normalize_name.cache_clear()
+    clean.normalize_group.cache_clear()
+
+
+def run(names: list, repeat: int) -> dict:
+    """冷缓存：每个名称处理一次；热缓存：名称列表重复 repeat 次（模拟上游大量重复）"""
+    clear_caches()
+    start = time.perf_counter()
+    for n in names:
+        clean.normalize_name(n)
+    cold = time.perf_counter() - start
+
+    workload = names * repeat
+    clear_caches()
+    start = time.perf_counter()
+    for n in workload:
+        clean.normalize_name(n)
+    warm = time.perf_counter() - start
+
+    return {
+        "names": len(names),
+        "repeat": repeat,
+        "cold_seconds": round(cold, 4),
+        "cold_names_per_second": round(len(names) / cold) if cold else 0,
+        "warm_seconds": round(warm, 4),
+        "warm_names_per_second": round(len(workload) / warm) if warm else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源名称规范化基准与黄金输出校验")
+    parser.add_argument("--check", action="store_true", help="与黄金输出逐条比对（不一致时返回 1）")
+    parser.add_argument("--write-golden", action="store_true", help="按当前实现重新生成黄金输出")
+    parser.add_argument("--repeat", "-n", type=int, default=20, help="热缓存测试的重复次数，默认 20")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    if args.write_golden:
+        names, groups = golden_inputs()
+        jsonio.dump(outputs(names, groups), GOLDEN_PATH)
+        print(f"黄金输出：{len(names)} 个名称，{len(groups)} 个分组 -> {GOLDEN_PATH}")
+        return 0
+
+    golden = jsonio.load(GOLDEN_PATH)
+    names = [n for n, _ in golden["names"]]
+
+    if args.check:
+        failures = check(golden)
+        total = len(golden["names"]) + len(golden["groups"])
+        if failures:
+            print(f"校验失败：{failures}/{total} 条输出与黄金输出不一致")
+            return 1
+        print(f"校验通过：{total} 条输出与黄金输出一致")
+
+    result = run(names, args.repeat)
+    print(f"名称：{result['names']} 个")
+    print(f"冷缓存：{result['cold_seconds'] * 1000:.1f} ms，{result['cold_names_per_second']} 个/秒")
+    print(f"热缓存（×{result['repeat']}）：{result['warm_seconds'] * 1000:.1f} ms，"
+          f"{result['warm_names_per_second']} 个/秒")
+
+    if args.output:
+        jsonio.dump(result, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
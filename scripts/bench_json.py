@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+JSON 读写基准
+- 对每个可用后端（orjson / 标准库 json）分别计时：逐个读取、并发读取、美化输出、紧凑输出
+- 输入为一个或多个书源文件，--copies 可把同一文件重复多份模拟多文件合并
+- 检查各后端解析结果一致、输出与标准库逐字节相同；另用 EDGE_CASES（超出 64 位的整数等）检查解析一致，
+  并报告哪些输入因疑似超长整数回退到标准库（字符串里的长数字串不应回退）
+"""
+
+import time
+import argparse
+from pathlib import Path
+
+import jsonio
+
+# 书源文件中不常见、但后端容易解析出不同结果的输入
+EDGE_CASES = [
+    b'[{"x":12345678901234567890123}]',
+    b'[{"x":-98765432109876543210}]',
+    b'{"x":18446744073709551615,"y":"12345678901234567890"}',
+    '{"名称":"书源","x":123456789012345678901}',
+    b'[-9223372036854775809]',
+    b'{"x": [1, -9999999999999999999]}',
+    b'12345678901234567890',
+]
+
+# 字符串里的长数字串不应让解析回退到标准库
+STRING_DIGITS = b'[{"deviceId":"17044012506934011344","x":1}]'
+
+
+def timed(func, repeat: int) -> tuple:
+    """重复执行，返回 (最短耗时秒数, 最后一次的结果)"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(paths: list, repeat: int) -> dict:
+    size = sum(p.stat().st_size for p in paths)
+    reference = [jsonio.load(p, "json") for p in paths]
+    expected = {compact: [jsonio.dumps(d, compact, "json") for d in reference] for compact in (False, True)}
+
+    backends = {}
+    for backend in jsonio.BACKENDS:
+        load_seconds, data = timed(lambda: [jsonio.load(p, backend) for p in paths], repeat)
+        load_many_seconds, _ = timed(lambda: jsonio.load_many(paths, backend), repeat)
+        pretty_seconds, pretty = timed(lambda: [jsonio.dumps(d, False, backend) for d in data], repeat)
+        compact_seconds, compact = timed(lambda: [jsonio.dumps(d, True, backend) for d in data], repeat)
+        backends[backend] = {
+            "load_seconds": round(load_seconds, 4),
+            "load_many_seconds": round(load_many_seconds, 4),
+            "load_mb_per_second": round(size / 1e6 / load_seconds, 1) if load_seconds else 0,
+            "dump_pretty_seconds": round(pretty_seconds, 4),
+            "dump_compact_seconds": round(compact_seconds, 4),
+            "pretty_bytes": sum(map(len, pretty)),
+            "compact_bytes": sum(map(len, compact)),
+            "same_data": data == reference and all(
+                jsonio.loads(case, backend) == jsonio.loads(case, "json") for case in EDGE_CASES),
+            "same_output": pretty == expected[False] and compact == expected[True],
+        }
+
+    return {
+        "files": len(paths),
+        "bytes": size,
+        "repeat": repeat,
+        "default": jsonio.BACKEND,
+        "fallback": {
+            "inputs": sum(jsonio.needs_stdlib(p.read_bytes()) for p in set(paths)),
+            "string_digits": jsonio.needs_stdlib(STRING_DIGITS),
+            "edge_cases": all(map(jsonio.needs_stdlib, EDGE_CASES)),
+        },
+        "backends": backends,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 读写基准")
+    parser.add_argument("--inputs", "-i", nargs="+",
+                        default=[str(Path(__file__).parent.parent / "sources/legado/full.json")],
+                        help="书源文件路径（可多个）")
+    parser.add_argument("--copies", "-c", type=int, default=1, help="每个输入文件重复的份数，默认 1")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="重复次数（取最短耗时），默认 3")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    paths = [Path(p) for p in args.inputs for _ in range(args.copies)]
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        print(f"错误：输入文件不存在 {missing[0]}")
+        return 1
+
+    result = run(paths, args.repeat)
+
+    print(f"输入：{result['files']} 个文件，{result['bytes'] / 1e6:.1f} MB，默认后端 {result['default']}")
+    fallback = result["fallback"]
+    print(f"回退到标准库：输入 {fallback['inputs']} 个文件，"
+          f"字符串中的长数字 {'是' if fallback['string_digits'] else '否'}，"
+          f"超长整数用例 {'全部' if fallback['edge_cases'] else '并非全部'}")
+    for backend, stats in result["backends"].items():
+        print(f"\n[{backend}]")
+        print(f"  逐个读取：{stats['load_seconds'] * 1000:.1f} ms（{stats['load_mb_per_second']} MB/s）")
+        print(f"  并发读取：{stats['load_many_seconds'] * 1000:.1f} ms")
+        print(f"  美化输出：{stats['dump_pretty_seconds'] * 1000:.1f} ms，{stats['pretty_bytes'] / 1e6:.1f} MB")
+        print(f"  紧凑输出：{stats['dump_compact_seconds'] * 1000:.1f} ms，{stats['compact_bytes'] / 1e6:.1f} MB")
+        print(f"  与标准库一致：解析 {'是' if stats['same_data'] else '否'}，输出 {'是' if stats['same_output'] else '否'}")
+
+    if args.output:
+        jsonio.dump(result, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+替换净化规则吞吐基准
+- 语料：目录下的 .txt 文本（按章节标题拆分，见 purify.split_chapters）；未指定时按固定种子生成示例章节
+  （对话、各类标点、全角字符、网页残留、作者的话、反义替换用字等，覆盖各条规则的匹配分支）
+- 三种方式分别执行：完整引擎（前缀树 + 预过滤）、不用前缀树、两者都不用，输出 MB/s（按 UTF-8 字节）
+- 三种方式的输出必须完全相同，否则返回 1
+- 给出设置了预过滤的规则数与跳过的章节数；预过滤没有跳过任何章节时明确提示
+- 列出每条规则的耗时、吞吐、跳过与改动的章节数，以及不支持的规则
+"""
+
+import time
+import random
+import argparse
+from pathlib import Path
+
+import jsonio
+import purify
+
+# 示例章节的随机种子、数量与每章段落数
+SEED = 20240601
+SAMPLE_CHAPTERS = 300
+PARAGRAPHS = (20, 60)
+
+# 示例段落的组成
+NAMES = ["林凡", "苏清雪", "老者", "王胖子", "叶青"]
+VERBS = ["说道", "问道", "笑道", "冷哼一声", "沉声道"]
+SENTENCES = [
+    "他抬头看了一眼天色，心中暗自盘算着接下来的路该怎么走",
+    "山门前后站满了人，里里外外围得水泄不通",
+    "这件事是要从三年前说起的，那时候他还是个少年",
+    "大殿之上，众人是解其意，纷纷看向上首的宗主",
+    "一道剑光从天而降，直直落在广场中央",
+    "少说也有上千人，多半是来看热闹的",
+    "他是必要走这一趟的，哪怕前路凶险",
+    "夜色渐深，远处传来几声犬吠",
+    "Ｌｉｎ　Ｆａｎ握紧了手中的剑，剑身上刻着１２３４几个数字",
+    "天地间灵气涌动...他的修为又精进了一分",
+    "——这是他第一次感到恐惧",
+    "这柄剑是是是他父亲留下的遗物",
+]
+NOISE = [
+    "&nbsp;&nbsp;&nbsp;&nbsp;", "<br/>", "<br>", "​", "～～～", "!!", "??", "。。", "，，", "...",
+    "『精彩小说』", "＊＊", "ꁘ", "()", "“”", "：：",
+]
+TAILS = [
+    "（本章完）",
+    "PS：今天还有一更，求月票求推荐！",
+    "作者有话说：感谢各位书友的打赏，本章加更。",
+    "请记住本书首发域名：www.example.com。手机版阅读网址：m.example.com",
+]
+
+
+def sample_chapters(count: int, seed: int = SEED) -> list:
+    """按固定种子生成示例章节 [(标题, 正文), ...]"""
+    rng = random.Random(seed)
+    chapters = []
+    for n in range(1, count + 1):
+        paragraphs = []
+        for _ in range(rng.randint(*PARAGRAPHS)):
+            sentence = rng.choice(SENTENCES)
+            if rng.random() < 0.4:
+                quote = rng.choice(["“{}”", "‘{}’", "\"{}\"", "「{}」"]).format(rng.choice(SENTENCES) + rng.choice(["。", "！", "？", "……"]))
+                sentence = f"{rng.choice(NAMES)}{rng.choice(VERBS)}：{quote}"
+            else:
+                sentence += rng.choice(["。", "，", "！", "……", "——", "~"])
+            if rng.random() < 0.15:
+                noise = rng.choice(NOISE)
+                cut = rng.randrange(len(sentence))
+                sentence = sentence[:cut] + noise + sentence[cut:]
+            paragraphs.append("　　" + sentence)
+        if rng.random() < 0.5:
+            paragraphs.append(rng.choice(TAILS))
+        chapters.append((f"第{n}章 {rng.choice(SENTENCES)[:6]}", "\n".join(paragraphs)))
+    return chapters
+
+
+def load_corpus(corpus_dir: str) -> list:
+    """读取目录下的 .txt 文本并拆分章节"""
+    chapters = []
+    for path in sorted(Path(corpus_dir).glob("*.txt")):
+        chapters.extend(purify.split_chapters(path.read_text(encoding="utf-8", errors="replace")))
+    return chapters
+
+
+def timed_run(raw_rules: list, chapters: list, repeat: int, **options) -> tuple:
+    """多次执行取最短耗时，返回 (耗时, 输出, 最后一次的引擎)"""
+    best = float("inf")
+    for _ in range(repeat):
+        engine = purify.Engine(raw_rules, **options)
+        start = time.perf_counter()
+        output = engine.apply_chapters(chapters)
+        best = min(best, time.perf_counter() - start)
+    return best, output, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="替换净化规则吞吐基准")
+    parser.add_argument("--rules", "-r", nargs="+", help="替换规则文件，默认 purify.json 与 antonym.json")
+    parser.add_argument("--corpus", "-c", help="txt 文本目录（默认使用生成的示例章节）")
+    parser.add_argument("--chapters", type=int, default=SAMPLE_CHAPTERS, help=f"示例章节数，默认 {SAMPLE_CHAPTERS}")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="重复次数（取最短耗时），默认 3")
+    parser.add_argument("--top", type=int, default=10, help="列出耗时最多的规则数，默认 10")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    try:
+        raw_rules = purify.load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法读取规则 {e}")
+        return 1
+
+    chapters = load_corpus(args.corpus) if args.corpus else sample_chapters(args.chapters)
+    if not chapters:
+        print(f"错误：目录中没有 txt 文本 {args.corpus}")
+        return 1
+    size = sum(len(t.encode("utf-8")) + len(c.encode("utf-8")) for t, c in chapters)
+    mb = size / (1 << 20)
+
+    print(f"正则后端：{purify.BACKEND}")
+    print(f"语料：{len(chapters)} 章，{mb:.2f} MB")
+
+    modes = {
+        "full": {},
+        "no_trie": {"use_trie": False},
+        "plain": {"use_trie": False, "use_prefilter": False},
+    }
+    results = {}
+    outputs = {}
+    engine = None
+    for mode, options in modes.items():
+        seconds, outputs[mode], last = timed_run(raw_rules, chapters, args.repeat, **options)
+        engine = engine or last
+        results[mode] = {"seconds": round(seconds, 4), "mb_per_second": round(mb / seconds, 2) if seconds else 0}
+        print(f"  {mode:<8} {seconds:>8.3f} s  {results[mode]['mb_per_second']:>8.2f} MB/s")
+
+    mismatched = [mode for mode in modes if outputs[mode] != outputs["full"]]
+
+    # 预过滤的效果取自完整引擎的最后一次执行
+    filtered = [r for r in engine.rules if r.prefilter is not None]
+    prefilter = {"rules": len(filtered), "skipped": sum(r.skipped for r in filtered)}
+    print(f"\n预过滤：{prefilter['rules']} 条规则，跳过 {prefilter['skipped']} 章次")
+    if not prefilter["skipped"]:
+        print("  预过滤没有跳过任何章节，full 与 plain 的差异不来自预过滤")
+
+    unsupported = engine.unsupported()
+    print(f"\n规则：启用 {len(engine.rules)} 条，不支持 {len(unsupported)} 条")
+    for r, error in unsupported:
+        print(f"  {r.name}：{str(error).splitlines()[0]}")
+
+    # 每条规则的统计取自完整引擎的最后一次执行
+    stats = [s for s in engine.stats() if s["error"] is None and s["chapters"]]
+    stats.sort(key=lambda s: -s["seconds"])
+    print(f"\n耗时最多的规则（完整引擎）：")
+    for s in stats[:args.top]:
+        speed = mb / s["seconds"] if s["seconds"] else float("inf")
+        print(f"  {s['name'][:20]:<20} {s['kind']:<5} {s['seconds'] * 1000:>9.1f} ms {speed:>9.1f} MB/s"
+              f"  跳过 {s['skipped']}/{s['chapters']} 章，改动 {s['changed']} 章")
+
+    if args.output:
+        jsonio.dump({
+            "backend": purify.BACKEND,
+            "chapters": len(chapters),
+            "bytes": size,
+            "repeat": args.repeat,
+            "modes": results,
+            "prefilter": prefilter,
+            "mismatched": mismatched,
+            "unsupported": [{"name": r.name, "error": str(e)} for r, e in unsupported],
+            "rules": stats,
+        }, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    if mismatched:
+        print(f"\n错误：{', '.join(mismatched)} 的输出与完整引擎不同")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
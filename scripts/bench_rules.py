@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+规则引擎吞吐基准
+- 收集所有书源的 ruleSearch/ruleBookInfo/ruleToc/ruleContent/ruleExplore 规则
+- 统计规则去重（语法树共享）与编译耗时
+- 在保存的 HTML 页面上执行全部规则，输出每秒规则数
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+
+import rule
+
+# 参与基准的规则分组
+RULE_SECTIONS = ("ruleSearch", "ruleBookInfo", "ruleToc", "ruleContent", "ruleExplore")
+
+# 返回元素列表的字段（其余字段取字符串）
+LIST_FIELDS = ("bookList", "chapterList")
+
+# 未提供页面目录时使用的示例页面
+SAMPLE_PAGE = """<html><head><meta property="og:novel:author" content="作者"></head><body>
+<ul class="list">""" + "".join(
+    f'<li class="clearfix"><div class="title"><a href="/book/{i}">书名{i}</a></div>'
+    f'<div class="tips"><span>大小：{i}</span><span>时间：2024</span></div>'
+    f'<p class="descript"><a>简介{i}</a></p><img src="/cover/{i}.jpg"></li>'
+    for i in range(30)
+) + """</ul><div class="catalog"><ul>""" + "".join(
+    f'<li><a href="/c/{i}.html">第{i}章</a></li>' for i in range(200)
+) + """</ul></div><div id="content" class="content">""" + "<p>正文段落</p>" * 50 + """</div>
+<a href="/next">下一页</a></body></html>"""
+
+
+def collect_rules(sources: list) -> list:
+    """收集 (规则, 是否列表规则) 列表（未去重）"""
+    rules = []
+    for s in sources:
+        for section in RULE_SECTIONS:
+            block = s.get(section)
+            if not isinstance(block, dict):
+                continue
+            for field, value in block.items():
+                if isinstance(value, str) and value.strip():
+                    rules.append((value, field in LIST_FIELDS))
+    return rules
+
+
+def load_pages(pages_dir: str) -> list:
+    """读取目录下的 .html/.htm 页面"""
+    if not pages_dir:
+        return [("sample", SAMPLE_PAGE)]
+    pages = []
+    for path in sorted(Path(pages_dir).glob("*.htm*")):
+        pages.append((path.name, path.read_text(encoding="utf-8", errors="replace")))
+    return pages
+
+
+def evaluate(compiled, content) -> int:
+    """执行单条规则，返回结果数量（运行期不支持视为 0）"""
+    try:
+        if compiled[1]:
+            return len(compiled[0].elements(content))
+        return len(compiled[0].strings(content))
+    except (rule.RuleError, rule.Unverifiable):
+        return 0
+
+
+def run(sources: list, pages: list, repeat: int, no_cache: bool) -> dict:
+    raw_rules = collect_rules(sources)
+
+    start = time.perf_counter()
+    compiled = [(rule.compile_rule(r, not is_list), is_list) for r, is_list in raw_rules]
+    compile_seconds = time.perf_counter() - start
+    info = rule.cache_info()
+
+    runnable = [c for c in compiled if c[0].error is None]
+    js = sum(1 for c, _ in compiled if isinstance(c.error, rule.Unverifiable))
+    unsupported = sum(1 for c, _ in compiled if isinstance(c.error, rule.RuleError))
+
+    docs = [(name, rule.parse_document(text)) for name, text in pages]
+
+    evaluations = 0
+    matches = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, doc in docs:
+            for c in runnable:
+                if no_cache:
+                    c = (rule.CompiledRule(c[0].source, not c[1]), c[1])
+                matches += evaluate(c, doc)
+                evaluations += 1
+    eval_seconds = time.perf_counter() - start
+
+    return {
+        "sources": len(sources),
+        "rules": len(raw_rules),
+        "unique_rules": info.currsize,
+        "runnable": len(runnable),
+        "js": js,
+        "unsupported": unsupported,
+        "compile_seconds": round(compile_seconds, 4),
+        "pages": len(docs),
+        "repeat": repeat,
+        "no_cache": no_cache,
+        "evaluations": evaluations,
+        "matches": matches,
+        "eval_seconds": round(eval_seconds, 4),
+        "rules_per_second": round(evaluations / eval_seconds) if eval_seconds else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则引擎吞吐基准")
+    parser.add_argument("--input", "-i", default=str(Path(__file__).parent.parent / "sources/legado/full.json"),
+                        help="书源文件路径")
+    parser.add_argument("--pages", "-p", help="保存的 HTML 页面目录（默认使用内置示例页面）")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="重复次数，默认 3")
+    parser.add_argument("--no-cache", action="store_true", help="每次执行都重新解析规则（对照组）")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        sources = json.load(f)
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"错误：目录中没有 HTML 页面 {args.pages}")
+        return 1
+
+    result = run(sources, pages, args.repeat, args.no_cache)
+
+    print(f"书源：{result['sources']} 个")
+    print(f"规则：{result['rules']} 条，去重后 {result['unique_rules']} 个语法树")
+    print(f"  可执行：{result['runnable']}，含 JS：{result['js']}，不支持：{result['unsupported']}")
+    print(f"编译耗时：{result['compile_seconds'] * 1000:.1f} ms")
+    print(f"页面：{result['pages']} 个 × {result['repeat']} 次")
+    print(f"执行：{result['evaluations']} 次，耗时 {result['eval_seconds']:.2f} s")
+    print(f"吞吐：{result['rules_per_second']} 条/秒{'（不使用缓存）' if args.no_cache else ''}")
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果输出到：{output_path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
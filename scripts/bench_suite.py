@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+构建脚本基准套件
+- 在不同规模的合成语料（见 corpus.py，默认 1k / 10k / 100k，--sizes 可到 1M）上分别计时：
+  strip_decorations、score_sources（整批评分，取代逐个的 calculate_quality_score）、smart_dedupe、
+  smart_merge、filter_novel_sources、JSON 序列化（紧凑 / 美化）与解析
+- 每项取 repeat 次中的最短耗时，记录每个书源的微秒数，以及相邻规模之间的增长指数（1 为线性）
+- 结果写出 JSON；与基线（data/bench_baseline.json）比较每个书源的耗时，超过阈值视为退化并返回 1
+- 同一进程内先跑一段固定的参考负载，比较时用两次参考耗时之比折算机器快慢；基线记录 Python 版本、
+  JSON 后端与机器（系统、架构、CPU 型号与核数），Python 主次版本（如 3.11）或 JSON 后端不同时拒绝比较，
+  机器或 Python 补丁版本不同时提示；提交的基线使用标准库 json（requirements.txt 不含 orjson）
+  （折算只能抵消整体快慢，换机器后最好用 --save-baseline 重新生成）
+- JSON 只在不超过 --json-max 的规模上测（百万级语料美化输出约 7 GB）
+"""
+
+import io
+import os
+import re
+import math
+import random
+import time
+import argparse
+import platform
+from pathlib import Path
+from contextlib import redirect_stdout
+
+import jsonio
+import corpus
+from clean import strip_decorations
+from scoring import score_sources
+from filter import filter_novel_sources
+from merge import smart_merge
+from integrate import smart_dedupe
+from domains import SourceIndex, public_suffix_list
+
+# 默认规模与基线
+DEFAULT_SIZES = [1000, 10000, 100000]
+BASELINE_PATH = Path(__file__).parent / "data" / "bench_baseline.json"
+
+# 默认退化阈值（每个书源的耗时增加超过该比例）
+DEFAULT_THRESHOLD = 0.25
+
+# 基线与当前耗时都低于该值（秒）时不比较，计时噪声太大
+MIN_SECONDS = 0.002
+
+# JSON 基准的最大规模
+JSON_MAX = 10000
+
+# 参考负载的规模与重复次数（纯 Python：排序、字典、正则与格式化，约几十毫秒）
+REFERENCE_ITEMS = 20000
+REFERENCE_REPEAT = 5
+
+# 必须与基线相同才能比较的环境字段（python 只比较主次版本）
+REQUIRED_ENV = ("python", "json_backend")
+
+
+def parse_sizes(value: str) -> list:
+    """规模列表：逗号分隔，支持 k / m 后缀（如 1k,10k,1m）"""
+    sizes = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        scale = {"k": 1000, "m": 1000000}.get(part[-1:], 1)
+        try:
+            sizes.append(int(part.rstrip("km")) * scale)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"规模格式不正确：{part}")
+    return sorted(set(sizes))
+
+
+def benchmarks(sources: list, psl, json_max: int) -> dict:
+    """各基准的待计时函数（准备工作不计时）"""
+    names = [s.get("bookSourceName", "") for s in sources]
+    half = len(sources) // 2
+    scores = score_sources(sources, now=corpus.NOW_MS).tolist()
+
+    def dedupe():
+        # 每次使用新的站点索引（主机信息不复用）
+        return smart_dedupe(sources, scores, SourceIndex(psl))
+
+    tasks = {
+        "strip_decorations": lambda: [strip_decorations(n) for n in names],
+        "score_sources": lambda: score_sources(sources, now=corpus.NOW_MS),
+        "filter_novel_sources": lambda: filter_novel_sources(sources),
+        "smart_merge": lambda: smart_merge(sources[:half], sources[half:]),
+        "smart_dedupe": dedupe,
+    }
+    if len(sources) <= json_max:
+        compact = jsonio.dumps(sources, compact=True)
+        tasks["json_dumps_compact"] = lambda: jsonio.dumps(sources, compact=True)
+        tasks["json_dumps_pretty"] = lambda: jsonio.dumps(sources)
+        tasks["json_loads"] = lambda: jsonio.loads(compact)
+    return tasks
+
+
+def timed(func, repeat: int) -> float:
+    """最短耗时（秒）；被测函数的输出不显示"""
+    best = float("inf")
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling(sizes: list, results: dict) -> dict:
+    """相邻规模之间的增长指数：log(耗时比) / log(规模比)，1 为线性，2 为平方"""
+    exponents = {}
+    for name, by_size in results.items():
+        measured = [n for n in sizes if str(n) in by_size]
+        exponents[name] = {
+            f"{a}->{b}": round(math.log(by_size[str(b)]["seconds"] / by_size[str(a)]["seconds"]) / math.log(b / a), 2)
+            for a, b in zip(measured, measured[1:])
+            if by_size[str(a)]["seconds"] > 0
+        }
+    return exponents
+
+
+def cpu_model() -> str:
+    """CPU 型号（Linux 读 /proc/cpuinfo，其他平台用 platform.processor()）"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or ""
+
+
+def machine() -> dict:
+    """机器信息"""
+    return {"system": platform.system(), "arch": platform.machine(), "cpu": cpu_model(), "cpus": os.cpu_count()}
+
+
+def reference_workload():
+    """参考负载：与被测代码相近的纯 Python 操作，不依赖 JSON 后端与语料"""
+    rng = random.Random(0)
+    words = ["".join(rng.choice("abcdefghij书源小说阅读") for _ in range(12)) for _ in range(REFERENCE_ITEMS)]
+    pattern = re.compile(r"[a-c]+书|读[d-f]")
+    counts = {}
+    for w in sorted(words):
+        key = pattern.sub("", w)[:4]
+        counts[key] = counts.get(key, 0) + len(f"{w}:{key}")
+    return counts
+
+
+def python_series(version) -> str:
+    """Python 主次版本（3.11.7 -> 3.11）"""
+    return ".".join(str(version).split(".")[:2])
+
+
+def environment_differences(current: dict, baseline: dict) -> tuple:
+    """
+    与基线的环境差异，返回 (必须相同的字段差异, 机器差异)，差异为 [(字段, 基线, 当前), ...]
+
+    Python 主次版本相同、补丁版本不同时计入机器差异
+    """
+    def required_value(env, key):
+        return python_series(env.get(key)) if key == "python" else env.get(key)
+
+    required = [(k, baseline.get(k), current.get(k)) for k in REQUIRED_ENV
+                if required_value(baseline, k) != required_value(current, k)]
+    base_machine = baseline.get("machine") or {}
+    machine_diff = [(k, base_machine.get(k), v) for k, v in current["machine"].items() if base_machine.get(k) != v]
+    if not any(k == "python" for k, _, _ in required) and baseline.get("python") != current.get("python"):
+        machine_diff.append(("python", baseline.get("python"), current.get("python")))
+    return required, machine_diff
+
+
+def run(sizes: list, repeat: int, seed: int, json_max: int) -> dict:
+    templates = corpus.load_templates()
+    psl = public_suffix_list()
+    generator = corpus.Generator(templates, seed)
+    sources = []
+    results = {}
+
+    reference = timed(reference_workload, REFERENCE_REPEAT)
+    print(f"参考负载：{reference * 1000:.1f} ms")
+
+    for size in sizes:
+        # 语料逐步扩充：小规模是大规模的前缀
+        sources.extend(generator.generate(size - len(sources)))
+        print(f"规模 {size}：", end="", flush=True)
+        for name, func in benchmarks(sources, psl, json_max).items():
+            seconds = timed(func, repeat)
+            results.setdefault(name, {})[str(size)] = {
+                "seconds": round(seconds, 5),
+                "us_per_item": round(seconds / size * 1e6, 3),
+            }
+            print(f" {name}", end="", flush=True)
+        print()
+
+    return {
+        "sizes": sizes,
+        "repeat": repeat,
+        "seed": seed,
+        "templates": len(templates),
+        "python": platform.python_version(),
+        "json_backend": jsonio.BACKEND,
+        "machine": machine(),
+        "reference_seconds": round(reference, 5),
+        "results": results,
+        "scaling": scaling(sizes, results),
+    }
+
+
+def speed_factor(current: dict, baseline: dict) -> float:
+    """当前机器相对基线的耗时倍数（参考负载耗时之比，基线没有参考负载时为 1）"""
+    base, now = baseline.get("reference_seconds"), current.get("reference_seconds")
+    return now / base if base and now else 1.0
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    与基线比较每个书源的耗时（基线耗时先按参考负载折算到当前机器）
+
+    返回: [(基准, 规模, 折算后的基线微秒, 当前微秒, 比值), ...]，只包含超过阈值的
+    """
+    factor = speed_factor(current, baseline)
+    regressions = []
+    for name, by_size in current["results"].items():
+        for size, result in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if base is None or max(base["seconds"], result["seconds"]) < MIN_SECONDS:
+                continue
+            expected = base["us_per_item"] * factor
+            ratio = result["us_per_item"] / expected if expected else float("inf")
+            if ratio > 1 + threshold:
+                regressions.append((name, size, round(expected, 3), result["us_per_item"], round(ratio, 2)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建脚本基准套件（合成语料，多规模）")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="语料规模，逗号分隔，支持 k/m 后缀，默认 1k,10k,100k")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="重复次数（取最短耗时），默认 3")
+    parser.add_argument("--seed", "-s", type=int, default=corpus.SEED, help=f"语料随机种子，默认 {corpus.SEED}")
+    parser.add_argument("--json-max", type=int, default=JSON_MAX, help=f"JSON 基准的最大规模，默认 {JSON_MAX}")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", "-b", default=str(BASELINE_PATH), help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--threshold", "-t", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"退化阈值（每个书源的耗时增加比例），默认 {DEFAULT_THRESHOLD}")
+    args = parser.parse_args()
+
+    result = run(args.sizes, args.repeat, args.seed, args.json_max)
+
+    print(f"\n{'基准':<22}" + "".join(f"{size:>12}" for size in args.sizes) + "   增长指数（微秒/书源）")
+    for name, by_size in result["results"].items():
+        cells = "".join(f"{by_size[str(n)]['us_per_item']:>12.3f}" if str(n) in by_size else f"{'-':>12}"
+                        for n in args.sizes)
+        exponents = " ".join(f"{e}" for e in result["scaling"][name].values())
+        print(f"{name:<22}{cells}   {exponents}")
+
+    if args.output:
+        jsonio.dump(result, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        jsonio.dump(result, baseline_path)
+        print(f"基线已保存：{baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\n基线不存在，跳过比较：{baseline_path}")
+        return 0
+
+    baseline = jsonio.load(baseline_path)
+    required, machine_diff = environment_differences(result, baseline)
+    if required:
+        print(f"\n错误：基线的运行环境不同，无法比较（用 --save-baseline 在当前环境重新生成）")
+        for key, base, current in required:
+            print(f"  {key}：基线 {base}，当前 {current}")
+        return 1
+    if machine_diff:
+        print(f"\n提示：基线记录于不同的机器，按参考负载折算（仅供参考）")
+        for key, base, current in machine_diff:
+            print(f"  {key}：基线 {base}，当前 {current}")
+    factor = speed_factor(result, baseline)
+    print(f"\n参考负载：基线 {baseline.get('reference_seconds', '-')} s，当前 {result['reference_seconds']} s（折算 ×{factor:.2f}）")
+
+    regressions = compare(result, baseline, args.threshold)
+    if not regressions:
+        print(f"\n与基线比较：没有超过 {args.threshold:.0%} 的退化")
+        return 0
+    print(f"\n与基线比较：{len(regressions)} 项退化超过 {args.threshold:.0%}")
+    for name, size, base, current, ratio in regressions:
+        print(f"  {name} @ {size}：{base} -> {current} 微秒/书源（×{ratio}）")
+    return 1
+
+
+if __name__ == "__main__":
+    exit(main())
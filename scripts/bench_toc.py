@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+txt 目录规则（rules/legado/toc.json）基准与按书自动选择
+- 书籍：目录下的 .txt 文本；同名的 <书名>.toc.txt（每行一个章节标题）为可选的标注目录。
+  未指定目录时按固定种子生成几种常见排版的示例书籍（中文序号、阿拉伯序号、Chapter、顿号序号、
+  分卷等，正文夹杂像标题的句子），标注目录随之生成
+- 每条启用的规则（--all 含未启用的）与 Legado 相同按 MULTILINE 编译，在整本书上执行 finditer：
+  记录每秒行数、每本书的匹配数；有标注时按标题所在的行计算准确率、召回率与 F1
+  （分章取决于匹配落在哪一行；只匹配到标题一部分的规则同样算对）
+- --select：每本书只取开头一小段（--sample）试跑全部规则，在准确（F1 不低于 --agreement）的规则中选最快的
+  （试跑耗时在最快者 NEAR_FASTEST 倍以内的取 F1 最高的：样本上的耗时差别常在毫秒以下，不能只凭它取舍）：
+  有标注时与标注比较；没有标注时与参照规则比较，参照为合理的结果中得分最高的
+  （匹配行数减去 INDENT_PENALTY 倍的缩进行匹配数：正文段落有缩进，匹配多只因误中正文的规则不能当参照）；
+  再在整本书上核对所选规则，并与 Legado 的选法（合理的规则中匹配最多的）对比耗时与准确率；
+  整本书上的 F1 低于 --agreement 时提示，不计为选中；
+  汇总被选中的次数，给出建议的规则顺序：只列至少在一本书上准确的规则（F1 不低于 --agreement，
+  没有标注的书上为有匹配），按选中次数、准确的书数、吞吐排序
+- 标题过密（平均每章不足 MIN_CHAPTER_LINES 行）或过长的匹配结果不合理，不作为参照
+"""
+
+import re
+import time
+import bisect
+import random
+import argparse
+from pathlib import Path
+from collections import Counter
+
+import jsonio
+import purify
+import bench_purify
+
+# 默认规则文件
+TOC_PATH = Path(__file__).parent.parent / "rules/legado/toc.json"
+
+# 标注目录的文件后缀
+LABEL_SUFFIX = ".toc.txt"
+
+# 试跑的样本长度（字符）
+SAMPLE_CHARS = 30000
+
+# 与参照结果的一致度（F1）下限
+AGREEMENT = 0.95
+
+# 参照结果的合理性：平均每章的最少行数、标题的最大长度、最少章节数
+MIN_CHAPTER_LINES = 5
+MAX_TITLE_CHARS = 50
+MIN_MATCHES = 2
+
+# 试跑耗时在最快者该倍数以内的规则视为同样快，取 F1 最高的
+NEAR_FASTEST = 1.5
+
+# 参照得分中每个缩进行匹配的扣分（按匹配行数计）
+INDENT_PENALTY = 2
+
+# 单本书的超时（秒）
+TIMEOUT = 10.0
+
+# 示例书籍
+SEED = 20240601
+SAMPLE_BOOK_CHAPTERS = 120
+DIGITS = "零一二三四五六七八九"
+TITLE_WORDS = ["初入江湖", "风起云涌", "故人重逢", "夜探藏经阁", "一剑封喉", "山雨欲来", "少年心事",
+               "血战到底", "离别", "拜师", "雪夜", "归来"]
+DISTRACTORS = [
+    "　　他想起了第三章里写过的那句话，不由得笑了。",
+    "　　第一次见到她的时候，他还只是个孩子。",
+    "　　“1. 先把东西放下；2. 再慢慢说。”",
+    "　　【系统提示：任务完成】",
+    "　　番外的事情以后再说。",
+]
+
+
+def chinese_number(n: int) -> str:
+    """1-9999 的中文数字（十一、一百零五）"""
+    units = ["", "十", "百", "千"]
+    digits = [int(d) for d in str(n)][::-1]
+    parts = []
+    zero = False
+    for i in range(len(digits) - 1, -1, -1):
+        d = digits[i]
+        if d == 0:
+            zero = bool(parts)
+            continue
+        if zero:
+            parts.append("零")
+            zero = False
+        parts.append(("" if d == 1 and i == 1 and len(digits) == 2 else DIGITS[d]) + units[i])
+    return "".join(parts)
+
+
+# 示例书籍的标题样式
+STYLES = {
+    "chinese": lambda n, title: f"第{chinese_number(n)}章 {title}",
+    "arabic": lambda n, title: f"第{n}章　{title}",
+    "english": lambda n, title: f"Chapter {n} {title}",
+    "numbered": lambda n, title: f"{n}、{title}",
+    "volume": lambda n, title: f"第{chinese_number((n - 1) // 40 + 1)}卷 第{n}章 {title}",
+}
+
+
+def sample_books(chapters: int = SAMPLE_BOOK_CHAPTERS, seed: int = SEED) -> list:
+    """按固定种子生成示例书籍 [(书名, 文本, 标注目录), ...]"""
+    rng = random.Random(seed)
+    bodies = [body for _, body in bench_purify.sample_chapters(chapters, seed)]
+    books = []
+    for style, make in STYLES.items():
+        lines = ["简介：", "　　这是一本示例书籍。", ""]
+        labels = []
+        for n in range(1, chapters + 1):
+            title = make(n, rng.choice(TITLE_WORDS))
+            labels.append(title)
+            body = bodies[n - 1].split("\n")
+            body.insert(rng.randrange(len(body)), rng.choice(DISTRACTORS))
+            lines.extend([title, *body, ""])
+        books.append((f"sample_{style}", "\n".join(lines), labels))
+    return books
+
+
+def load_books(books_dir: str) -> list:
+    """读取目录下的 txt 书籍与可选的标注目录"""
+    books = []
+    for path in sorted(Path(books_dir).glob("*.txt")):
+        if path.name.endswith(LABEL_SUFFIX):
+            continue
+        text = path.read_text(encoding="utf-8", errors="replace")
+        label_path = path.with_name(path.stem + LABEL_SUFFIX)
+        labels = None
+        if label_path.exists():
+            labels = [line.strip() for line in label_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+        books.append((path.stem, text, labels))
+    return books
+
+
+def load_rules(path: Path, include_disabled: bool) -> list:
+    """按 serialNumber 排序的规则 [(规则, 编译后的正则或 None, 错误), ...]（跳过空规则）"""
+    rules = []
+    for item in sorted(jsonio.load(path), key=lambda r: r.get("serialNumber") or 0):
+        if not item.get("rule") or not (include_disabled or item.get("enable", True)):
+            continue
+        try:
+            compiled, error = purify.compile_java(purify.java_regex(item["rule"]), purify.re.MULTILINE), None
+        except purify.RuleError as e:
+            compiled, error = None, str(e)
+        rules.append((item, compiled, error))
+    return rules
+
+
+def line_starts(text: str) -> list:
+    """每行的起始位置"""
+    return [0] + [m.end() for m in re.finditer("\n", text)]
+
+
+def label_lines(text: str, labels: list) -> set:
+    """标注标题所在的行号（按顺序逐个查找）"""
+    lines = text.split("\n")
+    found = set()
+    i = 0
+    for label in labels:
+        for j in range(i, len(lines)):
+            if lines[j].strip() == label:
+                found.add(j)
+                i = j + 1
+                break
+    return found
+
+
+def find_titles(compiled, text: str, timeout: float) -> tuple:
+    """([(起始位置, 标题), ...], 耗时)；超时返回 (None, 耗时)"""
+    start = time.perf_counter()
+    try:
+        if purify.regex is not None:
+            titles = [(m.start(), m.group()) for m in compiled.finditer(text, timeout=timeout)]
+        else:
+            titles = [(m.start(), m.group()) for m in compiled.finditer(text)]
+    except TimeoutError:
+        titles = None
+    return titles, time.perf_counter() - start
+
+
+def title_lines(titles: list, starts: list) -> set:
+    """匹配所在的行号（匹配以换行开头时取下一行）"""
+    return {bisect.bisect_right(starts, pos + len(title) - len(title.lstrip())) - 1 for pos, title in titles}
+
+
+def f1_score(found: set, expected: set) -> tuple:
+    """(准确率, 召回率, F1)，按行号比较"""
+    if not found or not expected:
+        return 0.0, 0.0, 0.0
+    hits = len(found & expected)
+    precision, recall = hits / len(found), hits / len(expected)
+    f1 = 2 * precision * recall / (precision + recall) if hits else 0.0
+    return round(precision, 4), round(recall, 4), round(f1, 4)
+
+
+def plausible(titles: list, text: str) -> bool:
+    """匹配结果是否像目录：章节数足够、不过密、标题不过长"""
+    if titles is None or len(titles) < MIN_MATCHES:
+        return False
+    if text.count("\n") / len(titles) < MIN_CHAPTER_LINES:
+        return False
+    return max(len(t.strip()) for _, t in titles) <= MAX_TITLE_CHARS
+
+
+def benchmark(rules: list, books: list, timeout: float) -> list:
+    """每条规则在全部书籍上的吞吐、匹配数与准确率"""
+    results = []
+    for item, compiled, error in rules:
+        result = {"serialNumber": item.get("serialNumber"), "name": item.get("name") or "",
+                  "enabled": item.get("enable", True)}
+        if error:
+            result["error"] = error
+            results.append(result)
+            continue
+        lines = 0
+        seconds = 0.0
+        books_result = {}
+        for name, text, starts, expected in books:
+            titles, elapsed = find_titles(compiled, text, timeout)
+            seconds += elapsed
+            lines += len(starts)
+            entry = {"matches": None if titles is None else len(titles), "seconds": round(elapsed, 4)}
+            if titles is not None and expected:
+                entry["precision"], entry["recall"], entry["f1"] = f1_score(title_lines(titles, starts), expected)
+            books_result[name] = entry
+        scored = [b["f1"] for b in books_result.values() if "f1" in b]
+        result.update({
+            "lines_per_second": round(lines / seconds) if seconds else 0,
+            "seconds": round(seconds, 4),
+            "timeouts": sum(1 for b in books_result.values() if b["matches"] is None),
+            "mean_f1": round(sum(scored) / len(scored), 4) if scored else None,
+            "books": books_result,
+        })
+        results.append(result)
+    return results
+
+
+def indented_matches(lines: set, text: str, starts: list) -> int:
+    """落在缩进行（以空白开头，通常是正文段落）上的匹配数"""
+    return sum(1 for i in lines if text[starts[i]:starts[i] + 1] in (" ", "\t", "　"))
+
+
+def reference_score(lines: set, text: str, starts: list) -> int:
+    """参照得分：匹配行数减去缩进行匹配的扣分"""
+    return len(lines) - INDENT_PENALTY * indented_matches(lines, text, starts)
+
+
+def select(rules: list, text: str, sample_chars: int, agreement: float, timeout: float, labels: list = None) -> dict:
+    """
+    用书的开头试跑全部规则
+
+    返回: {legado: Legado 会选的规则, reference: 准确率的参照（"labels" 或参照规则）, choice: 所选规则,
+           sample_seconds: 试跑总耗时}
+
+    所选：与参照比较 F1 不低于 agreement 的规则中最快的（耗时在 NEAR_FASTEST 倍以内时取 F1 最高的）；有标注（且样本内能找到）时参照为标注，
+    否则为得分最高的合理结果（得分都不为正时，如标题同样缩进的书，退回匹配最多的）
+    """
+    sample = text[:sample_chars]
+    starts = line_starts(sample)
+    trials = []
+    total = 0.0
+    for item, compiled, error in rules:
+        if error:
+            continue
+        titles, elapsed = find_titles(compiled, sample, timeout)
+        total += elapsed
+        trials.append((item, titles, elapsed))
+
+    candidates = [(item, title_lines(titles, starts), elapsed) for item, titles, elapsed in trials
+                  if plausible(titles, sample)]
+    if not candidates:
+        return {"legado": None, "reference": None, "choice": None, "sample_seconds": round(total, 4)}
+    legado = max(candidates, key=lambda t: len(t[1]))
+
+    expected = label_lines(sample, labels) if labels else None
+    if expected:
+        reference = "labels"
+    else:
+        scored = max(candidates, key=lambda t: reference_score(t[1], sample, starts))
+        best = scored if reference_score(scored[1], sample, starts) > 0 else legado
+        reference, expected = best[0], best[1]
+
+    agreeing = [(item, elapsed, f1_score(lines, expected)[2]) for item, lines, elapsed in candidates]
+    agreeing = [t for t in agreeing if t[2] >= agreement]
+    choice = None
+    if agreeing:
+        fastest = min(elapsed for _, elapsed, _ in agreeing)
+        choice = max((t for t in agreeing if t[1] <= fastest * NEAR_FASTEST), key=lambda t: (t[2], -t[1]))
+    return {"legado": legado[0], "reference": reference, "choice": choice[0] if choice else None,
+            "sample_seconds": round(total, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="txt 目录规则基准与按书自动选择")
+    parser.add_argument("--rules", "-r", default=str(TOC_PATH), help="目录规则文件，默认 rules/legado/toc.json")
+    parser.add_argument("--books", "-b", help="txt 书籍目录（<书名>.toc.txt 为标注目录；默认使用生成的示例书籍）")
+    parser.add_argument("--all", action="store_true", help="包括未启用的规则")
+    parser.add_argument("--select", action="store_true", help="按书自动选择规则")
+    parser.add_argument("--sample", type=int, default=SAMPLE_CHARS, help=f"试跑的样本长度（字符），默认 {SAMPLE_CHARS}")
+    parser.add_argument("--agreement", type=float, default=AGREEMENT, help=f"与参照结果的一致度下限，默认 {AGREEMENT}")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"单本书的超时（秒），默认 {TIMEOUT}")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(Path(args.rules), args.all)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法读取规则 {e}")
+        return 1
+    books = load_books(args.books) if args.books else sample_books()
+    if not books:
+        print(f"错误：目录中没有 txt 书籍 {args.books}")
+        return 1
+
+    labeled = sum(1 for _, _, labels in books if labels)
+    print(f"规则：{len(rules)} 条，书籍：{len(books)} 本（有标注 {labeled} 本）")
+    # 行起始位置与标注行号只算一次，不计入规则耗时
+    prepared = [(name, text, line_starts(text), label_lines(text, labels) if labels else None)
+                for name, text, labels in books]
+    results = benchmark(rules, prepared, args.timeout)
+
+    print(f"\n{'序号':>4} {'规则':<24}{'行/秒':>12}{'匹配/本':>10}{'F1':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['serialNumber']:>4} {r['name'][:22]:<24}  无法编译：{r['error']}")
+            continue
+        matches = [b["matches"] for b in r["books"].values() if b["matches"] is not None]
+        per_book = sum(matches) / len(matches) if matches else 0
+        f1 = f"{r['mean_f1']:.3f}" if r["mean_f1"] is not None else "-"
+        timeout = f"  超时 {r['timeouts']} 本" if r["timeouts"] else ""
+        print(f"{r['serialNumber']:>4} {r['name'][:22]:<24}{r['lines_per_second']:>12}{per_book:>10.1f}{f1:>8}{timeout}")
+
+    selections = []
+    if args.select:
+        print(f"\n按书自动选择（样本 {args.sample} 字符，一致度 ≥ {args.agreement}）：")
+        by_name = {r["name"]: r for r in results}
+        for name, text, labels in books:
+            picked = select(rules, text, args.sample, args.agreement, args.timeout, labels)
+            reference = picked["reference"]
+            entry = {"book": name, "sample_seconds": picked["sample_seconds"],
+                     "legado": picked["legado"]["name"] if picked["legado"] else None,
+                     "reference": reference if reference in (None, "labels") else reference["name"],
+                     "choice": picked["choice"]["name"] if picked["choice"] else None}
+            if entry["choice"]:
+                full = by_name[entry["choice"]]["books"][name]
+                entry["seconds"] = full["seconds"]
+                entry["f1"] = full.get("f1")
+                entry["legado_seconds"] = by_name[entry["legado"]]["books"][name]["seconds"]
+                entry["legado_f1"] = by_name[entry["legado"]]["books"][name].get("f1")
+                # 样本上准确、整本书上不准确的选择不算数
+                entry["accepted"] = entry["f1"] is None or entry["f1"] >= args.agreement
+            selections.append(entry)
+            if not entry["choice"]:
+                print(f"  {name}：没有{'合理' if not entry['legado'] else '足够准确'}的规则")
+                continue
+            basis = "标注" if entry["reference"] == "labels" else entry["reference"]
+            f1 = f"，F1 {entry['f1']}（Legado {entry['legado_f1']}）" if entry.get("f1") is not None else ""
+            print(f"  {name}：{entry['choice']}（准确率参照 {basis}；Legado 选 {entry['legado']}），"
+                  f"整本 {entry['seconds'] * 1000:.1f} ms / Legado {entry['legado_seconds'] * 1000:.1f} ms{f1}")
+            if not entry["accepted"]:
+                print(f"    警告：整本 F1 {entry['f1']} 低于 {args.agreement}，不计为选中")
+
+        # 建议顺序：只列至少在一本书上准确的规则，被选中次数多的在前，其次按准确的书数、吞吐
+        chosen = Counter(s["choice"] for s in selections if s["choice"] and s["accepted"])
+
+        def accurate_books(r):
+            return sum(1 for b in r["books"].values()
+                       if (b["f1"] >= args.agreement if b.get("f1") is not None else bool(b["matches"])))
+
+        candidates = [r for r in results if "error" not in r]
+        accurate = {r["name"]: accurate_books(r) for r in candidates}
+        order = sorted((r for r in candidates if accurate[r["name"]]),
+                       key=lambda r: (-chosen.get(r["name"], 0), -accurate[r["name"]], -r["lines_per_second"]))
+        print("\n建议的规则顺序（被选中次数，其次准确的书数、吞吐）：")
+        for r in order[:10]:
+            print(f"  {r['serialNumber']:>4} {r['name'][:22]:<24} 选中 {chosen.get(r['name'], 0)} 次，"
+                  f"准确 {accurate[r['name']]} 本")
+        if len(order) < len(candidates):
+            print(f"  另有 {len(candidates) - len(order)} 条规则在所有书上都不够准确，未列入")
+
+    if args.output:
+        jsonio.dump({"books": [name for name, _, _ in books], "rules": results, "selections": selections},
+                    Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
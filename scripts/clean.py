@@ -6,43 +6,66 @@
 - 转换特殊字符（圆圈数字、全角字符等）
 - 规范名称和分组
 - 清理多余空格
-- 可选：按评分自动分组（精选/标准/备用）+ 排序
+- 逐字符删除用 str.translate 查表；名称与分组的规范化结果按原文缓存（上游名称大量重复）
+- 可选：按评分自动分组（精选/标准/备用）+ 排序，评分见 scoring.py
+- 运行指标：--metrics / --profile（见 metrics.py），记录改写的名称数与名称缓存命中
 """
 
-import json
 import re
-import time
 import argparse
 from pathlib import Path
+from functools import lru_cache
+
+import jsonio
+import metrics
+from scoring import score_sources, grade_groups
+
+# 表情符号范围（覆盖常见 emoji）
+EMOJI_RANGES = [
+    ("\U0001F300", "\U0001F9FF"),  # 常见 emoji
+    ("\U00002600", "\U000027BF"),  # 杂项符号
+    ("\U0001FA00", "\U0001FAFF"),  # 扩展符号
+    ("\U00002300", "\U000023FF"),  # 技术符号
+    ("\U00002B50", "\U00002B55"),  # 星星等
+    ("\U0000FE00", "\U0000FE0F"),  # 变体选择器
+    ("\U0000200D", "\U0000200D"),  # 零宽连接符
+    ("\U0001F1E0", "\U0001F1FF"),  # 国旗
+]
 
-# 表情符号正则（覆盖常见 emoji 范围）
+# 表情符号正则
 EMOJI_PATTERN = re.compile(
-    "["
-    "\U0001F300-\U0001F9FF"  # 常见 emoji
-    "\U00002600-\U000027BF"  # 杂项符号
-    "\U0001FA00-\U0001FAFF"  # 扩展符号
-    "\U00002300-\U000023FF"  # 技术符号
-    "\U00002B50-\U00002B55"  # 星星等
-    "\U0000FE00-\U0000FE0F"  # 变体选择器
-    "\U0000200D"             # 零宽连接符
-    "\U0001F1E0-\U0001F1FF"  # 国旗
-    "]+",
+    "[" + "".join(f"{lo}-{hi}" if lo != hi else lo for lo, hi in EMOJI_RANGES) + "]+",
     flags=re.UNICODE
 )
 
-# 特殊符号（需要移除）
+# 特殊符号（需要移除）：单个字符 + 字符范围（罗马数字、全角字母数字）
+SPECIAL_CHARS = (
+    '★☆✦✧⭐🌟💫🔥💥✨🎉🎊📚📖📕📗📘📙👍👎👏🙏💪'
+    '❤️💕💖💗💙💚💛✅❌⭕❗❓'
+    '①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳'
+    '㉑㉒㉓㉔㉕㉖㉗㉘㉙㉚㉛㉜㉝㉞㉟'
+    '⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻'
+    '～~丨|｜👁🔰🎨📻📥💠'
+    '◎▪™〽㊣●○◆◇■□▲△▼▽'
+)
+SPECIAL_RANGES = [("Ⅰ", "Ⅻ"), ("Ａ", "Ｚ"), ("ａ", "ｚ"), ("０", "９")]
+
 SPECIAL_SYMBOLS = re.compile(
-    r'[★☆✦✧⭐🌟💫🔥💥✨🎉🎊📚📖📕📗📘📙👍👎👏🙏💪'
-    r'❤️💕💖💗💙💚💛✅❌⭕❗❓'
-    r'①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳'
-    r'㉑㉒㉓㉔㉕㉖㉗㉘㉙㉚㉛㉜㉝㉞㉟'
-    r'⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻'
-    r'Ⅰ-Ⅻ～~丨|｜👁🔰🎨📻📥💠'
-    r'◎▪™〽㊣●○◆◇■□▲△▼▽'
-    r'Ａ-Ｚａ-ｚ０-９'
-    r']+'
+    "[" + re.escape(SPECIAL_CHARS) + "".join(f"{lo}-{hi}" for lo, hi in SPECIAL_RANGES) + "]+"
 )
 
+
+def char_table(chars: str, ranges: list) -> dict:
+    """str.translate 删除表"""
+    table = dict.fromkeys(map(ord, chars))
+    for lo, hi in ranges:
+        table.update(dict.fromkeys(range(ord(lo), ord(hi) + 1)))
+    return table
+
+
+# 表情符号与特殊符号一次 translate 删除（与依次 EMOJI_PATTERN、SPECIAL_SYMBOLS 替换为空等价）
+DELETE_TABLE = char_table(SPECIAL_CHARS, EMOJI_RANGES + SPECIAL_RANGES)
+
 # 括号及内容（中文括号、英文括号、方括号、尖括号）
 BRACKET_PATTERN = re.compile(r'[（(【\[<][^）)】\]>]*[）)】\]>]')
 
@@ -63,7 +86,7 @@ DESC_SUFFIXES = re.compile(
 TRAILING_SYMBOLS = re.compile(r'[._\-]+$')
 
 # 名称后缀清洗模式（按顺序应用）
-NAME_SUFFIX_PATTERNS = [
+NAME_SUFFIX_PATTERNS = [(re.compile(pattern), replacement) for pattern, replacement in [
     (r'^源社区出品-', ''),                     # 来源前缀（优先处理）
     (r'^[+\-#.·]\s*', ''),                    # 开头特殊符号
     (r'#\d+$', ''),                           # #数字 版本号
@@ -75,7 +98,17 @@ NAME_SUFFIX_PATTERNS = [
     (r'[a-z]\d{1,3}$', ''),                   # 英文+数字后缀（如 b13）
     (r'(?<=[^\d])\d{1,3}$', ''),              # 纯数字后缀
     (r'[._,]+$', ''),                          # 结尾符号
-]
+]]
+
+# 循环移除的结尾模式，及其任一可匹配的预检（不匹配时无需进入循环）
+TRAILING_PATTERNS = (DESC_SUFFIXES, TRAILING_NUMBER, TRAILING_SYMBOLS)
+TRAILING_ANY = re.compile("|".join(f"(?:{p.pattern})" for p in TRAILING_PATTERNS))
+
+# 连续空白
+WHITESPACE = re.compile(r'\s+')
+
+# 名称 / 分组规范化缓存大小（上游名称大量重复）
+NAME_CACHE_SIZE = 65536
 
 # 分组排序顺序
 GROUP_ORDER = {"精选": 0, "标准": 1, "备用": 2}
@@ -101,86 +134,25 @@ GROUP_MAPPING = {
 }
 
 
-def calculate_quality_score(source: dict) -> int:
-    """计算书源质量评分（满分约 60）"""
-    score = 0
-
-    # 基础状态 (0-7)
-    if source.get('enabled', True):
-        score += 5
-    if source.get('enabledExplore'):
-        score += 2
-
-    # 响应时间 (0-15)
-    rt = source.get('respondTime', 99999)
-    if rt < 1000:
-        score += 15
-    elif rt < 3000:
-        score += 12
-    elif rt < 5000:
-        score += 8
-    elif rt < 10000:
-        score += 4
-
-    # 规则完整性 (0-20)
-    if source.get('searchUrl'):
-        score += 4
-    if source.get('ruleSearch') or source.get('searchRule'):
-        score += 4
-    if source.get('ruleToc') or source.get('tocRule'):
-        score += 4
-    if source.get('ruleContent') or source.get('contentRule'):
-        score += 6
-    if source.get('exploreUrl'):
-        score += 2
-
-    # 更新时间 (0-10)
-    last = source.get('lastUpdateTime', 0)
-    if last:
-        days = max(0, (time.time() * 1000 - last) / 86400000)
-        if days < 30:
-            score += 10
-        elif days < 90:
-            score += 7
-        elif days < 180:
-            score += 4
-        elif days < 365:
-            score += 2
-
-    # 权重 (0-5)
-    score += min(source.get('weight', 0) // 100, 5)
-
-    return score
-
-
-def get_grade_group(score: int) -> str:
-    """根据评分返回分组名称"""
-    if score >= 45:
-        return "精选"
-    elif score >= 40:
-        return "标准"
-    else:
-        return "备用"
-
-
 def strip_decorations(text: str) -> str:
     """移除装饰性内容（表情、特殊符号、括号、后缀等）"""
     if not text:
         return ""
-    text = EMOJI_PATTERN.sub("", text)
-    text = SPECIAL_SYMBOLS.sub("", text)
+    text = text.translate(DELETE_TABLE)
     text = BRACKET_PATTERN.sub("", text)
     text = SPECIAL_BRACKETS.sub("", text)
     # 名称后缀清洗
     for pattern, replacement in NAME_SUFFIX_PATTERNS:
-        text = re.sub(pattern, replacement, text)
+        text = pattern.sub(replacement, text)
     # 移除描述性后缀和结尾数字（循环直到无变化）
+    if not TRAILING_ANY.search(text):
+        return text.strip()
+    metrics.count("clean.trailing_loops")
     prev = None
     while prev != text:
         prev = text
-        text = DESC_SUFFIXES.sub("", text)
-        text = TRAILING_NUMBER.sub("", text)
-        text = TRAILING_SYMBOLS.sub("", text)
+        for pattern in TRAILING_PATTERNS:
+            text = pattern.sub("", text)
     return text.strip()
 
 
@@ -188,15 +160,19 @@ def clean_spaces(text: str) -> str:
     """清理空格"""
     if not text:
         return ""
-    # 去除首尾空格
-    text = text.strip()
-    # 多个空格合并为一个
-    text = re.sub(r'\s+', ' ', text)
-    return text
+    # 去除首尾空格，多个空格合并为一个
+    return WHITESPACE.sub(' ', text.strip())
+
 
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def normalize_name(name: str) -> str:
+    """规范化书源名称（按原始名称缓存）"""
+    return clean_spaces(strip_decorations(name))
 
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
 def normalize_group(group: str) -> str:
-    """规范化分组名称"""
+    """规范化分组名称（按原始分组缓存）"""
     if not group:
         return ""
 
@@ -212,16 +188,22 @@ def normalize_group(group: str) -> str:
     return cleaned
 
 
-def clean_source(source: dict, grade: bool = False) -> dict:
-    """清洗单个书源"""
+metrics.track_cache("clean.name_cache", normalize_name)
+metrics.track_cache("clean.group_cache", normalize_group)
+
+
+def clean_source(source: dict, group: str = None) -> dict:
+    """清洗单个书源（group 不为空时按评分分组覆盖原有分组）"""
     # 清洗名称
     if "bookSourceName" in source:
-        source["bookSourceName"] = clean_spaces(strip_decorations(source["bookSourceName"]))
+        name = normalize_name(source["bookSourceName"])
+        if name != source["bookSourceName"]:
+            metrics.count("clean.names_rewritten")
+        source["bookSourceName"] = name
 
     # 按评分分组（覆盖原有分组）
-    if grade:
-        score = calculate_quality_score(source)
-        source["bookSourceGroup"] = get_grade_group(score)
+    if group:
+        source["bookSourceGroup"] = group
     # 仅清洗分组
     elif "bookSourceGroup" in source:
         source["bookSourceGroup"] = normalize_group(source["bookSourceGroup"])
@@ -238,8 +220,15 @@ def clean_source(source: dict, grade: bool = False) -> dict:
 
 
 def clean_sources(sources: list, grade: bool = False) -> list:
-    """批量清洗书源"""
-    return [clean_source(s, grade) for s in sources]
+    """批量清洗书源（grade 时整批向量化评分后分组，见 scoring.py）"""
+    with metrics.stage("clean", len(sources)) as record:
+        if not grade:
+            cleaned = [clean_source(s) for s in sources]
+        else:
+            groups = grade_groups(score_sources(sources))
+            cleaned = [clean_source(s, g) for s, g in zip(sources, groups)]
+        record["items_out"] = len(cleaned)
+    return cleaned
 
 
 def sort_sources(sources: list) -> list:
@@ -255,7 +244,10 @@ def main():
     parser.add_argument("--input", "-i", required=True, help="输入文件路径")
     parser.add_argument("--output", "-o", required=True, help="输出文件路径")
     parser.add_argument("--grade", "-g", action="store_true", help="按评分自动分组（精选/标准/备用）+ 排序")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.start(args)
 
     input_path = Path(args.input)
     output_path = Path(args.output)
@@ -265,8 +257,7 @@ def main():
         return 1
 
     # 读取书源
-    with open(input_path, "r", encoding="utf-8") as f:
-        sources = json.load(f)
+    sources = jsonio.load(input_path)
 
     print(f"读取书源：{len(sources)} 个")
     if args.grade:
@@ -280,9 +271,7 @@ def main():
         cleaned = sort_sources(cleaned)
 
     # 输出
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(cleaned, f, ensure_ascii=False, indent=2)
+    jsonio.dump(cleaned, output_path, args.compact)
 
     print(f"清洗完成，输出到：{output_path}")
 
@@ -296,6 +285,7 @@ def main():
     for g, count in sorted(groups.items(), key=lambda x: GROUP_ORDER.get(x[0], 99)):
         print(f"  {g or '未分组'}: {count}")
 
+    metrics.finish(args)
     return 0
 
 
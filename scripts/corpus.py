@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+合成书源语料
+- 以书源文件中的真实书源为模板（字段组合、嵌套的 rule* 规则对象、书源类型与分组保持原样），
+  按固定种子生成任意数量的书源，用于基准测试（见 bench_suite.py）
+- 名称：模板名称加表情、括号、署名、版本号等装饰（比例与上游相近）
+- 地址：每个书源新的域名；按比例生成 #🎃 片段、完全重复的地址（不同版本）与镜像站
+  （子域名、端口、其他后缀、IP），覆盖 URL 去重、站点去重与合并的各个分支
+- 顶层字段逐个复制，嵌套的规则对象在书源之间共享（只读），百万级语料的内存也可以接受；
+  写出时逐个序列化
+"""
+
+import random
+import argparse
+from pathlib import Path
+
+import jsonio
+
+# 默认模板
+BASE_DIR = Path(__file__).parent.parent
+TEMPLATES = [BASE_DIR / "sources/legado/full.json", BASE_DIR / "sources/legado/invalid.json"]
+
+# 默认种子
+SEED = 20240601
+
+# 名称装饰比例与装饰
+DECORATE_RATE = 0.3
+NAME_PREFIXES = ["🔥", "⭐", "✨", "📚 ", "🎃", "〖精〗", "【推荐】", "源社区出品-", "# "]
+NAME_SUFFIXES = ["（备用）", "【自用】", "[VIP]", "{作者}", " #张三", "#12", "①", "²", "精品", "备用", "01", "_a_b", "-李四"]
+
+# 地址：片段、完全重复、镜像站的比例
+FRAGMENT_RATE = 0.33
+DUPLICATE_RATE = 0.08
+MIRROR_RATE = 0.12
+
+# 新域名的组成
+SYLLABLES = ["shu", "xiao", "shuo", "wen", "ge", "ku", "yue", "du", "book", "txt", "biquge", "qu", "zhan", "lou", "ba"]
+SUFFIXES = [".com", ".net", ".org", ".cc", ".top", ".com.cn", ".la", ".info"]
+SUBDOMAINS = ["www.", "m.", "wap.", ""]
+
+# 时间范围：最近两年（毫秒）
+NOW_MS = 1717200000000
+SPAN_MS = 2 * 365 * 86400000
+
+
+def load_templates(paths: list = None) -> list:
+    """读取模板书源（跳过不存在的文件）"""
+    templates = []
+    for path in paths or TEMPLATES:
+        path = Path(path)
+        if path.exists():
+            data = jsonio.load(path)
+            templates.extend(data["sources"] if isinstance(data, dict) else data)
+    return templates
+
+
+class Generator:
+    """按固定种子生成书源；已生成的域名与地址记录下来，供镜像站与重复地址使用"""
+
+    def __init__(self, templates: list, seed: int = SEED):
+        self.templates = templates
+        self.rng = random.Random(seed)
+        self.domains = []
+        self.urls = []
+        self.groups = sorted({t.get("bookSourceGroup") or "" for t in templates})
+
+    def domain(self) -> str:
+        rng = self.rng
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        return f"{name}{len(self.domains)}{rng.choice(SUFFIXES)}"
+
+    def mirror(self) -> str:
+        """已有站点的镜像：其他子域名、端口、后缀或 IP"""
+        rng = self.rng
+        domain = rng.choice(self.domains)
+        kind = rng.random()
+        if kind < 0.4:
+            return f"https://{rng.choice(SUBDOMAINS)}{domain}"
+        if kind < 0.6:
+            return f"http://www.{domain}:{rng.choice([8080, 8081, 8443])}"
+        if kind < 0.8:
+            return f"https://www.{domain.split('.')[0]}{rng.choice(SUFFIXES)}"
+        return f"http://{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+    def url(self) -> str:
+        rng = self.rng
+        roll = rng.random()
+        if self.urls and roll < DUPLICATE_RATE:
+            return rng.choice(self.urls)
+        if self.domains and roll < DUPLICATE_RATE + MIRROR_RATE:
+            url = self.mirror()
+        else:
+            domain = self.domain()
+            self.domains.append(domain)
+            url = f"https://{rng.choice(SUBDOMAINS)}{domain}"
+        if rng.random() < FRAGMENT_RATE:
+            url += "#🎃"
+        self.urls.append(url)
+        return url
+
+    def name(self, template: dict) -> str:
+        rng = self.rng
+        name = template.get("bookSourceName") or "书源"
+        if rng.random() < DECORATE_RATE:
+            if rng.random() < 0.4:
+                name = rng.choice(NAME_PREFIXES) + name
+            else:
+                name = name + rng.choice(NAME_SUFFIXES)
+        return name
+
+    def source(self) -> dict:
+        rng = self.rng
+        source = dict(rng.choice(self.templates))
+        source["bookSourceUrl"] = self.url()
+        source["bookSourceName"] = self.name(source)
+        source["bookSourceGroup"] = rng.choice(self.groups)
+        source["lastUpdateTime"] = NOW_MS - rng.randrange(SPAN_MS)
+        source["respondTime"] = rng.choice([180000, rng.randint(100, 20000)])
+        source["customOrder"] = len(self.urls)
+        source["weight"] = rng.choice([0, 0, 0, rng.randint(1, 100)])
+        source["enabled"] = rng.random() < 0.9
+        return source
+
+    def generate(self, count: int) -> list:
+        return [self.source() for _ in range(count)]
+
+
+def generate(count: int, seed: int = SEED, templates: list = None) -> list:
+    """生成 count 个书源（相同种子与模板时结果相同）"""
+    return Generator(templates or load_templates(), seed).generate(count)
+
+
+def write(sources, path: Path, compact: bool = False):
+    """逐个序列化写出书源数组（格式与 jsonio.dump 相同）"""
+    with jsonio.atomic_open(path) as f:
+        f.write(b"[")
+        first = True
+        for source in sources:
+            body = jsonio.dumps(source, compact)
+            if compact:
+                f.write(body if first else b"," + body)
+            else:
+                f.write((b"\n  " if first else b",\n  ") + body.replace(b"\n", b"\n  "))
+            first = False
+        f.write(b"]" if compact or first else b"\n]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成书源语料")
+    parser.add_argument("--count", "-n", type=int, default=10000, help="书源数量，默认 10000")
+    parser.add_argument("--seed", "-s", type=int, default=SEED, help=f"随机种子，默认 {SEED}")
+    parser.add_argument("--templates", "-t", nargs="+", help="模板书源文件，默认 full.json 与 invalid.json")
+    parser.add_argument("--output", "-o", required=True, help="输出文件路径")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    args = parser.parse_args()
+
+    templates = load_templates(args.templates)
+    if not templates:
+        print("错误：没有可用的模板书源")
+        return 1
+
+    generator = Generator(templates, args.seed)
+    write((generator.source() for _ in range(args.count)), Path(args.output), args.compact)
+
+    print(f"模板：{len(templates)} 个书源")
+    print(f"生成：{args.count} 个书源，{len(generator.domains)} 个站点，{len(set(generator.urls))} 个不同地址")
+    print(f"输出到：{args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
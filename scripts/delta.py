@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+书源增量更新（版本间差异）
+- build：对比上一版与当前全量书源，按 bookSourceUrl 生成差异文档（新增 / 删除 / 变化），
+  变化的书源给出字段级补丁（JSON Patch 子集：add / remove，路径为 JSON Pointer），
+  并维护最近 N 个版本的差异链（index.json）；移出链的差异文件被删除，输出目录中的其他文件不受影响
+- apply：从任意仍在链上的版本开始依次应用差异，每一步都用快照哈希校验，最终与最新全量比对
+- 快照哈希：书源数组按美化格式（jsonio.dumps，与 full.json 相同）序列化后的 SHA-256
+"""
+
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import jsonio
+
+# 默认路径
+BASE_DIR = Path(__file__).parent.parent
+INPUT_PATH = BASE_DIR / "sources/legado/full.json"
+OUTPUT_DIR = BASE_DIR / "sources/legado/deltas"
+
+# 差异链清单
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+
+# 默认保留的版本数
+DEFAULT_KEEP = 10
+
+# 删除标记（区分“字段不存在”与 null）
+_MISSING = object()
+
+
+def sources_of(data) -> list:
+    """书源数组（支持带元信息的 {"sources": [...]}）"""
+    if isinstance(data, dict) and "sources" in data:
+        return data["sources"]
+    return data
+
+
+def snapshot_hash(sources: list) -> str:
+    return hashlib.sha256(jsonio.dumps(sources)).hexdigest()
+
+
+def pointer(path: list) -> str:
+    """JSON Pointer（RFC 6901）"""
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in path)
+
+
+def unpointer(text: str) -> list:
+    if not text:
+        return []
+    return [p.replace("~1", "/").replace("~0", "~") for p in text[1:].split("/")]
+
+
+def diff_fields(old, new, path: list = None) -> list:
+    """字段级补丁：只递归进入对象，数组与标量整体替换"""
+    path = path or []
+    ops = []
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": pointer(path + [key])})
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if previous is _MISSING or type(previous) is not type(value):
+            ops.append({"op": "add", "path": pointer(path + [key]), "value": value})
+        elif isinstance(value, dict):
+            ops.extend(diff_fields(previous, value, path + [key]))
+        elif previous != value:
+            ops.append({"op": "add", "path": pointer(path + [key]), "value": value})
+    return ops
+
+
+def patch_fields(source: dict, ops: list) -> dict:
+    """应用字段级补丁，返回新的书源（不修改原书源）"""
+    result = jsonio.loads(jsonio.dumps(source, compact=True))
+    for op in ops:
+        parts = unpointer(op["path"])
+        if not parts:
+            result = op["value"]
+            continue
+        target = result
+        for part in parts[:-1]:
+            target = target[part]
+        if op["op"] == "remove":
+            del target[parts[-1]]
+        else:
+            target[parts[-1]] = op["value"]
+    return result
+
+
+def same_layout(a, b) -> bool:
+    """内容与字段顺序都相同（决定序列化后的字节）"""
+    return jsonio.dumps(a, compact=True) == jsonio.dumps(b, compact=True)
+
+
+def make_delta(old: list, new: list) -> dict:
+    """
+    生成差异：{"added": [书源], "removed": [URL], "changed": {URL: 补丁}, "order": [URL] 或不包含}
+
+    字段补丁无法还原字段顺序时，改为整体替换（路径为空的 add）；
+    应用后的书源顺序与新版本不同时附带完整的 URL 顺序；
+    任一版本的 URL 有重复时无法按 URL 对应，差异中直接给出新版本全量（"snapshot"）
+    """
+    old_by_url = {s.get("bookSourceUrl", ""): s for s in old}
+    new_by_url = {s.get("bookSourceUrl", ""): s for s in new}
+
+    if len(old_by_url) != len(old) or len(new_by_url) != len(new):
+        return {"added": [], "removed": [], "changed": {}, "snapshot": new}
+
+    added = [s for url, s in new_by_url.items() if url not in old_by_url]
+    removed = [url for url in old_by_url if url not in new_by_url]
+    changed = {}
+    for url, source in new_by_url.items():
+        previous = old_by_url.get(url)
+        if previous is None or same_layout(previous, source):
+            continue
+        ops = diff_fields(previous, source)
+        if not same_layout(patch_fields(previous, ops), source):
+            ops = [{"op": "add", "path": "", "value": source}]
+        changed[url] = ops
+
+    delta = {"added": added, "removed": removed, "changed": changed}
+    if [s.get("bookSourceUrl", "") for s in apply_delta(old, delta)] != list(new_by_url):
+        delta["order"] = list(new_by_url)
+    return delta
+
+
+def apply_delta(sources: list, delta: dict) -> list:
+    """应用单个差异：删除、打补丁（保持原位置）、新增追加到末尾，最后按 order 排序"""
+    if "snapshot" in delta:
+        return delta["snapshot"]
+    removed = set(delta["removed"])
+    changed = delta["changed"]
+    result = []
+    for source in sources:
+        url = source.get("bookSourceUrl", "")
+        if url in removed:
+            continue
+        result.append(patch_fields(source, changed[url]) if url in changed else source)
+    result.extend(delta["added"])
+
+    if "order" in delta:
+        by_url = {s.get("bookSourceUrl", ""): s for s in result}
+        result = [by_url[url] for url in delta["order"]]
+    return result
+
+
+def load_index(output_dir: Path) -> dict:
+    path = output_dir / INDEX_NAME
+    if not path.exists():
+        return {"version": INDEX_VERSION, "latest": None, "chain": []}
+    return jsonio.load(path)
+
+
+def next_version(latest: dict) -> str:
+    """版本号：日期（同一天多次发布追加序号）"""
+    version = datetime.now().strftime("%Y.%m.%d")
+    if latest and latest["version"].split("-")[0] == version:
+        parts = latest["version"].split("-")
+        return f"{version}-{int(parts[1]) + 1 if len(parts) > 1 else 2}"
+    return version
+
+
+def build(previous: list, current: list, output_dir: Path, keep: int = DEFAULT_KEEP) -> dict:
+    """
+    生成上一版到当前版本的差异，追加到差异链，只保留最近 keep 个版本
+
+    上一版与链上的最新版本不一致时（链断开），从上一版重新开始一条链
+
+    返回: 差异链清单
+    """
+    index = load_index(output_dir)
+    listed = [item["path"] for item in index["chain"]]
+    current_hash = snapshot_hash(current)
+    previous_hash = snapshot_hash(previous)
+    latest = index["latest"]
+
+    if latest and latest["sha256"] == current_hash:
+        return index
+    if not latest or latest["sha256"] != previous_hash:
+        index["chain"] = []
+        latest = {"version": "base", "sha256": previous_hash, "count": len(previous)}
+
+    delta = make_delta(previous, current)
+    target = {"version": next_version(latest), "sha256": current_hash, "count": len(current)}
+    document = {"from": latest, "to": target, **delta}
+    path = f"{target['version']}.json"
+    payload = jsonio.dumps(document, compact=True)
+    with jsonio.atomic_open(output_dir / path) as f:
+        f.write(payload)
+
+    index["chain"].append({
+        "from": latest,
+        "to": target,
+        "path": path,
+        "bytes": len(payload),
+        "added": len(delta["added"]),
+        "removed": len(delta["removed"]),
+        "changed": len(delta["changed"])
+    })
+    # 保留最近 keep 个版本：最多 keep - 1 个差异
+    index["chain"] = index["chain"][-max(keep - 1, 1):]
+    index["latest"] = target
+
+    # 只删除上次差异链中列出、已移出链的差异文件
+    kept = {item["path"] for item in index["chain"]}
+    for path in listed:
+        stale = output_dir / path
+        if path not in kept and stale.exists():
+            stale.unlink()
+
+    jsonio.dump(index, output_dir / INDEX_NAME)
+    return index
+
+
+def catch_up(base: list, index: dict, output_dir: Path) -> tuple:
+    """
+    从 base 依次应用差异链到最新版本，每一步校验快照哈希
+
+    返回: (最新书源列表, 应用的差异数)；base 不在链上或校验失败时抛出 ValueError
+    """
+    current_hash = snapshot_hash(base)
+    chain = index["chain"]
+    start = next((i for i, item in enumerate(chain) if item["from"]["sha256"] == current_hash), None)
+    if start is None:
+        if index["latest"] and index["latest"]["sha256"] == current_hash:
+            return base, 0
+        raise ValueError("当前版本不在差异链上，请下载全量书源")
+
+    sources = base
+    for item in chain[start:]:
+        document = jsonio.load(output_dir / item["path"])
+        sources = apply_delta(sources, document)
+        if snapshot_hash(sources) != item["to"]["sha256"]:
+            raise ValueError(f"应用 {item['path']} 后哈希不符")
+    return sources, len(chain) - start
+
+
+def build_main(args) -> int:
+    previous_path, input_path = Path(args.previous), Path(args.input)
+    for path in (previous_path, input_path):
+        if not path.exists():
+            print(f"错误：输入文件不存在 {path}")
+            return 1
+
+    previous, current = (sources_of(d) for d in jsonio.load_many([previous_path, input_path]))
+    index = build(previous, current, Path(args.output), args.keep)
+
+    latest = index["latest"]
+    print(f"最新版本：{latest['version']}（{latest['count']} 个书源）")
+    print(f"差异链：{len(index['chain'])} 个")
+    for item in index["chain"]:
+        print(f"  {item['from']['version']} -> {item['to']['version']}：新增 {item['added']}、"
+              f"删除 {item['removed']}、变化 {item['changed']}，{item['bytes'] / 1024:.0f} KB")
+    print(f"\n输出到：{args.output}")
+    return 0
+
+
+def apply_main(args) -> int:
+    base_path, output_dir = Path(args.base), Path(args.deltas)
+    if not base_path.exists():
+        print(f"错误：输入文件不存在 {base_path}")
+        return 1
+
+    index = load_index(output_dir)
+    try:
+        sources, steps = catch_up(sources_of(jsonio.load(base_path)), index, output_dir)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+
+    print(f"应用差异：{steps} 个，当前版本 {index['latest']['version']}（{len(sources)} 个书源）")
+
+    if args.full:
+        full = sources_of(jsonio.load(Path(args.full)))
+        if snapshot_hash(full) != snapshot_hash(sources):
+            print("错误：结果与全量书源不一致")
+            return 1
+        print("校验通过：结果与全量书源一致")
+
+    if args.output:
+        jsonio.dump(sources, Path(args.output))
+        print(f"输出到：{args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源增量更新（版本间差异链）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="生成上一版到当前版本的差异")
+    build_parser.add_argument("--previous", "-p", required=True, help="上一版全量书源文件")
+    build_parser.add_argument("--input", "-i", default=str(INPUT_PATH), help="当前全量书源文件")
+    build_parser.add_argument("--output", "-o", default=str(OUTPUT_DIR), help="差异链目录")
+    build_parser.add_argument("--keep", "-k", type=int, default=DEFAULT_KEEP,
+                              help=f"保留的版本数，默认 {DEFAULT_KEEP}")
+
+    apply_parser = subparsers.add_parser("apply", help="依次应用差异，更新到最新版本")
+    apply_parser.add_argument("--base", "-b", required=True, help="本地已有版本的全量书源文件")
+    apply_parser.add_argument("--deltas", "-d", default=str(OUTPUT_DIR), help="差异链目录")
+    apply_parser.add_argument("--full", "-f", help="最新全量书源文件（校验结果一致）")
+    apply_parser.add_argument("--output", "-o", help="结果输出路径")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        return build_main(args)
+    return apply_main(args)
+
+
+if __name__ == "__main__":
+    exit(main())
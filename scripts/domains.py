@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+书源站点索引
+- 规范化源站 scheme://host[:port] 与 URL 去重键
+- 可注册域名：按内置公共后缀列表（data/public_suffix_list.dat，离线）计算，
+  m.example.com、www.example.com:8080 都归为 example.com
+- IP：字面 IP 直接使用；可选 DNS 解析，只对应一个域名的 IP 视为该域名的镜像
+- 主机信息按主机缓存，可持久化到 JSON，下次运行复用解析结果
+"""
+
+import json
+import time
+import socket
+import asyncio
+import hashlib
+import argparse
+import ipaddress
+from pathlib import Path
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# 内置公共后缀列表（https://publicsuffix.org/list/public_suffix_list.dat）
+PSL_PATH = Path(__file__).parent / "data" / "public_suffix_list.dat"
+
+# 默认索引文件
+INDEX_PATH = Path(__file__).parent.parent / ".cache" / "domain_index.json"
+
+# 索引文件格式版本
+INDEX_VERSION = 1
+
+# DNS 解析：结果有效期（秒）、并发数、单个主机超时（秒）
+RESOLVE_TTL = 7 * 86400
+RESOLVE_CONCURRENCY = 50
+RESOLVE_TIMEOUT = 5
+
+# 默认端口（规范化时省略）
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_origin(url: str) -> str:
+    """
+    规范化为源站：scheme://host[:port]
+
+    去除首尾空白、片段（如 #🎃）、路径和默认端口，scheme 与 host 转小写
+    """
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url.lower()
+
+    scheme = parts.scheme.lower()
+    if not scheme or not host:
+        return url.split("#", 1)[0].lower()
+
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        host = f"{host}:{port}"
+    return f"{scheme}://{host}"
+
+
+def url_key(url: str) -> str:
+    """
+    URL 去重键：规范化源站（http 视同 https）+ 路径（去掉末尾 /）+ 查询参数
+
+    为空表示 URL 为空
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    origin = normalize_origin(url)
+    if origin.startswith("http://"):
+        origin = "https://" + origin[len("http://"):]
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return origin
+    if not parts.scheme or not parts.hostname:
+        # 没有 scheme 或主机时 normalize_origin 已保留路径与查询参数（只去掉片段）
+        return origin
+    key = origin + parts.path.rstrip("/")
+    if parts.query:
+        key += "?" + parts.query
+    return key
+
+
+def host_of(url: str) -> str:
+    """URL 的主机名（小写，IDN 转为 punycode）"""
+    try:
+        host = urlsplit((url or "").strip()).hostname or ""
+    except ValueError:
+        return ""
+    return to_ascii(host)
+
+
+def to_ascii(host: str) -> str:
+    """主机名转为小写 ASCII（IDN 转 punycode，失败时原样小写）"""
+    host = host.strip(".").lower()
+    if host.isascii():
+        return host
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+def literal_ip(host: str) -> str:
+    """字面 IP 地址（规范化形式），不是 IP 时返回空字符串"""
+    try:
+        return str(ipaddress.ip_address(host.strip("[]")))
+    except ValueError:
+        return ""
+
+
+class PublicSuffixList:
+    """公共后缀列表（含 ICANN 与私有域名部分）"""
+
+    def __init__(self, path: Path = PSL_PATH):
+        self.rules = set()
+        self.wildcards = set()
+        self.exceptions = set()
+        with open(path, "r", encoding="utf-8") as f:
+            data = f.read()
+        self.digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        for line in data.splitlines():
+            line = line.strip()
+            if not line or line.startswith("//"):
+                continue
+            rule = line.split()[0]
+            if rule.startswith("!"):
+                self.exceptions.add(to_ascii(rule[1:]))
+            elif rule.startswith("*."):
+                self.wildcards.add(to_ascii(rule[2:]))
+            else:
+                self.rules.add(to_ascii(rule))
+
+    def public_suffix(self, host: str) -> str:
+        """最长匹配的公共后缀（无匹配时取最后一级，即默认规则 *）"""
+        labels = host.split(".")
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                return ".".join(labels[i + 1:])
+            if candidate in self.rules or ".".join(labels[i + 1:]) in self.wildcards:
+                return candidate
+        return labels[-1]
+
+    def registrable_domain(self, host: str) -> str:
+        """可注册域名（公共后缀 + 一级），主机本身是公共后缀时返回主机"""
+        if not host:
+            return ""
+        suffix = self.public_suffix(host)
+        if suffix == host:
+            return host
+        prefix = host[:-len(suffix) - 1]
+        return prefix.rsplit(".", 1)[-1] + "." + suffix
+
+
+_psl = None
+
+
+def public_suffix_list() -> PublicSuffixList:
+    """内置公共后缀列表（首次使用时加载）"""
+    global _psl
+    if _psl is None:
+        _psl = PublicSuffixList()
+    return _psl
+
+
+class SourceIndex:
+    """
+    站点索引
+
+    hosts: {主机: {"domain": 可注册域名, "ips": [IP, ...], "resolved": 解析时间戳}}
+    字面 IP 主机的 domain 为 IP 本身
+    """
+
+    def __init__(self, psl: PublicSuffixList = None):
+        self.psl = psl or public_suffix_list()
+        self.hosts = {}
+
+    @classmethod
+    def load(cls, path: Path = INDEX_PATH, psl: PublicSuffixList = None) -> "SourceIndex":
+        """读取持久化的索引（文件不存在或格式不符时返回空索引）"""
+        index = cls(psl)
+        path = Path(path)
+        if not path.exists():
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.hosts = data.get("hosts", {})
+        # 公共后缀列表更新后重新计算域名，保留解析结果
+        if data.get("psl") != index.psl.digest:
+            for host, info in index.hosts.items():
+                info["domain"] = index.domain_of_host(host)
+        return index
+
+    def save(self, path: Path = INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "psl": self.psl.digest, "hosts": self.hosts},
+                      f, ensure_ascii=False, indent=2)
+
+    def domain_of_host(self, host: str) -> str:
+        return literal_ip(host) or self.psl.registrable_domain(host)
+
+    def host_info(self, host: str) -> dict:
+        """主机信息（缓存）"""
+        info = self.hosts.get(host)
+        if info is None:
+            ip = literal_ip(host)
+            info = {"domain": ip or self.psl.registrable_domain(host), "ips": [ip] if ip else []}
+            self.hosts[host] = info
+        return info
+
+    def entry(self, url: str) -> dict:
+        """书源地址的索引项：{"key", "origin", "host", "domain", "ips"}"""
+        host = host_of(url)
+        info = self.host_info(host) if host else {"domain": "", "ips": []}
+        return {
+            "key": url_key(url),
+            "origin": normalize_origin(url),
+            "host": host,
+            "domain": info["domain"] or normalize_origin(url),
+            "ips": info["ips"]
+        }
+
+    def site_keys(self, urls: list) -> list:
+        """
+        站点键（用于域名配额）：默认为可注册域名
+
+        字面 IP 地址若只被一个已解析域名使用，视为该域名的镜像，归入该域名
+        """
+        entries = [self.entry(u) for u in urls]
+        owners = self.mirror_owners()
+        return [self.site_key(e["host"], e["domain"], owners) for e in entries]
+
+    def mirror_owners(self) -> dict:
+        """已解析域名的 IP 归属：{IP: {可注册域名, ...}}"""
+        ip_domains = defaultdict(set)
+        for host, info in self.hosts.items():
+            if info.get("resolved") and not literal_ip(host):
+                for ip in info["ips"]:
+                    ip_domains[ip].add(info["domain"])
+        return ip_domains
+
+    @staticmethod
+    def site_key(host: str, domain: str, owners: dict) -> str:
+        """单个书源的站点键：字面 IP 只归属一个域名（owners 见 mirror_owners）时取该域名，否则取 domain"""
+        ip = literal_ip(host) if host else ""
+        mirrors = owners.get(ip, ()) if ip else ()
+        return next(iter(mirrors)) if len(mirrors) == 1 else domain
+
+    async def resolve(self, hosts: list, ttl: int = RESOLVE_TTL) -> int:
+        """DNS 解析主机（跳过字面 IP 与有效期内的结果），返回本次解析数量"""
+        now = time.time()
+        pending = [h for h in dict.fromkeys(hosts)
+                   if h and not literal_ip(h) and now - self.host_info(h).get("resolved", 0) > ttl]
+        if not pending:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(RESOLVE_CONCURRENCY)
+
+        async def resolve_one(host):
+            async with semaphore:
+                try:
+                    infos = await asyncio.wait_for(
+                        loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), RESOLVE_TIMEOUT)
+                    ips = sorted({info[4][0] for info in infos})
+                except (OSError, asyncio.TimeoutError, UnicodeError):
+                    ips = []
+            info = self.host_info(host)
+            info["ips"] = ips
+            info["resolved"] = int(now)
+
+        await asyncio.gather(*(resolve_one(h) for h in pending))
+        return len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源站点索引（源站 / 可注册域名 / IP）")
+    parser.add_argument("--input", "-i", required=True, help="书源文件路径")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="索引文件路径")
+    parser.add_argument("--resolve", action="store_true", help="DNS 解析主机 IP（结果缓存在索引中）")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        sources = json.load(f)
+
+    urls = [s.get("bookSourceUrl", "") for s in sources]
+    index = SourceIndex.load(Path(args.index))
+    entries = [index.entry(u) for u in urls]
+
+    if args.resolve:
+        count = asyncio.run(index.resolve([e["host"] for e in entries]))
+        print(f"DNS 解析：{count} 个主机")
+
+    sites = index.site_keys(urls)
+    print(f"书源：{len(sources)} 个")
+    print(f"  URL 去重键：{len({e['key'] for e in entries})} 个")
+    print(f"  源站：{len({e['origin'] for e in entries})} 个")
+    print(f"  主机：{len({e['host'] for e in entries})} 个")
+    print(f"  可注册域名：{len({e['domain'] for e in entries})} 个")
+    print(f"  站点（含 IP 镜像归并）：{len(set(sites))} 个")
+
+    index.save(Path(args.index))
+    print(f"\n索引输出到：{args.index}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -3,12 +3,15 @@
 书源筛选脚本
 - 只保留小说类型 (bookSourceType = 0)
 - 排除漫画、有声书、影视
+- 运行指标：--metrics / --profile（见 metrics.py）
 """
 
-import json
 import argparse
 from pathlib import Path
 
+import jsonio
+import metrics
+
 # 需要排除的分组关键词
 EXCLUDE_KEYWORDS = ["漫画", "有声", "影视", "视频", "动漫", "听书", "音频"]
 
@@ -22,26 +25,31 @@ def filter_novel_sources(sources: list) -> tuple:
     novels = []
     excluded = []
 
-    for source in sources:
-        # 检查类型
-        source_type = source.get("bookSourceType", 0)
-        if source_type != 0:
-            excluded.append(source)
-            continue
-
-        # 检查分组名称
-        group = source.get("bookSourceGroup", "")
-        if any(kw in group for kw in EXCLUDE_KEYWORDS):
-            excluded.append(source)
-            continue
-
-        # 检查名称
-        name = source.get("bookSourceName", "")
-        if any(kw in name for kw in EXCLUDE_KEYWORDS):
-            excluded.append(source)
-            continue
-
-        novels.append(source)
+    with metrics.stage("filter", len(sources)) as record:
+        for source in sources:
+            # 检查类型
+            source_type = source.get("bookSourceType", 0)
+            if source_type != 0:
+                excluded.append(source)
+                metrics.count("filter.excluded_type")
+                continue
+
+            # 检查分组名称
+            group = source.get("bookSourceGroup", "")
+            if any(kw in group for kw in EXCLUDE_KEYWORDS):
+                excluded.append(source)
+                metrics.count("filter.excluded_keyword")
+                continue
+
+            # 检查名称
+            name = source.get("bookSourceName", "")
+            if any(kw in name for kw in EXCLUDE_KEYWORDS):
+                excluded.append(source)
+                metrics.count("filter.excluded_keyword")
+                continue
+
+            novels.append(source)
+        record["items_out"] = len(novels)
 
     return novels, excluded
 
@@ -51,7 +59,10 @@ def main():
     parser.add_argument("--input", "-i", required=True, help="输入文件路径")
     parser.add_argument("--output", "-o", required=True, help="输出文件路径")
     parser.add_argument("--excluded", "-e", help="排除的书源输出路径（可选）")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.start(args)
 
     input_path = Path(args.input)
     output_path = Path(args.output)
@@ -61,8 +72,7 @@ def main():
         return 1
 
     # 读取书源
-    with open(input_path, "r", encoding="utf-8") as f:
-        sources = json.load(f)
+    sources = jsonio.load(input_path)
 
     print(f"读取书源：{len(sources)} 个")
 
@@ -73,18 +83,14 @@ def main():
     print(f"排除书源：{len(excluded)} 个")
 
     # 输出小说书源
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(novels, f, ensure_ascii=False, indent=2)
+    jsonio.dump(novels, output_path, args.compact)
 
     print(f"输出到：{output_path}")
 
     # 输出排除的书源（可选）
     if args.excluded and excluded:
         excluded_path = Path(args.excluded)
-        excluded_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(excluded_path, "w", encoding="utf-8") as f:
-            json.dump(excluded, f, ensure_ascii=False, indent=2)
+        jsonio.dump(excluded, excluded_path, args.compact)
         print(f"排除书源输出到：{excluded_path}")
 
     # 统计排除原因
@@ -95,6 +101,7 @@ def main():
     print(f"  类型不是小说：{type_excluded}")
     print(f"  关键词匹配：{keyword_excluded}")
 
+    metrics.finish(args)
     return 0
 
 
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+书源规则指纹（近似重复检测）
+- 规范化规则：searchUrl 与 ruleSearch/ruleBookInfo/ruleToc/ruleContent/ruleExplore，
+  绝对地址替换为占位符（镜像域名不影响指纹），按词法单元切分（空白差异不影响指纹）
+- MinHash 签名 + LSH 分桶，只比较同桶候选，接近线性时间
+- 候选对再用精确 Jaccard 相似度确认，并查集聚类；去重时成员须与保留的书源直接相似才去除（不传递）
+- integrate.py 与 merge.py 均使用 --fingerprint 启用（默认关闭）：每个聚类只保留最优的书源；
+  指纹不区分站点地址，同一建站模板的不同站点也会被归为一组
+- 指纹特征可编码写入增量清单（见 manifest.py），内容未变的书源不再重新计算
+"""
+
+import re
+import json
+import zlib
+import base64
+import argparse
+from collections import defaultdict
+
+import metrics
+
+try:
+    import numpy as np
+except ImportError:
+    print("请先安装 numpy: pip install numpy")
+    exit(1)
+
+# 参与指纹的字段与规则分组
+RULE_FIELDS = ("searchUrl",)
+RULE_SECTIONS = ("ruleSearch", "ruleBookInfo", "ruleToc", "ruleContent", "ruleExplore")
+
+# 默认相似度阈值（Jaccard）
+DEFAULT_THRESHOLD = 0.8
+
+# MinHash：签名长度 = 分桶数 × 每桶行数（阈值约 (1/BANDS)^(1/ROWS) ≈ 0.77）
+BANDS = 8
+ROWS = 8
+NUM_PERM = BANDS * ROWS
+
+# 词法单元 n-gram 长度
+SHINGLE_SIZE = 3
+
+# 哈希函数参数（固定种子，结果可复现）
+_rng = np.random.default_rng(20240601)
+HASH_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+HASH_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+HASH_MASK = np.uint64(0xFFFFFFFF)
+
+# 绝对地址（替换为占位符）
+ABSOLUTE_URL = re.compile(r'https?://[^/\s"\'<>,}]+', re.IGNORECASE)
+
+# 词法单元：标识符/数字 或 单个符号
+TOKEN = re.compile(r'\w+|[^\w\s]')
+
+
+def rule_texts(source: dict) -> list:
+    """取出参与指纹的 (字段名, 规则文本) 列表"""
+    texts = []
+    for field in RULE_FIELDS:
+        value = source.get(field)
+        if isinstance(value, str) and value.strip():
+            texts.append((field, value))
+    for section in RULE_SECTIONS:
+        block = source.get(section)
+        if not isinstance(block, dict):
+            continue
+        for field in sorted(block):
+            value = block[field]
+            if isinstance(value, str) and value.strip():
+                texts.append((f"{section}.{field}", value))
+    return texts
+
+
+def shingles(source: dict) -> set:
+    """规范化规则后的 n-gram 哈希集合"""
+    result = set()
+    for field, text in rule_texts(source):
+        tokens = TOKEN.findall(ABSOLUTE_URL.sub("{origin}", text))
+        if len(tokens) < SHINGLE_SIZE:
+            grams = [" ".join(tokens)]
+        else:
+            grams = (" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+        prefix = field + "\0"
+        for gram in grams:
+            result.add(zlib.crc32((prefix + gram).encode("utf-8")))
+    return result
+
+
+def minhash(hashes: set) -> np.ndarray:
+    """MinHash 签名"""
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    return ((values[:, None] * HASH_A + HASH_B) & HASH_MASK).min(axis=0)
+
+
+def features(source: dict) -> tuple:
+    """指纹特征：(n-gram 哈希集合, MinHash 签名)，没有规则时签名为 None"""
+    hashes = shingles(source)
+    return hashes, minhash(hashes) if hashes else None
+
+
+def encode_features(item: tuple) -> list:
+    """指纹特征编码为可写入 JSON 的 [集合, 签名]（uint32 / uint64 数组的 base64）"""
+    hashes, signature = item
+    packed = base64.b64encode(np.array(sorted(hashes), dtype=np.uint32).tobytes()).decode("ascii")
+    return [packed, None if signature is None else base64.b64encode(signature.tobytes()).decode("ascii")]
+
+
+def decode_features(data: list) -> tuple:
+    packed, signature = data
+    hashes = set(np.frombuffer(base64.b64decode(packed), dtype=np.uint32).tolist())
+    if signature is not None:
+        signature = np.frombuffer(base64.b64decode(signature), dtype=np.uint64)
+    return hashes, signature
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def find_clusters(sources: list, threshold: float = DEFAULT_THRESHOLD, items: list = None) -> list:
+    """
+    查找近似重复聚类
+
+    items 为预先计算（如增量清单中缓存）的 features() 列表，与 sources 一一对应
+
+    返回: 聚类列表，每个聚类为书源位置列表（仅包含 2 个及以上成员的聚类，按首个成员位置排序）
+    """
+    items = items if items is not None else [features(s) for s in sources]
+    sets = [hashes for hashes, _ in items]
+
+    # LSH 分桶：同一桶内的书源为候选
+    buckets = defaultdict(list)
+    for i, (hashes, signature) in enumerate(items):
+        if signature is None:
+            continue
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            buckets[key].append(i)
+
+    # 并查集
+    parent = list(range(len(sources)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # 桶内逐个与已有代表比较：相同规则的大桶只需线性次数比较
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        representatives = []
+        for member in members:
+            for rep in representatives:
+                if find(member) == find(rep):
+                    break
+                if jaccard(sets[member], sets[rep]) >= threshold:
+                    parent[find(member)] = find(rep)
+                    break
+            else:
+                representatives.append(member)
+
+    clusters = defaultdict(list)
+    for i in range(len(sources)):
+        clusters[find(i)].append(i)
+    return sorted((c for c in clusters.values() if len(c) > 1), key=lambda c: c[0])
+
+
+def keep_best(sources: list, keys: list, threshold: float = DEFAULT_THRESHOLD, items: list = None) -> tuple:
+    """
+    每个近似重复聚类只保留 keys 最大的书源（相同时保留靠前的）
+
+    聚类由并查集传递合并，成员之间不一定都相似：按 keys 从大到小，成员与某个已保留的书源
+    直接相似（Jaccard 不低于 threshold）才去除，否则也保留
+
+    返回: (保留书源的位置列表（保持原有顺序）, 聚类列表)
+    """
+    with metrics.stage("dedupe", len(sources), "fingerprint") as record:
+        items = items if items is not None else [features(s) for s in sources]
+        clusters = find_clusters(sources, threshold, items)
+        dropped = set()
+        for cluster in clusters:
+            representatives = []
+            for i in sorted(cluster, key=lambda i: keys[i], reverse=True):
+                if any(jaccard(items[i][0], items[rep][0]) >= threshold for rep in representatives):
+                    dropped.add(i)
+                else:
+                    representatives.append(i)
+            metrics.count("dedupe.cluster_representatives", len(representatives))
+        kept = [i for i in range(len(sources)) if i not in dropped]
+        metrics.count("dedupe.clusters", len(clusters))
+        record["items_out"] = len(kept)
+    return kept, clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源规则指纹：查找近似重复书源")
+    parser.add_argument("--input", "-i", required=True, help="书源文件路径")
+    parser.add_argument("--threshold", "-t", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Jaccard 相似度阈值，默认 {DEFAULT_THRESHOLD}")
+    parser.add_argument("--output", "-o", help="聚类结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        sources = json.load(f)
+
+    clusters = find_clusters(sources, args.threshold)
+    duplicates = sum(len(c) - 1 for c in clusters)
+    print(f"书源：{len(sources)} 个")
+    print(f"近似重复聚类：{len(clusters)} 个，可去除 {duplicates} 个")
+
+    for cluster in clusters[:10]:
+        names = "、".join(sources[i].get("bookSourceName", "") for i in cluster)
+        print(f"  [{len(cluster)}] {names}")
+
+    if args.output:
+        result = [[{"bookSourceName": sources[i].get("bookSourceName", ""),
+                    "bookSourceUrl": sources[i].get("bookSourceUrl", "")} for i in c] for c in clusters]
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n聚类结果输出到：{args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+书源功能校验
+- 按 searchUrl 构造搜索请求（支持 url,{json 参数}、method/body/charset、{{key}}/{{page}}）
+- 依次执行 搜索 -> 详情 -> 目录 -> 正文，各步骤独立限制并发
+- 依赖 JS 的部分无法离线执行，标记为“无法校验”而非失效
+- 记录每个步骤的结果与耗时
+- 直接运行时启动本地替身服务（提供搜索/详情/目录/正文固定页面），对替身书源执行完整流程，四个步骤均须通过
+"""
+
+import re
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urljoin, quote, parse_qs
+
+from aiohttp import web
+
+import rule
+from probe import Prober, ProbeError, source_headers, percentile, DEFAULT_TIMEOUT, CONCURRENCY
+
+# 校验步骤
+STEPS = ("search", "info", "toc", "content")
+
+# 默认搜索关键词（书源未设置 ruleSearch.checkKeyWord 时使用）
+DEFAULT_KEYWORD = "我的"
+
+# url,{json 参数} 分隔
+OPTION_SPLIT = re.compile(r'\s*,\s*(?=\{)')
+
+# 页码列表 <a,b,c>
+PAGE_LIST = re.compile(r'<([^<>]*,[^<>]*)>')
+
+# {{page±n}}
+PAGE_EXPR = re.compile(r'^page\s*([+-])\s*(\d+)$')
+
+# 替身服务的固定页面：详情、目录为 HTML，正文为 JSON（搜索页按请求体中的关键词生成）
+STAND_IN_PAGES = {
+    "/book/1": ("text/html", '<html><body><h1 class="name">替身书籍</h1>'
+                             '<a class="toc" href="/book/1/toc">目录</a></body></html>'),
+    "/book/1/toc": ("text/html", '<html><body><ul id="list"><li><a href="/chapter/1">第一章</a></li>'
+                                 '<li><a href="/chapter/2">第二章</a></li></ul></body></html>'),
+    "/chapter/1": ("application/json", json.dumps({"data": {"content": "第一章正文。"}}, ensure_ascii=False)),
+}
+
+
+class StepFailed(Exception):
+    """步骤执行失败"""
+
+
+def render_url_template(template: str, key: str, page: int, charset: str, raw_key: bool = False) -> str:
+    """展开 {{key}}、{{page}}、{{page±n}} 与 <a,b,c> 页码列表"""
+    def replace(match):
+        expr = match.group(1).strip()
+        if expr == "key":
+            return key if raw_key else quote(key, encoding=charset or "utf-8")
+        if expr == "page":
+            return str(page)
+        m = PAGE_EXPR.match(expr)
+        if m:
+            n = int(m.group(2))
+            return str(page + n if m.group(1) == "+" else page - n)
+        if rule.is_inner_rule(expr):
+            raise rule.Unverifiable(f"搜索地址含规则模板：{expr[:30]}")
+        raise rule.Unverifiable(f"搜索地址含 JS：{expr[:30]}")
+
+    def pick_page(match):
+        items = match.group(1).split(",")
+        return items[min(page, len(items)) - 1].strip()
+
+    template = PAGE_LIST.sub(pick_page, template)
+    return rule.TEMPLATE_PATTERN.sub(replace, template)
+
+
+def build_request(url_rule: str, base_url: str, source: dict, key: str = "", page: int = 1) -> dict:
+    """
+    按 Legado 地址规则构造请求
+
+    返回: {"url", "method", "body", "headers", "charset"}
+    """
+    url_rule = (url_rule or "").strip()
+    if not url_rule:
+        raise StepFailed("地址为空")
+    if rule.JS_PATTERN.search(url_rule):
+        raise rule.Unverifiable("地址含 JS")
+
+    parts = OPTION_SPLIT.split(url_rule, maxsplit=1)
+    url_part = parts[0]
+    options = {}
+    if len(parts) > 1:
+        try:
+            options = json.loads(parts[1])
+        except ValueError:
+            raise rule.Unverifiable("请求参数无法解析")
+        if not isinstance(options, dict):
+            raise rule.Unverifiable("请求参数无法解析")
+    if options.get("webView") or options.get("js"):
+        raise rule.Unverifiable("请求依赖 webView/JS")
+
+    charset = options.get("charset") or ""
+    url = render_url_template(url_part, key, page, charset)
+    url = urljoin(base_url, url)
+
+    headers = source_headers(source)
+    if isinstance(options.get("headers"), dict):
+        headers.update({str(k): str(v) for k, v in options["headers"].items()})
+
+    body = options.get("body")
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, ensure_ascii=False)
+    if body:
+        is_json_body = body.lstrip()[:1] in ("{", "[")
+        body = render_url_template(body, key, page, charset, raw_key=is_json_body)
+        if is_json_body:
+            headers.setdefault("Content-Type", "application/json")
+        else:
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+
+    return {
+        "url": url,
+        "method": (options.get("method") or ("POST" if body else "GET")).upper(),
+        "body": body,
+        "headers": headers,
+        "charset": charset,
+    }
+
+
+def base_url_of(source: dict) -> str:
+    """书源基准地址（去除片段与空白）"""
+    return source.get("bookSourceUrl", "").strip().split("#", 1)[0]
+
+
+def first_url(content, url_rule: str, page_url: str) -> str:
+    """按规则取第一个链接并转为绝对地址"""
+    value = rule.get_string(content, url_rule).split("\n", 1)[0].strip()
+    return urljoin(page_url, value) if value else ""
+
+
+class FunctionalProbe:
+    """对单个书源依次执行 搜索 -> 详情 -> 目录 -> 正文"""
+
+    def __init__(self, prober: Prober, step_semaphores: dict, keyword: str = DEFAULT_KEYWORD):
+        self.prober = prober
+        self.keyword = keyword
+        self.step_semaphores = step_semaphores
+
+    async def fetch(self, request: dict) -> tuple:
+        """发送请求，返回 (文本, 最终地址)"""
+        charset = request["charset"] or None
+        data = request["body"].encode(charset or "utf-8", errors="replace") if request["body"] else None
+        resp = await self.prober.request(request["method"], request["url"], request["headers"], data)
+        if resp["status"] >= 400:
+            raise StepFailed(f"HTTP {resp['status']}")
+        encoding = charset or resp["charset"] or "utf-8"
+        try:
+            text = resp["body"].decode(encoding, errors="replace")
+        except LookupError:
+            text = resp["body"].decode("utf-8", errors="replace")
+        return text, resp["url"]
+
+    async def run_step(self, name: str, coro_fn, results: dict):
+        """执行单个步骤并记录结果与耗时，返回步骤输出（失败或无法校验时返回 None）"""
+        async with self.step_semaphores[name]:
+            start = time.perf_counter()
+            try:
+                output = await coro_fn()
+                status, error = "pass", None
+            except (rule.Unverifiable, rule.RuleError) as e:
+                output, status, error = None, "unverifiable", str(e)
+            except (StepFailed, ProbeError) as e:
+                output, status, error = None, "fail", str(e)
+            except Exception as e:
+                output, status, error = None, "fail", str(e)[:50]
+            elapsed = time.perf_counter() - start
+        step = {"status": status, "ms": round(elapsed * 1000)}
+        if error:
+            step["error"] = error
+        results[name] = step
+        return output
+
+    async def search(self, source: dict, keyword: str):
+        request = build_request(source.get("searchUrl", ""), base_url_of(source), source, key=keyword)
+        text, page_url = await self.fetch(request)
+        rules = source.get("ruleSearch") or {}
+        doc = rule.parse_document(text)
+        books = rule.get_elements(doc, rules.get("bookList", ""))
+        if not books:
+            raise StepFailed("搜索无结果")
+        book_url = first_url(books[0], rules["bookUrl"], page_url) if rules.get("bookUrl") else page_url
+        if not book_url:
+            raise StepFailed("书籍链接为空")
+        return book_url
+
+    async def info(self, source: dict, book_url: str):
+        text, page_url = await self.fetch(build_request(book_url, book_url, source))
+        rules = source.get("ruleBookInfo") or {}
+        doc = rule.parse_document(text)
+        if rules.get("init"):
+            roots = rule.get_elements(doc, rules["init"])
+            doc = roots[0] if roots else doc
+        if rules.get("name") and not rule.get_string(doc, rules["name"]):
+            raise StepFailed("书名为空")
+        if rules.get("tocUrl"):
+            toc_url = first_url(doc, rules["tocUrl"], page_url)
+            if toc_url and toc_url != page_url:
+                return toc_url, None
+        return page_url, (text, page_url)
+
+    async def toc(self, source: dict, toc_url: str, cached):
+        text, page_url = cached or await self.fetch(build_request(toc_url, toc_url, source))
+        rules = source.get("ruleToc") or {}
+        chapters = rule.get_elements(rule.parse_document(text), rules.get("chapterList", ""))
+        if not chapters:
+            raise StepFailed("目录为空")
+        chapter_url = first_url(chapters[0], rules.get("chapterUrl") or "href", page_url)
+        if not chapter_url:
+            raise StepFailed("章节链接为空")
+        return chapter_url
+
+    async def content(self, source: dict, chapter_url: str):
+        text, _ = await self.fetch(build_request(chapter_url, chapter_url, source))
+        rules = source.get("ruleContent") or {}
+        if not rule.get_string(rule.parse_document(text), rules.get("content", "")):
+            raise StepFailed("正文为空")
+        return True
+
+    async def probe(self, source: dict) -> dict:
+        """
+        执行完整流程
+
+        返回: {"status": "valid"|"invalid"|"unverifiable", "steps": {步骤: {status, ms, error}}}
+        """
+        steps = {}
+        keyword = (source.get("ruleSearch") or {}).get("checkKeyWord") or self.keyword
+
+        book_url = await self.run_step("search", lambda: self.search(source, keyword), steps)
+        info = book_url and await self.run_step("info", lambda: self.info(source, book_url), steps)
+        chapter_url = info and await self.run_step("toc", lambda: self.toc(source, *info), steps)
+        chapter_url and await self.run_step("content", lambda: self.content(source, chapter_url), steps)
+
+        statuses = [s["status"] for s in steps.values()]
+        if "fail" in statuses:
+            status = "invalid"
+        elif "unverifiable" in statuses:
+            status = "unverifiable"
+        else:
+            status = "valid"
+        return {"status": status, "steps": steps}
+
+
+def summarize_steps(results: dict) -> dict:
+    """按步骤汇总通过/失败/无法校验数量与耗时"""
+    summary = {}
+    for name in STEPS:
+        records = [r["steps"][name] for r in results.values() if name in r["steps"]]
+        counts = {"pass": 0, "fail": 0, "unverifiable": 0}
+        for r in records:
+            counts[r["status"]] += 1
+        latencies = [r["ms"] for r in records if r["status"] == "pass"]
+        summary[name] = {**counts, "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+    return summary
+
+
+def stand_in_source(base: str) -> dict:
+    """指向替身服务的书源：POST 表单搜索，CSS/JSoup 规则取详情与目录，JSONPath 取正文"""
+    return {
+        "bookSourceName": "替身书源",
+        "bookSourceUrl": base,
+        "searchUrl": '/search,{"method":"POST","body":"key={{key}}&page={{page}}"}',
+        "ruleSearch": {"bookList": "class.book", "bookUrl": "tag.a@href"},
+        "ruleBookInfo": {"name": "class.name@text", "tocUrl": "class.toc@href"},
+        "ruleToc": {"chapterList": "id.list@tag.li", "chapterUrl": "tag.a@href"},
+        "ruleContent": {"content": "$.data.content"},
+    }
+
+
+async def start_stand_in() -> tuple:
+    """
+    启动本地替身服务，返回 (runner, 基础地址)
+
+    POST /search 的表单须带 key 与 page=1，否则返回空列表；其余路径返回 STAND_IN_PAGES 中的固定页面
+    """
+    async def search(request):
+        form = parse_qs(await request.text())
+        key = form.get("key", [""])[0]
+        books = ""
+        if key and form.get("page") == ["1"]:
+            books = f'<div class="book"><a href="/book/1">{key}</a></div>'
+        return web.Response(text=f"<html><body>{books}</body></html>", content_type="text/html")
+
+    async def page(request):
+        if request.path not in STAND_IN_PAGES:
+            raise web.HTTPNotFound()
+        content_type, text = STAND_IN_PAGES[request.path]
+        return web.Response(text=text, content_type=content_type)
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    app.router.add_route("*", "/{tail:.*}", page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def check_stand_in(timeout: int = DEFAULT_TIMEOUT) -> dict:
+    """对替身书源执行完整流程，返回该书源的结果"""
+    runner, base = await start_stand_in()
+    try:
+        async with Prober(timeout) as prober:
+            probe = FunctionalProbe(prober, {name: asyncio.Semaphore(1) for name in STEPS})
+            return await probe.probe(stand_in_source(base))
+    finally:
+        await runner.cleanup()
+
+
+async def functional_validate(sources: list, timeout: int = DEFAULT_TIMEOUT, keyword: str = DEFAULT_KEYWORD,
+                              journal=None) -> tuple:
+    """
+    批量功能校验
+
+    无法校验的书源保留在有效列表中；journal 不为空时每个书源的结果在完成时写入日志
+
+    返回: (有效书源列表, 无效书源列表, 错误信息, 统计信息)
+    """
+    valid = []
+    invalid = []
+    errors = {}
+    results = {}
+
+    step_semaphores = {name: asyncio.Semaphore(CONCURRENCY) for name in STEPS}
+
+    async with Prober(timeout) as prober:
+        probe = FunctionalProbe(prober, step_semaphores, keyword)
+
+        async def probe_one(source):
+            return source, await probe.probe(source)
+
+        total = len(sources)
+        completed = 0
+        for coro in asyncio.as_completed([probe_one(s) for s in sources]):
+            source, result = await coro
+            completed += 1
+            url = source.get("bookSourceUrl", "")
+            results[url] = result
+
+            if result["status"] == "invalid":
+                invalid.append(source)
+                name, step = next((n, s) for n, s in result["steps"].items() if s["status"] == "fail")
+                errors[url] = f"{name}: {step.get('error', '')}"
+            else:
+                valid.append(source)
+
+            if journal:
+                journal.append({"url": url, "valid": result["status"] != "invalid",
+                                "error": errors.get(url), "functional": result})
+
+            print(f"\r进度：{completed}/{total} ({completed*100//total}%)", end="", flush=True)
+
+    print()  # 换行
+
+    stats = {
+        "unverifiable": sum(1 for r in results.values() if r["status"] == "unverifiable"),
+        **prober.report(),
+        "steps": summarize_steps(results),
+        "functional": results
+    }
+    return valid, invalid, errors, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地替身服务，校验搜索 -> 详情 -> 目录 -> 正文四个步骤"
+                                                 "（校验真实书源请用 validate.py --functional）")
+    parser.add_argument("--timeout", "-t", type=int, default=DEFAULT_TIMEOUT, help=f"超时时间（秒），默认 {DEFAULT_TIMEOUT}")
+    args = parser.parse_args()
+
+    result = asyncio.run(check_stand_in(args.timeout))
+    for name in STEPS:
+        step = result["steps"].get(name)
+        if step is None:
+            print(f"  [{name}] 未执行")
+        else:
+            print(f"  [{name}] {step['status']} {step['ms']} ms" + (f"：{step['error']}" if "error" in step else ""))
+
+    missing = [name for name in STEPS if result["steps"].get(name, {}).get("status") != "pass"]
+    if missing:
+        print(f"错误：替身书源未通过的步骤 {', '.join(missing)}")
+        return 1
+    print("替身书源：四个步骤均通过")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
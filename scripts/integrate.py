@@ -1,30 +1,52 @@
 #!/usr/bin/env python3
 """
 书源智能整合脚本
-- 多维度质量评分
-- 智能去重（URL/域名）
+- 多维度质量评分（见 scoring.py）
+- 智能去重（URL / 可注册域名 / IP 镜像，见 domains.py）
+- 可选：按规则指纹去除近似重复的克隆书源（--fingerprint，见 fingerprint.py）；
+  指纹不区分站点地址，同一建站模板的不同站点也会被归为一组，因此默认关闭
+- 增量处理：按内容哈希复用筛选条件、评分、清洗结果、规则指纹与站点（见 manifest.py），
+  智能去重只对成员或评分有变化的站点重新排名；--full 全量重建，--check 对比两者
 - 可选有效性校验
+- 运行指标：--metrics / --profile（见 metrics.py）
 """
 
-import json
 import re
+import copy
 import time
+import asyncio
 import argparse
-import urllib.request
-import ssl
 from pathlib import Path
-from urllib.parse import urlparse
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+import jsonio
+import metrics
+from scoring import score_sources, stable_until
+from domains import SourceIndex, INDEX_PATH, PSL_PATH
+from fingerprint import keep_best, features, encode_features, decode_features
+from manifest import Manifest, MANIFEST_DIR, code_digest, file_digest
 
 # 配置
 MAX_SOURCES = 1500
 MAX_RESPOND_TIME = 10000
 MIN_SCORE = 25
 MAX_PER_DOMAIN = 2
-CONCURRENCY = 30
 EXISTING_BONUS = 5  # 现有书源信任加分
 
+# 默认输入、输出与备份路径
+BASE_DIR = Path(__file__).parent.parent
+EXISTING_PATH = BASE_DIR / "sources/legado/full.json"
+NEW_PATH = BASE_DIR / "sources/legado/yiove_new.json"
+OUTPUT_PATH = BASE_DIR / "sources/legado/full.json"
+BACKUP_PATH = BASE_DIR / "sources/legado/full.backup.json"
+
+# 增量清单（派生逻辑：本脚本的筛选与清洗 + 评分 + 规则指纹 + 站点索引）
+MANIFEST_PATH = MANIFEST_DIR / "integrate_manifest.json"
+DERIVED_FROM = [Path(__file__)] + [Path(__file__).parent / name for name in (
+    "scoring.py", "scoring.json", "fingerprint.py", "domains.py")] + [PSL_PATH]
+
 # Emoji 正则
 EMOJI_PATTERN = re.compile(
     "["
@@ -39,285 +61,354 @@ EMOJI_PATTERN = re.compile(
     flags=re.UNICODE
 )
 
-# SSL 上下文
-SSL_CTX = ssl.create_default_context()
-SSL_CTX.check_hostname = False
-SSL_CTX.verify_mode = ssl.CERT_NONE
-
-
-def calculate_quality_score(source: dict, bonus: int = 0) -> int:
-    """多维度质量评分（满分 60 + bonus）"""
-    score = bonus
-
-    # 基础状态 (0-7)
-    if source.get('enabled', True):
-        score += 5
-    if source.get('enabledExplore'):
-        score += 2
-
-    # 响应时间 (0-15)
-    rt = source.get('respondTime', 99999)
-    if rt < 1000:
-        score += 15
-    elif rt < 3000:
-        score += 12
-    elif rt < 5000:
-        score += 8
-    elif rt < 10000:
-        score += 4
-
-    # 规则完整性 (0-20)
-    if source.get('searchUrl'):
-        score += 4
-    if source.get('ruleSearch') or source.get('searchRule'):
-        score += 4
-    if source.get('ruleToc') or source.get('tocRule'):
-        score += 4
-    if source.get('ruleContent') or source.get('contentRule'):
-        score += 6
-    if source.get('exploreUrl'):
-        score += 2
-
-    # 更新时间 (0-10)
-    last = source.get('lastUpdateTime', 0)
-    if last:
-        days = (time.time() * 1000 - last) / 86400000
-        days = max(0, days)  # 防止未来时间导致负数
-        if days < 30:
-            score += 10
-        elif days < 90:
-            score += 7
-        elif days < 180:
-            score += 4
-        elif days < 365:
-            score += 2
-
-    # 权重 (0-5)
-    score += min(source.get('weight', 0) // 100, 5)
-
-    return score
-
-
-def normalize_url(url: str) -> str:
-    """URL 规范化"""
-    url = re.sub(r'#[^\s]*$', '', url)
-    url = url.rstrip('/')
-    url = url.replace('http://', 'https://')
-    return url
-
-
-def get_domain(url: str) -> str:
-    """提取域名"""
-    try:
-        return urlparse(url).netloc
-    except Exception:
-        return url
+
+def cleaned_fields(source: dict) -> dict:
+    """清洗后的名称、分组（只包含书源中已有的字段）"""
+    return {field: EMOJI_PATTERN.sub('', source[field]).strip()
+            for field in ('bookSourceName', 'bookSourceGroup') if field in source}
 
 
 def clean_source(source: dict) -> dict:
     """清洗书源"""
-    if 'bookSourceName' in source:
-        source['bookSourceName'] = EMOJI_PATTERN.sub('', source['bookSourceName']).strip()
-    if 'bookSourceGroup' in source:
-        source['bookSourceGroup'] = EMOJI_PATTERN.sub('', source['bookSourceGroup']).strip()
+    source.update(cleaned_fields(source))
     return source
 
 
-def filter_sources(sources: list, check_respond_time: bool = True) -> list:
-    """筛选书源"""
-    filtered = []
-    for s in sources:
-        # 类型筛选
-        if s.get('bookSourceType', 0) != 0:
-            continue
-        # 响应时间筛选
-        if check_respond_time and s.get('respondTime', 99999) > MAX_RESPOND_TIME:
-            continue
-        # 基础规则筛选
-        if not s.get('searchUrl'):
-            continue
-        if not (s.get('ruleContent') or s.get('contentRule')):
-            continue
-        # 评分筛选
-        if calculate_quality_score(s) < MIN_SCORE:
-            continue
-        filtered.append(s)
-    return filtered
-
-
-def smart_dedupe(sources: list, score_cache: dict, target_domains: int = 1000) -> list:
-    """智能去重（优先保证域名多样性）"""
-    # 1. URL 去重（保留高分）
-    url_map = {}
-    for s in sources:
-        url = normalize_url(s.get('bookSourceUrl', ''))
-        if not url:
-            continue
-        score = score_cache.get(id(s), calculate_quality_score(s))
-        if url not in url_map or score > url_map[url][1]:
-            url_map[url] = (s, score)
-
-    sources = [v[0] for v in url_map.values()]
-    print(f"    URL 去重后: {len(sources)}")
-
-    # 2. 按域名分组，每个域名按评分排序
-    domain_map = defaultdict(list)
-    for s in sources:
-        url = s.get('bookSourceUrl', '')
-        domain = get_domain(url)
-        score = score_cache.get(id(s), calculate_quality_score(s))
-        domain_map[domain].append((s, score))
-
-    for domain in domain_map:
-        domain_map[domain].sort(key=lambda x: -x[1])
-
-    # 3. 优先保证域名多样性
-    # 第一轮：每个域名取最高分的 1 个
-    result = []
-    domains_used = set()
-
-    # 按域名最高分排序
-    sorted_domains = sorted(domain_map.keys(),
-                           key=lambda d: -domain_map[d][0][1] if domain_map[d] else 0)
-
-    for domain in sorted_domains:
-        if len(domains_used) >= target_domains:
-            break
-        items = domain_map[domain]
-        if items:
-            result.append(items[0][0])
-            domains_used.add(domain)
-
-    print(f"    第一轮（每域名1个）: {len(result)} 个, {len(domains_used)} 个域名")
-
-    # 第二轮：补充第二个书源（如果还有配额）
-    remaining = MAX_SOURCES - len(result)
-    if remaining > 0:
-        second_sources = []
-        for domain in sorted_domains:
-            items = domain_map[domain]
-            if len(items) > 1:
-                second_sources.append((items[1][0], items[1][1]))
-
-        # 按评分排序，取剩余配额
-        second_sources.sort(key=lambda x: -x[1])
-        for s, _ in second_sources[:remaining]:
-            result.append(s)
-
-    print(f"    最终去重后: {len(result)} 个, {len(domains_used)} 个域名")
-    return result
+def eligibility(source: dict) -> list:
+    """评分以外的筛选条件：[宽松筛选是否通过, 严格筛选（检查响应时间）是否通过]"""
+    # 类型与基础规则筛选
+    ok = (source.get('bookSourceType', 0) == 0 and bool(source.get('searchUrl'))
+          and bool(source.get('ruleContent') or source.get('contentRule')))
+    # 响应时间筛选
+    return [ok, ok and source.get('respondTime', 99999) <= MAX_RESPOND_TIME]
 
 
-def head_check(url: str) -> bool:
-    """HEAD 请求校验"""
-    try:
-        req = urllib.request.Request(url, method='HEAD', headers={
-            'User-Agent': 'Mozilla/5.0 (Linux; Android 10) AppleWebKit/537.36'
-        })
-        with urllib.request.urlopen(req, timeout=5, context=SSL_CTX) as resp:
-            return resp.status < 400
-    except Exception:
-        return False
+def timed_scores(sources: list, now: float) -> list:
+    """评分及其有效期：[评分, 计算时间, 截止时间（评分不再变化时为 None）]"""
+    until = stable_until(sources, now)
+    return [[int(score), now, None if np.isinf(t) else float(t)]
+            for score, t in zip(score_sources(sources, now=now), until)]
 
 
-def validate_sources(sources: list) -> list:
-    """批量校验"""
-    valid = []
-    total = len(sources)
-
-    print(f"校验 {total} 个书源...")
-
-    def check_one(s):
-        url = s.get('bookSourceUrl', '')
-        if url and head_check(url):
-            return s
-        return None
+def filter_sources(sources: list, check_respond_time: bool = True, now: float = None,
+                   eligible: list = None, scores: list = None) -> list:
+    """
+    筛选书源（评分放在最后，对通过其他条件的书源整批计算）
 
-    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
-        futures = {executor.submit(check_one, s): s for s in sources}
-        done = 0
-        for future in as_completed(futures):
-            done += 1
-            result = future.result()
-            if result:
-                valid.append(result)
-            if done % 100 == 0:
-                print(f"  进度: {done}/{total}, 有效: {len(valid)}")
-
-    return valid
+    eligible（见 eligibility）、scores 为与 sources 对应的已知筛选条件与评分，缺省时现算
+    """
+    with metrics.stage("filter", len(sources), "integrate") as record:
+        if eligible is None:
+            eligible = [eligibility(s) for s in sources]
+        candidates = [i for i, e in enumerate(eligible) if e[check_respond_time]]
 
+        # 评分筛选
+        if scores is None:
+            candidate_scores = score_sources([sources[i] for i in candidates], now=now)
+        else:
+            candidate_scores = [scores[i] for i in candidates]
+        result = [sources[i] for i, score in zip(candidates, candidate_scores) if score >= MIN_SCORE]
+        metrics.count("filter.below_min_score", len(candidates) - len(result))
+        record["items_out"] = len(result)
+    return result
 
-def main():
-    parser = argparse.ArgumentParser(description="书源智能整合脚本")
-    parser.add_argument("--validate", "-v", action="store_true", help="启用网络校验")
-    parser.add_argument("--max", "-m", type=int, default=MAX_SOURCES, help="最大书源数量")
-    parser.add_argument("--domains", "-d", type=int, default=1000, help="目标域名数量")
-    args = parser.parse_args()
 
-    base_dir = Path(__file__).parent.parent
-    existing_path = base_dir / "sources/legado/full.json"
-    new_path = base_dir / "sources/legado/yiove_new.json"
-    output_path = base_dir / "sources/legado/full.json"
-    backup_path = base_dir / "sources/legado/full.backup.json"
+def site_entry(index: SourceIndex, source: dict) -> list:
+    """站点去重用的索引项：[URL 去重键, 主机, 可注册域名]"""
+    entry = index.entry(source.get('bookSourceUrl', ''))
+    return [entry["key"], entry["host"], entry["domain"]]
+
+
+def smart_dedupe(sources: list, scores: list, index: SourceIndex, target_domains: int = 1000,
+                 entries: list = None, rankings: dict = None) -> list:
+    """
+    智能去重（优先保证站点多样性）
+
+    URL 去重键、站点键（可注册域名，含 IP 镜像归并）来自 index，scores 与 sources 一一对应；
+    entries 为与 sources 对应的已知索引项（见 site_entry），缺省时现算
+    rankings 不为空时为上次的 {站点: [[[去重键, 评分], ...], 排名]}（成员按出现顺序，排名为成员序号），
+    成员、评分与顺序都未变化的站点沿用上次的排名，本次的排名写回 rankings
+
+    返回: 保留书源在 sources 中的位置列表
+    """
+    with metrics.stage("dedupe", len(sources), "site") as record:
+        if entries is None:
+            entries = [site_entry(index, s) for s in sources]
+
+        # 1. URL 去重（保留高分）
+        url_best = {}
+        for i, (key, _, _) in enumerate(entries):
+            if not key:
+                continue
+            if key not in url_best or scores[i] > scores[url_best[key]]:
+                url_best[key] = i
+
+        kept = list(url_best.values())
+        print(f"    URL 去重后: {len(kept)}")
+
+        # 2. 按站点分组，每个站点按评分排序（成员未变化的站点沿用上次的排名）
+        owners = index.mirror_owners()
+        site_map = defaultdict(list)
+        for i in kept:
+            site_map[index.site_key(entries[i][1], entries[i][2], owners)].append(i)
+
+        previous = rankings if rankings is not None else {}
+        current = {}
+        reused = 0
+        for site, members in site_map.items():
+            signature = [[entries[i][0], scores[i]] for i in members]
+            cached = previous.get(site)
+            if cached is not None and cached[0] == signature:
+                order = cached[1]
+                reused += 1
+            else:
+                order = sorted(range(len(members)), key=lambda n: -scores[members[n]])
+            current[site] = [signature, order]
+            site_map[site] = [members[n] for n in order]
+        metrics.count("dedupe.sites_reused", reused)
+        metrics.count("dedupe.sites_ranked", len(site_map) - reused)
+        if rankings is not None:
+            rankings.clear()
+            rankings.update(current)
+
+        # 按站点最高分排序
+        sorted_sites = sorted(site_map, key=lambda d: -scores[site_map[d][0]])
+
+        # 3. 优先保证站点多样性
+        # 第一轮：每个站点取最高分的 1 个
+        sites_used = sorted_sites[:target_domains]
+        result = [site_map[d][0] for d in sites_used]
+
+        print(f"    第一轮（每站点1个）: {len(result)} 个, {len(sites_used)} 个站点")
+
+        # 后续轮次：每个站点补充到 MAX_PER_DOMAIN 个（如果还有配额）
+        remaining = MAX_SOURCES - len(result)
+        if remaining > 0:
+            extra = [i for d in sorted_sites for i in site_map[d][1:MAX_PER_DOMAIN]]
+
+            # 按评分排序，取剩余配额
+            extra.sort(key=lambda i: -scores[i])
+            result.extend(extra[:remaining])
+
+        print(f"    最终去重后: {len(result)} 个, {len(sites_used)} 个站点")
+        record["items_out"] = len(result)
+    return result
 
-    # 读取现有书源
-    print("读取现有书源...")
-    with open(existing_path, 'r', encoding='utf-8') as f:
-        existing = json.load(f)
-    print(f"  现有: {len(existing)} 个")
 
-    # 读取新书源
-    print("读取新书源...")
-    with open(new_path, 'r', encoding='utf-8') as f:
-        new_sources = json.load(f)
-    print(f"  新增: {len(new_sources)} 个")
+def validate_sources(sources: list) -> list:
+    """批量校验（与 validate.py 相同的探测逻辑，见 probe.py），返回与 sources 对应的是否有效列表"""
+    import validate
+
+    print(f"校验 {len(sources)} 个书源...")
+    _, _, errors, _ = asyncio.run(validate.validate_sources(sources))
+    return [s.get('bookSourceUrl', '') not in errors for s in sources]
+
+
+def decision_keys(existing: list, new_sources: list) -> list:
+    """处理结论键：来源:书源地址（同一来源中重复的地址追加 #序号），与 existing + new_sources 一一对应"""
+    keys = []
+    counts = defaultdict(int)
+    for label, group in (("existing", existing), ("new", new_sources)):
+        for s in group:
+            key = f"{label}:{s.get('bookSourceUrl', '')}"
+            counts[key] += 1
+            keys.append(key if counts[key] == 1 else f"{key}#{counts[key]}")
+    return keys
+
+
+def file_hashes(manifest: Manifest, path: Path, sources: list) -> list:
+    """输入文件中书源的内容哈希：文件未变化时取清单记录，否则逐个计算并登记"""
+    digest = file_digest(path)
+    entries = manifest.file_entries(digest)
+    if entries is not None and len(entries) == len(sources):
+        return [h for _, h in entries]
+    hashes = manifest.track(sources)
+    manifest.add_file(digest, hashes, sources)
+    return hashes
+
+
+def integrate(existing: list, new_sources: list, args, manifest: Manifest, now: float, validator=None,
+              hashes: list = None) -> tuple:
+    """
+    筛选、清洗、评分、去重、取 top（会就地清洗传入的书源）
+
+    筛选条件、清洗结果、规则指纹、站点索引项按内容哈希从 manifest 复用，只对新增、变化的书源重新计算；
+    评分同样复用，直到 lastUpdate 跨过下一个衰减阶梯；智能去重沿用成员未变化站点的排名
+    hashes 为与 existing + new_sources 对应的内容哈希（见 file_hashes），缺省时逐个计算
+    处理结论按 decision_keys 记录，同一书源同时出现在现有与新书源中时各自记录
+    args.validate 时用 validator（默认 validate_sources）校验去重后的书源，返回与之对应的是否有效列表
+
+    返回: (最终书源列表, 与之对应的评分列表, 统计)
+    """
+    # 内容哈希按清洗前的原始书源计算
+    sources = existing + new_sources
+    if hashes is None:
+        hashes = manifest.track(sources)
+    position = {id(s): i for i, s in enumerate(sources)}
+    keys = decision_keys(existing, new_sources)
+    decisions = dict.fromkeys(keys, "filtered")
+
+    # 筛选条件与评分（不含信任加分）
+    eligible = manifest.derive(hashes, sources, "eligible", lambda batch: [eligibility(s) for s in batch])
+    base_scores = [value[0] for value in manifest.derive(
+        hashes, sources, "score", lambda batch: timed_scores(batch, now),
+        fresh=lambda value: value[1] <= now and (value[2] is None or now < value[2]))]
+    split = len(existing)
 
     # 筛选新书源（严格筛选）
     print("\n筛选新书源...")
-    new_filtered = filter_sources(new_sources, check_respond_time=True)
+    new_filtered = filter_sources(new_sources, check_respond_time=True, now=now,
+                                  eligible=eligible[split:], scores=base_scores[split:])
     print(f"  筛选后: {len(new_filtered)} 个")
 
     # 筛选现有书源（宽松筛选，不检查响应时间）
     print("筛选现有书源...")
-    existing_filtered = filter_sources(existing, check_respond_time=False)
+    existing_filtered = filter_sources(existing, check_respond_time=False, now=now,
+                                       eligible=eligible[:split], scores=base_scores[:split])
     print(f"  筛选后: {len(existing_filtered)} 个")
 
-    # 清洗
-    print("清洗书源...")
-    new_filtered = [clean_source(s) for s in new_filtered]
-    existing_filtered = [clean_source(s) for s in existing_filtered]
-
-    # 预计算评分并缓存（现有书源有信任加分）
-    print("\n计算评分...")
-    score_cache = {}
-    for s in existing_filtered:
-        score_cache[id(s)] = calculate_quality_score(s, bonus=EXISTING_BONUS)
-    for s in new_filtered:
-        score_cache[id(s)] = calculate_quality_score(s, bonus=0)
-
     # 合并
     print("\n合并书源...")
     all_sources = existing_filtered + new_filtered
+    positions = [position[id(s)] for s in all_sources]
+    all_hashes = [hashes[p] for p in positions]
     print(f"  合并前: {len(all_sources)} 个")
 
+    # 清洗
+    print("清洗书源...")
+    with metrics.stage("clean", len(all_sources), "integrate") as record:
+        fields = manifest.derive(all_hashes, all_sources, "clean", lambda batch: [cleaned_fields(s) for s in batch])
+        for s, cleaned in zip(all_sources, fields):
+            s.update(cleaned)
+        record["items_out"] = len(all_sources)
+
+    # 评分（现有书源有信任加分），与 all_sources 按位置对应
+    print("计算评分...")
+    scores = [base_scores[p] + (EXISTING_BONUS if p < split else 0) for p in positions]
+
+    # 规则指纹：近似重复的克隆书源每组只保留评分最高的
+    if args.fingerprint:
+        print("规则指纹去重...")
+        items = manifest.derive(all_hashes, all_sources, "fingerprint",
+                                lambda batch: [encode_features(features(s)) for s in batch])
+        kept, clusters = keep_best(all_sources, scores, items=[decode_features(item) for item in items])
+        print(f"  近似重复: {len(clusters)} 组，去除 {len(all_sources) - len(kept)} 个")
+        decisions.update((keys[p], "clone") for p in positions)
+        all_sources = [all_sources[i] for i in kept]
+        positions = [positions[i] for i in kept]
+        all_hashes = [all_hashes[i] for i in kept]
+        scores = [scores[i] for i in kept]
+
+    # 站点索引
+    print("加载站点索引...")
+    index = SourceIndex.load(Path(args.index))
+    entries = manifest.derive(all_hashes, all_sources, "site", lambda batch: [site_entry(index, s) for s in batch])
+    if args.resolve:
+        print(f"  DNS 解析: {asyncio.run(index.resolve([host for _, host, _ in entries]))} 个主机")
+
     # 去重
     print("智能去重...")
-    deduped = smart_dedupe(all_sources, score_cache, target_domains=args.domains)
-    print(f"  去重后: {len(deduped)} 个")
+    kept = smart_dedupe(all_sources, scores, index, target_domains=args.domains,
+                        entries=entries, rankings=manifest.sites)
+    print(f"  去重后: {len(kept)} 个")
+    if not args.check:
+        index.save(Path(args.index))
+    decisions.update((keys[p], "duplicate") for p in positions)
 
     # 可选：网络校验
     if args.validate:
         print("\n有效性校验...")
-        deduped = validate_sources(deduped)
-        print(f"  有效: {len(deduped)} 个")
+        with metrics.stage("validate", len(kept)) as record:
+            valid = (validator or validate_sources)([all_sources[i] for i in kept])
+            decisions.update((keys[positions[i]], "invalid") for i in kept)
+            kept = [i for i, ok in zip(kept, valid) if ok]
+            record["items_out"] = len(kept)
+        print(f"  有效: {len(kept)} 个")
 
     # 排序取 top
     max_count = args.max
     print(f"\n按评分排序，取 top {max_count}...")
-    deduped.sort(key=lambda x: -score_cache.get(id(x), calculate_quality_score(x)))
-    final = deduped[:max_count]
+    kept.sort(key=lambda i: -scores[i])
+    decisions.update((keys[positions[i]], "cut") for i in kept[max_count:])
+    decisions.update((keys[positions[i]], "kept") for i in kept[:max_count])
+    final = [all_sources[i] for i in kept[:max_count]]
     print(f"  最终: {len(final)} 个")
 
+    stats = {
+        "existing_filtered": len(existing_filtered),
+        "new_filtered": len(new_filtered),
+        "deduped": len(kept),
+        "changed_decisions": manifest.decide(decisions)
+    }
+    return final, [scores[i] for i in kept[:max_count]], stats
+
+
+def check(existing: list, new_sources: list, args, manifest: Manifest, hashes: list = None) -> int:
+    """分别用增量清单与空清单（全量）整合，对比结果是否一致（不写入任何文件）"""
+    now = time.time() * 1000
+    print("=== 增量 ===")
+    incremental, _, _ = integrate(copy.deepcopy(existing), copy.deepcopy(new_sources), args, manifest, now,
+                                  hashes=hashes)
+    print("\n=== 全量 ===")
+    full, _, _ = integrate(existing, new_sources, args, Manifest(manifest.salt), now)
+
+    if incremental == full:
+        print(f"\n一致：增量与全量结果相同（{len(full)} 个书源）")
+        return 0
+    differ = sum(1 for a, b in zip(incremental, full) if a != b) + abs(len(incremental) - len(full))
+    print(f"\n不一致：增量 {len(incremental)} 个，全量 {len(full)} 个，{differ} 处不同")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源智能整合脚本")
+    parser.add_argument("--validate", "-v", action="store_true", help="启用网络校验")
+    parser.add_argument("--max", "-m", type=int, default=MAX_SOURCES, help="最大书源数量")
+    parser.add_argument("--domains", "-d", type=int, default=1000, help="目标站点（可注册域名）数量")
+    parser.add_argument("--index", default=str(INDEX_PATH), help="站点索引文件（跨次运行复用）")
+    parser.add_argument("--resolve", action="store_true", help="DNS 解析主机 IP，用于归并 IP 镜像")
+    parser.add_argument("--fingerprint", action="store_true", help="按规则指纹去除近似重复书源（每组保留评分最高的）")
+    parser.add_argument("--manifest", default=str(MANIFEST_PATH), help="增量清单文件（跨次运行复用）")
+    parser.add_argument("--full", action="store_true", help="忽略增量清单，全量重建")
+    parser.add_argument("--check", action="store_true", help="对比增量与全量结果是否一致（不写入文件）")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    parser.add_argument("--existing", default=str(EXISTING_PATH), help="现有书源文件")
+    parser.add_argument("--new", default=str(NEW_PATH), help="新书源文件")
+    parser.add_argument("--output", "-o", default=str(OUTPUT_PATH), help="输出文件路径")
+    parser.add_argument("--backup", default=str(BACKUP_PATH), help="输出前备份现有书源的路径")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    if args.check and args.validate:
+        print("错误：--check 不进行网络校验，不能与 --validate 同时使用")
+        return 1
+
+    existing_path = Path(args.existing)
+    new_path = Path(args.new)
+    output_path = Path(args.output)
+    backup_path = Path(args.backup)
+
+    # 并发读取现有书源与新书源
+    print("读取书源...")
+    existing, new_sources = jsonio.load_many([existing_path, new_path])
+    print(f"  现有: {len(existing)} 个")
+    print(f"  新增: {len(new_sources)} 个")
+
+    # 增量清单
+    salt = code_digest(DERIVED_FROM)
+    manifest = Manifest(salt) if args.full else Manifest.load(Path(args.manifest), salt)
+
+    # 未变化的输入文件直接取清单中的内容哈希
+    hashes = [h for path, sources in ((existing_path, existing), (new_path, new_sources))
+              for h in file_hashes(manifest, path, sources)]
+
+    if args.check:
+        return check(existing, new_sources, args, manifest, hashes)
+
+    counts = len(existing), len(new_sources)
+    final, scores, stats = integrate(existing, new_sources, args, manifest, time.time() * 1000, hashes=hashes)
+
     # 备份
     if existing_path.exists():
         import shutil
@@ -325,25 +416,31 @@ def main():
         print(f"\n已备份到: {backup_path}")
 
     # 输出
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
+    jsonio.dump(final, output_path, args.compact)
     print(f"输出到: {output_path}")
 
+    added, changed, removed = manifest.churn()
+    manifest.save(Path(args.manifest))
+
     # 统计
     print("\n=== 统计 ===")
-    print(f"原有书源: {len(existing)} -> 筛选后 {len(existing_filtered)}")
-    print(f"新增书源: {len(new_sources)} -> 筛选后 {len(new_filtered)}")
-    print(f"合并去重: {len(deduped)}")
+    print(f"原有书源: {counts[0]} -> 筛选后 {stats['existing_filtered']}")
+    print(f"新增书源: {counts[1]} -> 筛选后 {stats['new_filtered']}")
+    print(f"合并去重: {stats['deduped']}")
     print(f"最终输出: {len(final)}")
+    print(f"增量: 新增 {added}、变化 {changed}、删除 {removed} 个，复用 {manifest.reused()} 个，"
+          f"结论变化 {stats['changed_decisions']} 个")
 
     # 评分分布
-    scores = [score_cache.get(id(s), calculate_quality_score(s)) for s in final]
     print(f"\n评分分布:")
     print(f"  50-65: {sum(1 for s in scores if s >= 50)}")
     print(f"  40-49: {sum(1 for s in scores if 40 <= s < 50)}")
     print(f"  30-39: {sum(1 for s in scores if 30 <= s < 40)}")
     print(f"  25-29: {sum(1 for s in scores if 25 <= s < 30)}")
 
+    metrics.finish(args)
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+JSON 读写
+- 已安装 orjson 时用它解析和序列化，否则使用标准库 json；orjson 不支持的输入
+  （NaN 等）自动回退到标准库；orjson 把超出 64 位的整数静默解析为浮点数，
+  数值位置上出现 19 位及以上整数的输入直接交给标准库解析
+- 美化输出（默认）与 json.dump(ensure_ascii=False, indent=2) 相同；
+  orjson 下仅指数形式的浮点数写法不同（1e16 / 1e+16）
+- 紧凑输出（compact）：不含空白，适合发布和中间文件
+- 多个输入文件并发读取（线程池：读盘与解析重叠，无 GIL 的解释器上解析也并行）
+- 原子写出：先写同目录临时文件再替换，写出中断不会留下半个文件
+- 读写记为 read / write 阶段，读写字节数计入 json.bytes_read / json.bytes_written（见 metrics.py）
+"""
+
+import os
+import json
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 可用的后端（按优先级）
+BACKENDS = (["orjson"] if orjson else []) + ["json"]
+
+# 默认后端
+BACKEND = BACKENDS[0]
+
+# 可能超出 64 位的整数：数值位置（开头或 [ : , 之后）上 19 位及以上的整数。
+# 先把数字都换成 0 再找连续的 0（比正则快得多），字符串里的长数字串再按前一个字符排除；
+# 误判只影响速度
+LONG_DIGITS = 19
+_DIGIT_MASK = bytes.maketrans(b"123456789", b"000000000")
+_DIGIT_RUN = b"0" * LONG_DIGITS
+
+# 并发读取的最大线程数
+LOAD_WORKERS = 8
+
+# 新建文件的权限（与 open() 相同，受 umask 约束）
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+def needs_stdlib(data) -> bool:
+    """输入含可能超出 64 位的整数，只能交给标准库解析"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    masked = data.translate(_DIGIT_MASK)
+    start = masked.find(_DIGIT_RUN)
+    while start != -1:
+        i = start
+        while i and data[i - 1] in b" \t\r\n-":
+            i -= 1
+        if i == 0 or data[i - 1] in b"[:,":
+            return True
+        start = masked.find(_DIGIT_RUN, start + LONG_DIGITS)
+    return False
+
+
+def loads(data, backend: str = None):
+    """解析 JSON（bytes 或 str）"""
+    if (backend or BACKEND) == "orjson" and not needs_stdlib(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps(data, compact: bool = False, backend: str = None) -> bytes:
+    """序列化为 UTF-8 字节（compact 为 False 时缩进 2 格）"""
+    if (backend or BACKEND) == "orjson":
+        try:
+            return orjson.dumps(data, option=0 if compact else orjson.OPT_INDENT_2)
+        except TypeError:
+            pass
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def canonical(data, backend: str = None) -> bytes:
+    """键排序的紧凑 JSON（用于内容哈希）"""
+    if (backend or BACKEND) == "orjson":
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def size_of(data):
+    """书源数组的条数（其他数据为 None），用于阶段记录"""
+    return len(data) if isinstance(data, list) else None
+
+
+def load(path: Path, backend: str = None):
+    """读取 JSON 文件"""
+    path = Path(path)
+    with metrics.stage("read", detail=path.name) as record:
+        payload = path.read_bytes()
+        metrics.count("json.bytes_read", len(payload))
+        data = loads(payload, backend)
+        record["items_out"] = size_of(data)
+    return data
+
+
+def load_many(paths: list, backend: str = None) -> list:
+    """并发读取多个 JSON 文件，结果与 paths 顺序一致"""
+    paths = [Path(p) for p in paths]
+    if len(paths) < 2:
+        return [load(p, backend) for p in paths]
+    with metrics.stage("read", detail=f"{len(paths)} 个文件") as record:
+        with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(paths))) as executor:
+            result = list(executor.map(lambda p: loads(p.read_bytes(), backend), paths))
+        metrics.count("json.bytes_read", sum(p.stat().st_size for p in paths))
+        sizes = [size_of(data) for data in result]
+        record["items_out"] = None if None in sizes else sum(sizes)
+    return result
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "wb", encoding: str = None):
+    """
+    原子写出：写入同目录下的临时文件，正常结束后替换目标文件（自动创建目录）
+
+    出错时删除临时文件，目标文件保持不变
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        # 临时文件默认只有属主可读写，改为目标文件原有权限或新建文件的默认权限
+        os.chmod(temp, path.stat().st_mode & 0o7777 if path.exists() else FILE_MODE)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def dump(data, path: Path, compact: bool = False, backend: str = None):
+    """原子写出 JSON 文件"""
+    with metrics.stage("write", size_of(data), Path(path).name):
+        payload = dumps(data, compact, backend)
+        with atomic_open(path) as f:
+            f.write(payload)
+        metrics.count("json.bytes_written", len(payload))
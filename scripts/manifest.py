@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+增量处理清单
+- 每个书源按内容哈希（规范化 JSON 的 SHA-1）记录派生字段：清洗后的名称/分组、
+  合并比较元组、规则指纹、筛选条件、评分等；带有效期的字段（如随时间衰减的评分）过期后重新计算
+- 上次运行的处理结论按调用方给出的键记录（integrate.py 按 来源:书源地址），同一内容出现多次时互不覆盖
+- 内容未变的书源直接复用派生字段，只对新增、变化的书源重新计算；已删除的书源在保存时移出清单
+- 输入文件按字节摘要记录书源列表（URL + 内容哈希），未变化的文件无需重新解析
+- 清单随派生逻辑（脚本源码、评分配置）的摘要失效，代码或配置变化后自动全量重建
+- integrate.py、merge.py 默认使用，--full 强制全量重建，--check 对比增量与全量结果
+"""
+
+import hashlib
+from pathlib import Path
+from collections import defaultdict
+
+import jsonio
+import metrics
+
+# 默认清单目录
+MANIFEST_DIR = Path(__file__).parent.parent / ".cache"
+
+# 清单文件格式版本
+MANIFEST_VERSION = 2
+
+
+def content_hash(source: dict) -> str:
+    """书源内容哈希（键排序的紧凑 JSON，字段顺序不影响结果）"""
+    return hashlib.sha1(jsonio.canonical(source)).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """文件字节摘要"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_digest(paths: list) -> str:
+    """派生逻辑摘要：相关脚本与配置文件的内容"""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    增量处理清单
+
+    entries: {内容哈希: {"url": 书源地址, 派生字段名: 值, ...}}
+    files: {文件字节摘要: [[书源地址, 内容哈希], ...]}
+    outputs: {输出文件路径: {"digest": 文件字节摘要, "hashes": [内容哈希, ...]}}
+    decisions: {结论键: 上次的处理结论}
+    sites: {站点: 上次的成员排名}（见 integrate.smart_dedupe）
+    """
+
+    def __init__(self, salt: str = ""):
+        self.salt = salt
+        self.entries = {}
+        self.files = {}
+        self.outputs = {}
+        self.decisions = {}
+        self.sites = {}
+        self.loaded = set()  # 上次运行保存的内容哈希
+        self.seen = set()
+        self.seen_files = set()
+
+    @classmethod
+    def load(cls, path: Path, salt: str = "") -> "Manifest":
+        """读取清单（文件不存在、格式或派生逻辑摘要不符时返回空清单）"""
+        manifest = cls(salt)
+        path = Path(path)
+        if not path.exists():
+            return manifest
+        try:
+            data = jsonio.load(path)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") != MANIFEST_VERSION or data.get("salt") != salt:
+            return manifest
+        manifest.entries = data.get("entries", {})
+        manifest.files = data.get("files", {})
+        manifest.outputs = data.get("outputs", {})
+        manifest.decisions = data.get("decisions", {})
+        manifest.sites = data.get("sites", {})
+        manifest.loaded = set(manifest.entries)
+        return manifest
+
+    def save(self, path: Path):
+        """保存本次运行用到的条目（未用到的视为已删除）"""
+        data = {
+            "version": MANIFEST_VERSION,
+            "salt": self.salt,
+            "entries": {h: self.entries[h] for h in self.entries if h in self.seen},
+            "files": {d: self.files[d] for d in self.files if d in self.seen_files},
+            "outputs": self.outputs,
+            "decisions": self.decisions,
+            "sites": self.sites
+        }
+        jsonio.dump(data, path, compact=True)
+
+    def track(self, sources: list) -> list:
+        """登记一批书源，返回与之对应的内容哈希列表"""
+        hashes = [content_hash(s) for s in sources]
+        for h, s in zip(hashes, sources):
+            self.entries.setdefault(h, {"url": s.get("bookSourceUrl", "")})
+        self.seen.update(hashes)
+        return hashes
+
+    def derive(self, hashes: list, sources: list, field: str, compute, fresh=None) -> list:
+        """
+        派生字段：清单中已有的直接复用，其余由 compute(书源列表) 整批计算后写入
+
+        fresh 不为空时，fresh(缓存值) 为假的条目视为过期，与缺失的一起重新计算
+
+        返回: 与 hashes 对应的字段值列表
+        """
+        missing = [i for i, h in enumerate(hashes)
+                   if field not in self.entries[h] or (fresh is not None and not fresh(self.entries[h][field]))]
+        metrics.count(f"manifest.{field}.reused", len(hashes) - len(missing))
+        metrics.count(f"manifest.{field}.computed", len(missing))
+        if missing:
+            for i, value in zip(missing, compute([sources[i] for i in missing])):
+                self.entries[hashes[i]][field] = value
+        return [self.entries[h][field] for h in hashes]
+
+    def file_entries(self, digest: str):
+        """未变化输入文件的 [[书源地址, 内容哈希], ...]，文件有变化时返回 None"""
+        entries = self.files.get(digest)
+        if entries is not None:
+            self.seen_files.add(digest)
+            self.seen.update(h for _, h in entries)
+        return entries
+
+    def add_file(self, digest: str, hashes: list, sources: list):
+        self.files[digest] = [[s.get("bookSourceUrl", ""), h] for h, s in zip(hashes, sources)]
+        self.seen_files.add(digest)
+
+    def output_hashes(self, path: Path):
+        """上次输出文件中书源的内容哈希列表，输出文件不存在或已被改动时返回 None"""
+        record = self.outputs.get(str(path))
+        if record is None or not Path(path).exists() or file_digest(path) != record["digest"]:
+            return None
+        return record["hashes"]
+
+    def add_output(self, path: Path, hashes: list):
+        self.outputs[str(path)] = {"digest": file_digest(path), "hashes": hashes}
+
+    def decide(self, decisions: dict) -> int:
+        """记录本次处理结论 {结论键: 结论}（取代上次的全部结论），返回与上次结论不同的数量"""
+        changed = sum(1 for key, decision in decisions.items() if self.decisions.get(key) != decision)
+        self.decisions = dict(decisions)
+        return changed
+
+    def churn(self) -> tuple:
+        """按书源地址统计与上次运行相比的 (新增, 变化, 删除) 数量"""
+        def by_url(hashes):
+            urls = defaultdict(set)
+            for h in hashes:
+                urls[self.entries[h]["url"]].add(h)
+            return urls
+
+        current, previous = by_url(self.seen), by_url(self.loaded)
+        added = sum(1 for url in current if url not in previous)
+        changed = sum(1 for url, hashes in current.items() if url in previous and previous[url] != hashes)
+        removed = sum(1 for url in previous if url not in current)
+        return added, changed, removed
+
+    def reused(self) -> int:
+        """本次复用的条目数（上次已存在的内容哈希）"""
+        return len(self.seen & self.loaded)
@@ -2,93 +2,73 @@
 """
 书源合并脚本
 - 合并多个书源文件
-- 智能去重：相同 URL 保留质量更高的
+- 智能去重：相同 URL 保留质量更高的（比较元组见 scoring.merge_keys）
+- 可选：按规则指纹去除近似重复的克隆书源（--fingerprint，见 fingerprint.py）
 - 添加来源元信息
+- 流式合并（--stream）：逐个解析输入数组，只保留每个 URL 的比较元组与文件偏移，
+  再按偏移读回胜出的书源写出，内存与去重后的 URL 数量成正比，输出与普通模式逐字节相同
+- 输出为原子写出（见 jsonio.py），--compact 输出紧凑 JSON
+- 增量合并（默认）：按文件字节摘要与书源内容哈希复用比较元组、规则指纹（见 manifest.py），
+  未变化的输入文件不再解析，胜出书源优先从上次的输出读回；--full 全量重建，--check 对比两者
+- 运行指标：--metrics / --profile（见 metrics.py）
 """
 
 import json
+import codecs
 import argparse
 from pathlib import Path
 from datetime import datetime
 
+import jsonio
+import metrics
+from scoring import merge_keys
+from manifest import Manifest, MANIFEST_DIR, code_digest, file_digest
 
-def calculate_score(source: dict) -> tuple:
-    """
-    计算书源质量分数，返回元组用于比较
-    分数越高越好
-
-    优先级：
-    1. enabled: true 优先
-    2. lastUpdateTime 更新的优先
-    3. 规则更完整的优先
-    4. weight 更高的优先
-    5. customOrder 更小的优先
-    """
-    # 1. 是否启用 (权重最高)
-    enabled = 1 if source.get("enabled", True) else 0
-
-    # 2. 更新时间 (越新越好)
-    last_update = source.get("lastUpdateTime", 0)
-
-    # 3. 规则完整性
-    completeness = 0
-    # 有搜索规则
-    if source.get("searchUrl"):
-        completeness += 2
-    # 有正文规则
-    rule_content = source.get("ruleContent", {})
-    if isinstance(rule_content, dict) and rule_content.get("content"):
-        completeness += 2
-    # 有目录规则
-    rule_toc = source.get("ruleToc", {})
-    if isinstance(rule_toc, dict) and rule_toc.get("chapterList"):
-        completeness += 1
-    # 有书籍信息规则
-    rule_book_info = source.get("ruleBookInfo", {})
-    if isinstance(rule_book_info, dict) and rule_book_info.get("name"):
-        completeness += 1
-    # 有搜索规则
-    rule_search = source.get("ruleSearch", {})
-    if isinstance(rule_search, dict) and rule_search.get("bookList"):
-        completeness += 1
-
-    # 4. 权重
-    weight = source.get("weight", 0)
-
-    # 5. 排序 (越小越好，取负数)
-    order = -source.get("customOrder", 9999)
-
-    return (enabled, last_update, completeness, weight, order)
+# 增量清单的派生逻辑：比较元组（scoring.py + scoring.json）与规则指纹（fingerprint.py）
+DERIVED_FROM = [Path(__file__).parent / name for name in ("scoring.py", "scoring.json", "fingerprint.py")]
+
+# 流式读取块大小（字节）
+CHUNK_SIZE = 1 << 20
+
+# 流式合并：每批计算比较元组的书源数
+STREAM_BATCH = 1000
+
+# JSON 空白字符
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
 
 
 def smart_merge(*source_lists) -> tuple:
     """
     智能合并书源，相同 URL 保留质量更高的
 
+    优先级：启用 > 更新时间 > 规则完整性 > 权重 > customOrder 更小
+
     返回: (合并后的书源列表, 替换统计)
     """
     url_to_source = {}
     replaced_count = 0
 
-    for sources in source_lists:
-        for source in sources:
-            url = source.get("bookSourceUrl", "")
-            if not url:
-                continue
-
-            if url not in url_to_source:
-                url_to_source[url] = source
-            else:
-                # 比较分数，保留更好的
-                existing = url_to_source[url]
-                existing_score = calculate_score(existing)
-                new_score = calculate_score(source)
-
-                if new_score > existing_score:
-                    url_to_source[url] = source
+    with metrics.stage("merge", sum(map(len, source_lists))) as record:
+        for sources in source_lists:
+            # 整批预先计算比较元组
+            for source, score in zip(sources, merge_keys(sources)):
+                url = source.get("bookSourceUrl", "")
+                if not url:
+                    continue
+
+                if url not in url_to_source:
+                    url_to_source[url] = (source, score)
+                elif score > url_to_source[url][1]:
+                    # 比较分数，保留更好的
+                    url_to_source[url] = (source, score)
                     replaced_count += 1
 
-    return list(url_to_source.values()), replaced_count
+        metrics.count("merge.replaced", replaced_count)
+        record["items_out"] = len(url_to_source)
+
+    return [source for source, _ in url_to_source.values()], replaced_count
 
 
 def simple_merge(*source_lists) -> list:
@@ -98,80 +78,439 @@ def simple_merge(*source_lists) -> list:
     seen = set()
     merged = []
 
-    for sources in source_lists:
-        for source in sources:
-            url = source.get("bookSourceUrl", "")
-            if url and url not in seen:
-                seen.add(url)
-                merged.append(source)
+    with metrics.stage("merge", sum(map(len, source_lists)), "simple") as record:
+        for sources in source_lists:
+            for source in sources:
+                url = source.get("bookSourceUrl", "")
+                if url and url not in seen:
+                    seen.add(url)
+                    merged.append(source)
+        record["items_out"] = len(merged)
 
     return merged
 
 
+def meta_header(count: int, meta: dict = None) -> dict:
+    """元信息（_meta 字段）"""
+    return {
+        "version": datetime.now().strftime("%Y.%m.%d"),
+        "count": count,
+        "lastUpdate": datetime.now().isoformat(),
+        **(meta or {})
+    }
+
+
 def add_meta(sources: list, meta: dict = None) -> dict:
     """
     添加元信息
     """
-    if meta is None:
-        meta = {}
-
     return {
-        "_meta": {
-            "version": datetime.now().strftime("%Y.%m.%d"),
-            "count": len(sources),
-            "lastUpdate": datetime.now().isoformat(),
-            **meta
-        },
+        "_meta": meta_header(len(sources), meta),
         "sources": sources
     }
 
 
-def main():
-    parser = argparse.ArgumentParser(description="书源合并脚本")
-    parser.add_argument("--inputs", "-i", nargs="+", required=True, help="输入文件路径（可多个）")
-    parser.add_argument("--output", "-o", required=True, help="输出文件路径")
-    parser.add_argument("--meta", "-m", help="元信息 JSON 字符串")
-    parser.add_argument("--flat", "-f", action="store_true", help="输出扁平数组（不包含元信息）")
-    parser.add_argument("--simple", "-s", action="store_true", help="使用简单去重（保留第一个）")
-    args = parser.parse_args()
+class StreamReader:
+    """
+    增量 JSON 读取：按块读取 UTF-8 文件，逐个解码值并记录字节偏移
+    """
 
-    all_sources = []
+    def __init__(self, f):
+        self.f = f
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # buf[pos] 在文件中的字节偏移
+        self.eof = False
+
+    def fill(self) -> bool:
+        """读入下一块（丢弃已消费的部分），文件结束时返回 False"""
+        if self.eof:
+            return False
+        chunk = self.f.read(CHUNK_SIZE)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束返回空字符串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+                self.offset += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式错误：字节 {self.offset} 处应为 {char}")
+        self.pos += 1
+        self.offset += 1
+
+    def value(self) -> tuple:
+        """解码下一个值，返回 (字节偏移, 字节长度, 值)"""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # 数值可能被块边界截断，值后面还有字符或文件已结束才算完整
+                if end < len(self.buf) or self.eof:
+                    break
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+        start = self.offset
+        self.offset += len(self.buf[self.pos:end].encode("utf-8"))
+        self.pos = end
+        return start, self.offset - start, obj
+
+    def array(self):
+        """逐个产出数组元素 (字节偏移, 字节长度, 值)"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.expect("," if char == "," else "]")
+            if char != ",":
+                return
+
+
+def iter_sources(path: Path):
+    """
+    流式读取书源文件（顶层数组，或带元信息的 {"sources": [...]}）
+
+    逐个产出 (字节偏移, 字节长度, 书源)；格式不正确时抛出 ValueError
+    """
+    with open(path, "rb") as f:
+        reader = StreamReader(f)
+        char = reader.peek()
+        if char == "[":
+            yield from reader.array()
+            return
+        if char != "{":
+            raise ValueError("文件格式不正确")
+
+        reader.expect("{")
+        found = False
+        while reader.peek() != "}":
+            _, _, key = reader.value()
+            reader.expect(":")
+            if key == "sources" and reader.peek() == "[":
+                yield from reader.array()
+                found = True
+            else:
+                reader.value()
+            if reader.peek() == ",":
+                reader.expect(",")
+        if not found:
+            raise ValueError("文件格式不正确")
+
+
+def indented(data, prefix: str, compact: bool = False) -> str:
+    """与 jsonio.dumps 相同的格式，美化输出时嵌套在 prefix 缩进下"""
+    text = jsonio.dumps(data, compact).decode("utf-8")
+    return text if compact else text.replace("\n", "\n" + prefix)
+
+
+def stream_merge(paths: list, output_path: Path, simple: bool = False, flat: bool = False, meta: dict = None,
+                 compact: bool = False) -> tuple:
+    """
+    流式合并：与 smart_merge/simple_merge + jsonio.dump 的输出逐字节相同
+
+    第一遍只保留 {URL: (比较元组, 文件序号, 字节偏移, 字节长度)}，第二遍按偏移读回胜出的书源写出
 
-    for input_file in args.inputs:
+    返回: (合并前总数, 去重后总数, 替换统计)；没有有效输入文件时返回 None
+    """
+    index = {}
+    replaced = 0
+    total = 0
+    files = []
+
+    def add_batch(file_no, batch):
+        nonlocal replaced
+        keys = merge_keys([s for _, _, s in batch]) if not simple else [None] * len(batch)
+        for (offset, length, source), key in zip(batch, keys):
+            url = source.get("bookSourceUrl", "")
+            if not url:
+                continue
+            entry = index.get(url)
+            if entry is None:
+                index[url] = (key, file_no, offset, length)
+            elif not simple and key > entry[0]:
+                index[url] = (key, file_no, offset, length)
+                replaced += 1
+
+    for input_file in paths:
         input_path = Path(input_file)
         if not input_path.exists():
             print(f"警告：文件不存在，跳过 {input_path}")
             continue
 
-        with open(input_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # 先完整扫描一遍确认格式，格式不正确的文件整体跳过
+        try:
+            for _ in iter_sources(input_path):
+                pass
+        except ValueError:
+            print(f"警告：文件格式不正确，跳过 {input_path}")
+            continue
 
-        # 支持带元信息的格式
-        if isinstance(data, dict) and "sources" in data:
-            sources = data["sources"]
-        elif isinstance(data, list):
-            sources = data
+        file_no = len(files)
+        files.append(input_path)
+        count = 0
+        batch = []
+        for item in iter_sources(input_path):
+            count += 1
+            batch.append(item)
+            if len(batch) >= STREAM_BATCH:
+                add_batch(file_no, batch)
+                batch = []
+        if batch:
+            add_batch(file_no, batch)
+
+        print(f"读取 {input_path.name}：{count} 个书源")
+        total += count
+
+    if not files:
+        return None
+
+    # 数组元素前的换行与缩进（紧凑输出为空）
+    prefix = "" if compact else "\n  " if flat else "\n    "
+    handles = [open(p, "rb") for p in files]
+    try:
+        with jsonio.atomic_open(output_path, "w", encoding="utf-8") as out:
+            if not flat:
+                header = indented(meta_header(len(index), meta), "  ", compact)
+                out.write('{"_meta":' + header + ',"sources":' if compact
+                          else "{\n  \"_meta\": " + header + ",\n  \"sources\": ")
+            out.write("[")
+
+            first = True
+            for _, file_no, offset, length in index.values():
+                f = handles[file_no]
+                f.seek(offset)
+                source = jsonio.loads(f.read(length))
+                out.write(("" if first else ",") + prefix + indented(source, prefix[1:], compact))
+                first = False
+
+            if index:
+                out.write(prefix[:-2])
+            out.write("]")
+            if not flat:
+                out.write("}" if compact else "\n}")
+    finally:
+        for f in handles:
+            f.close()
+
+    return total, len(index), replaced
+
+
+def sources_of(data):
+    """书源列表（顶层数组，或带元信息的 {"sources": [...]}），格式不正确时返回 None"""
+    # 支持带元信息的格式
+    if isinstance(data, dict) and "sources" in data:
+        return data["sources"]
+    if isinstance(data, list):
+        return data
+    return None
+
+
+def load_sources(path: Path):
+    """读取书源文件，格式不正确时返回 None"""
+    return sources_of(jsonio.load(path))
+
+
+def existing_paths(paths: list) -> list:
+    """过滤掉不存在的输入文件"""
+    result = []
+    for input_file in paths:
+        input_path = Path(input_file)
+        if input_path.exists():
+            result.append(input_path)
         else:
+            print(f"警告：文件不存在，跳过 {input_path}")
+    return result
+
+
+def read_inputs(paths: list) -> list:
+    """并发读取全部输入文件，返回每个有效文件的书源列表"""
+    all_sources = []
+
+    input_paths = existing_paths(paths)
+    for input_path, data in zip(input_paths, jsonio.load_many(input_paths)):
+        sources = sources_of(data)
+        if sources is None:
             print(f"警告：文件格式不正确，跳过 {input_path}")
             continue
 
         print(f"读取 {input_path.name}：{len(sources)} 个书源")
         all_sources.append(sources)
 
-    if not all_sources:
+    return all_sources
+
+
+def incremental_merge(paths: list, output_path: Path, manifest: Manifest, simple: bool = False) -> tuple:
+    """
+    增量合并：与 smart_merge/simple_merge 结果相同
+
+    未变化的输入文件（字节摘要在清单中）只取清单中的 [URL, 内容哈希] 与缓存的比较元组；
+    胜出书源的内容依次从已解析的输入、上次的输出、对应的输入文件读回
+
+    返回: (合并前总数, 合并后的书源列表, 对应的内容哈希列表, 替换统计)；没有有效输入文件时返回 None
+    """
+    input_paths = existing_paths(paths)
+    digests = [file_digest(p) for p in input_paths]
+    cached = [manifest.file_entries(d) for d in digests]
+
+    # 有变化的输入文件并发读取
+    changed = [p for p, entries in zip(input_paths, cached) if entries is None]
+    loaded = dict(zip(changed, jsonio.load_many(changed)))
+
+    files = []
+    for input_path, digest, entries in zip(input_paths, digests, cached):
+        if entries is not None:
+            print(f"读取 {input_path.name}：{len(entries)} 个书源（未变化）")
+            files.append((input_path, None, entries))
+            continue
+
+        sources = sources_of(loaded[input_path])
+        if sources is None:
+            print(f"警告：文件格式不正确，跳过 {input_path}")
+            continue
+
+        hashes = manifest.track(sources)
+        manifest.derive(hashes, sources, "key", lambda batch: [list(key) for key in merge_keys(batch)])
+        manifest.add_file(digest, hashes, sources)
+        print(f"读取 {input_path.name}：{len(sources)} 个书源")
+        files.append((input_path, sources, manifest.files[digest]))
+
+    if not files:
+        return None
+
+    # 每个 URL 选出一个书源：{URL: (比较元组, 文件序号, 位置)}，规则与 smart_merge/simple_merge 相同
+    best = {}
+    replaced = 0
+    for file_no, (_, _, entries) in enumerate(files):
+        for pos, (url, h) in enumerate(entries):
+            if not url:
+                continue
+            key = tuple(manifest.entries[h]["key"])
+            if url not in best:
+                best[url] = (key, file_no, pos)
+            elif not simple and key > best[url][0]:
+                best[url] = (key, file_no, pos)
+                replaced += 1
+
+    hashes = [files[file_no][2][pos][1] for _, file_no, pos in best.values()]
+    bodies = {}
+    for file_no, (_, sources, entries) in enumerate(files):
+        if sources is not None:
+            bodies.update((entries[pos][1], sources[pos]) for _, n, pos in best.values() if n == file_no)
+
+    # 未变化文件中的胜出书源：先从上次的输出读回
+    if len(bodies) < len(set(hashes)):
+        previous = manifest.output_hashes(output_path)
+        if previous is not None:
+            wanted = set(hashes) - set(bodies)
+            for h, source in zip(previous, load_sources(output_path) or []):
+                if h in wanted:
+                    bodies[h] = source
+
+    # 仍然缺少的从对应的输入文件读回
+    for file_no, (input_path, sources, entries) in enumerate(files):
+        if sources is None and any(entries[pos][1] not in bodies for _, n, pos in best.values() if n == file_no):
+            sources = load_sources(input_path)
+            bodies.update((entries[pos][1], sources[pos]) for _, n, pos in best.values() if n == file_no)
+
+    total = sum(len(entries) for _, _, entries in files)
+    return total, [bodies[h] for h in hashes], hashes, replaced
+
+
+def fingerprint_dedupe(merged: list, threshold: float, manifest: Manifest = None, hashes: list = None) -> list:
+    """按规则指纹去除近似重复书源，返回保留书源的位置列表（manifest 不为空时复用缓存的指纹）"""
+    from fingerprint import keep_best, features, encode_features, decode_features, DEFAULT_THRESHOLD
+
+    items = None
+    if manifest is not None:
+        items = [decode_features(item) for item in manifest.derive(
+            hashes, merged, "fingerprint", lambda batch: [encode_features(features(s)) for s in batch])]
+    kept, clusters = keep_best(merged, merge_keys(merged), threshold or DEFAULT_THRESHOLD, items)
+    print(f"近似重复：{len(clusters)} 组，去除 {len(merged) - len(kept)} 个")
+    return kept
+
+
+def check_main(args, manifest: Manifest) -> int:
+    """--check 模式：对比增量合并与全量合并（smart_merge/simple_merge）的结果，不写入任何文件"""
+    print("=== 增量 ===")
+    result = incremental_merge(args.inputs, Path(args.output), manifest, args.simple)
+    print("\n=== 全量 ===")
+    all_sources = read_inputs(args.inputs)
+    if result is None or not all_sources:
         print("错误：没有有效的输入文件")
         return 1
 
-    total_before = sum(len(s) for s in all_sources)
-
-    # 合并
+    _, incremental, hashes, _ = result
     if args.simple:
-        merged = simple_merge(*all_sources)
-        replaced = 0
-        print("\n使用简单去重模式")
+        full = simple_merge(*all_sources)
     else:
-        merged, replaced = smart_merge(*all_sources)
-        print("\n使用智能去重模式")
+        full, _ = smart_merge(*all_sources)
+
+    if args.fingerprint:
+        incremental = [incremental[i] for i in fingerprint_dedupe(incremental, args.threshold, manifest, hashes)]
+        full = [full[i] for i in fingerprint_dedupe(full, args.threshold)]
+
+    if incremental == full:
+        print(f"\n一致：增量与全量结果相同（{len(full)} 个书源）")
+        return 0
+    differ = sum(1 for a, b in zip(incremental, full) if a != b) + abs(len(incremental) - len(full))
+    print(f"\n不一致：增量 {len(incremental)} 个，全量 {len(full)} 个，{differ} 处不同")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源合并脚本")
+    parser.add_argument("--inputs", "-i", nargs="+", required=True, help="输入文件路径（可多个）")
+    parser.add_argument("--output", "-o", required=True, help="输出文件路径")
+    parser.add_argument("--meta", "-m", help="元信息 JSON 字符串")
+    parser.add_argument("--flat", "-f", action="store_true", help="输出扁平数组（不包含元信息）")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    parser.add_argument("--simple", "-s", action="store_true", help="使用简单去重（保留第一个）")
+    parser.add_argument("--fingerprint", action="store_true", help="按规则指纹去除近似重复书源（每组保留最优）")
+    parser.add_argument("--threshold", type=float, help="规则指纹的 Jaccard 相似度阈值，默认 0.8")
+    parser.add_argument("--stream", action="store_true", help="流式合并（内存只与去重后的 URL 数量相关，适合大文件）")
+    parser.add_argument("--manifest", help="增量清单文件，默认 .cache/merge_<输出文件名>.json")
+    parser.add_argument("--full", action="store_true", help="忽略增量清单，全量重建")
+    parser.add_argument("--check", action="store_true", help="对比增量与全量结果是否一致（不写入文件）")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    if args.stream:
+        return stream_main(args)
+
+    output_path = Path(args.output)
+    manifest_path = Path(args.manifest) if args.manifest else MANIFEST_DIR / f"merge_{output_path.stem}.json"
+    salt = code_digest(DERIVED_FROM)
+    manifest = Manifest(salt) if args.full else Manifest.load(manifest_path, salt)
+
+    if args.check:
+        return check_main(args, manifest)
+
+    with metrics.stage("merge", detail="incremental") as record:
+        result = incremental_merge(args.inputs, output_path, manifest, args.simple)
+        if result is not None:
+            record["items_in"], record["items_out"] = result[0], len(result[1])
+            metrics.count("merge.replaced", result[3])
+    if result is None:
+        print("错误：没有有效的输入文件")
+        return 1
+
+    total_before, merged, hashes, replaced = result
+    print(f"\n使用{'简单' if args.simple else '智能'}去重模式")
 
     duplicates = total_before - len(merged)
 
@@ -181,21 +520,68 @@ def main():
     if not args.simple:
         print(f"智能替换：{replaced} 个（用更优质的版本替换）")
 
-    # 输出
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # 处理结论：先全部记为重复，胜出的再覆盖
+    decisions = {h: "duplicate" for h in manifest.seen}
+    decisions.update((h, "clone") for h in hashes)
 
+    # 规则指纹去重
+    if args.fingerprint:
+        kept = fingerprint_dedupe(merged, args.threshold, manifest, hashes)
+        merged = [merged[i] for i in kept]
+        hashes = [hashes[i] for i in kept]
+    decisions.update((h, "kept") for h in hashes)
+
+    # 输出
     if args.flat:
         output_data = merged
     else:
         meta = json.loads(args.meta) if args.meta else {}
         output_data = add_meta(merged, meta)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+    jsonio.dump(output_data, output_path, args.compact)
+
+    print(f"\n输出到：{output_path}")
+
+    # 增量清单
+    changed_decisions = manifest.decide(decisions)
+    added, changed, removed = manifest.churn()
+    manifest.add_output(output_path, hashes)
+    manifest.save(manifest_path)
+    print(f"增量：新增 {added}、变化 {changed}、删除 {removed} 个，复用 {manifest.reused()} 个，"
+          f"结论变化 {changed_decisions} 个")
+
+    metrics.finish(args)
+    return 0
+
+
+def stream_main(args) -> int:
+    """--stream 模式"""
+    if args.fingerprint:
+        print("错误：--fingerprint 需要读入全部书源，不能与 --stream 同时使用")
+        return 1
+
+    output_path = Path(args.output)
+    meta = json.loads(args.meta) if args.meta else {}
+    with metrics.stage("merge", detail="stream") as record:
+        result = stream_merge(args.inputs, output_path, args.simple, args.flat, meta, args.compact)
+        if result is not None:
+            record["items_in"], record["items_out"] = result[0], result[1]
+            metrics.count("merge.replaced", result[2])
+    if result is None:
+        print("错误：没有有效的输入文件")
+        return 1
+
+    total_before, total_after, replaced = result
+    print(f"\n使用{'简单' if args.simple else '智能'}去重模式（流式）")
+    print(f"合并前总数：{total_before}")
+    print(f"去重后总数：{total_after}")
+    print(f"重复书源：{total_before - total_after}")
+    if not args.simple:
+        print(f"智能替换：{replaced} 个（用更优质的版本替换）")
 
     print(f"\n输出到：{output_path}")
 
+    metrics.finish(args)
     return 0
 
 
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+运行指标
+- 阶段（filter / clean / score / dedupe / merge / validate / read / write 等）记录墙钟时间、CPU 时间、
+  峰值常驻内存（RSS）与输入/输出条数；阶段可嵌套，记录所属的上层阶段
+- 命名计数器（正则替换次数、缓存命中、读写字节数等）由各模块通过 count() 累加，
+  lru_cache 的命中/未命中通过 track_cache() 登记，写出时读取
+- --metrics 写出 JSON（只在指定时写出：耗时与内存每次运行都不同，不应随校验报告提交）
+- --profile 写出 cProfile 统计（.prof，可用 snakeviz / flameprof 查看火焰图）
+- CPU 时间与峰值内存是整个进程的（含后台线程），峰值内存只增不减，
+  rss_growth_mb 是阶段内峰值的增量，可据此找出撑大内存的阶段
+"""
+
+import sys
+import time
+import cProfile
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 指标文件格式版本
+METRICS_VERSION = 1
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（MB），平台不支持时为 0"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KB，macOS 为字节
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+class Metrics:
+    """阶段记录与计数器"""
+
+    def __init__(self):
+        self.stages = []
+        self.counters = {}
+        self.caches = {}
+        self.stack = []
+        self.profiler = None
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, items_in: int = None, detail: str = None):
+        """
+        记录一个阶段；with 块中可设置 record["items_out"]
+
+        with metrics.stage("filter", len(sources)) as record:
+            ...
+            record["items_out"] = len(novels)
+        """
+        record = {"name": name, "parent": self.stack[-1]["name"] if self.stack else None}
+        if detail:
+            record["detail"] = detail
+        record["items_in"] = items_in
+        record["items_out"] = None
+        rss = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.stack.append(record)
+        try:
+            yield record
+        finally:
+            self.stack.pop()
+            record["wall_seconds"] = round(time.perf_counter() - wall, 4)
+            record["cpu_seconds"] = round(time.process_time() - cpu, 4)
+            record["peak_rss_mb"] = peak_rss_mb()
+            record["rss_growth_mb"] = round(record["peak_rss_mb"] - rss, 1)
+            self.stages.append(record)
+
+    def count(self, name: str, n: int = 1):
+        """累加命名计数器"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def track_cache(self, name: str, func):
+        """登记 lru_cache 函数，写出时记录其命中/未命中"""
+        self.caches[name] = func
+
+    def totals(self) -> dict:
+        """按阶段名汇总（嵌套在同名阶段内的记录不重复计时）"""
+        totals = {}
+        for record in self.stages:
+            entry = totals.setdefault(record["name"], {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            entry["calls"] += 1
+            if record["parent"] != record["name"]:
+                entry["wall_seconds"] = round(entry["wall_seconds"] + record["wall_seconds"], 4)
+                entry["cpu_seconds"] = round(entry["cpu_seconds"] + record["cpu_seconds"], 4)
+        return totals
+
+    def report(self) -> dict:
+        counters = dict(self.counters)
+        for name, func in self.caches.items():
+            info = func.cache_info()
+            counters[f"{name}.hits"] = info.hits
+            counters[f"{name}.misses"] = info.misses
+        return {
+            "version": METRICS_VERSION,
+            "timestamp": datetime.now().isoformat(),
+            "command": " ".join([Path(sys.argv[0]).name] + sys.argv[1:]),
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "cpu_seconds": round(time.process_time(), 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            "totals": self.totals(),
+            "counters": dict(sorted(counters.items()))
+        }
+
+    def start_profile(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def dump(self, path: Path = None, profile: Path = None):
+        """写出指标 JSON 与 cProfile 统计"""
+        if self.profiler is not None and profile:
+            self.profiler.disable()
+            Path(profile).parent.mkdir(parents=True, exist_ok=True)
+            self.profiler.dump_stats(str(profile))
+            print(f"性能剖析输出到：{profile}")
+        if path:
+            import jsonio
+            jsonio.dump(self.report(), Path(path))
+            print(f"运行指标输出到：{path}")
+
+
+# 进程内共享的记录器
+METRICS = Metrics()
+stage = METRICS.stage
+count = METRICS.count
+track_cache = METRICS.track_cache
+
+
+def add_arguments(parser):
+    """为脚本添加 --metrics / --profile 参数"""
+    parser.add_argument("--metrics", help="运行指标 JSON 输出路径（各阶段耗时、内存、条数与计数器）")
+    parser.add_argument("--profile", help="cProfile 统计输出路径（.prof）")
+
+
+def start(args):
+    """解析参数后调用：按需开始 cProfile"""
+    if getattr(args, "profile", None):
+        METRICS.start_profile()
+
+
+def finish(args):
+    """结束时调用：按 --metrics / --profile 写出指标与 cProfile 统计"""
+    METRICS.dump(getattr(args, "metrics", None), getattr(args, "profile", None))
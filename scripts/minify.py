@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+发布用书源精简
+- 删除与阅读默认值相同的字段（bookSourceType 0、enabled true、lastUpdateTime 0、weight 0 等，见 DEFAULTS）
+  以及空值（""、null、{}、[]），规则块（ruleSearch 等）内的空规则同样删除
+- 当前规则块存在时删除旧版重复块（searchRule/tocRule/contentRule/exploreRule/bookInfoRule），
+  以及与 bookSourceUrl 相同的旧版 key 字段
+- 紧凑 JSON 输出，可选同时写出 .gz / .br 预压缩文件（.br 需要安装 brotli）
+- 按字段统计节省的字节数（紧凑格式下），另计美化转紧凑节省的空白
+- 等价性校验：按阅读导入书源的方式（未知字段忽略、缺失字段取默认值、空字符串视同 null）
+  读取精简前后的书源，结果必须完全相同
+"""
+
+import gzip
+import argparse
+from pathlib import Path
+
+import jsonio
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 阅读 BookSource 的字段与默认值（字段缺失时导入为该值；None 为可空字段）
+DEFAULTS = {
+    "bookSourceUrl": "",
+    "bookSourceName": "",
+    "bookSourceGroup": None,
+    "bookSourceType": 0,
+    "bookUrlPattern": None,
+    "customOrder": 0,
+    "enabled": True,
+    "enabledExplore": True,
+    "jsLib": None,
+    "enabledCookieJar": True,
+    "concurrentRate": None,
+    "header": None,
+    "loginUrl": None,
+    "loginUi": None,
+    "loginCheckJs": None,
+    "coverDecodeJs": None,
+    "bookSourceComment": None,
+    "variableComment": None,
+    "lastUpdateTime": 0,
+    "respondTime": 180000,
+    "weight": 0,
+    "exploreUrl": None,
+    "exploreScreen": None,
+    "searchUrl": None,
+    "eventListener": False,
+    "customButton": False,
+}
+
+# 规则块（字段缺失或为空时导入为空规则）
+RULE_BLOCKS = ("ruleSearch", "ruleExplore", "ruleBookInfo", "ruleToc", "ruleContent", "ruleReview")
+
+# 旧版规则块 -> 当前规则块（阅读只读取当前规则块）
+LEGACY_BLOCKS = {
+    "searchRule": "ruleSearch",
+    "exploreRule": "ruleExplore",
+    "bookInfoRule": "ruleBookInfo",
+    "tocRule": "ruleToc",
+    "contentRule": "ruleContent",
+}
+
+# 旧版别名字段 -> 当前字段（值相同时删除）
+LEGACY_ALIASES = {"key": "bookSourceUrl"}
+
+# 预压缩格式：后缀 -> 压缩函数（未安装的格式为 None）
+COMPRESSORS = {
+    ".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    ".br": (lambda data: brotli.compress(data, quality=11)) if brotli else None,
+}
+
+
+def is_empty(value) -> bool:
+    """空值：""、null、{}、[]"""
+    return value is None or value == "" or value == {} or value == []
+
+
+def minify_rule(rule):
+    """删除规则块中的空规则"""
+    if not isinstance(rule, dict):
+        return rule
+    return {k: v for k, v in rule.items() if not is_empty(v)}
+
+
+def minify_source(source: dict) -> dict:
+    """精简单个书源（不修改输入）"""
+    result = {}
+    for key, value in source.items():
+        if key in LEGACY_BLOCKS and LEGACY_BLOCKS[key] in source:
+            continue
+        if key in LEGACY_ALIASES and value == source.get(LEGACY_ALIASES[key]):
+            continue
+        if key in RULE_BLOCKS:
+            value = minify_rule(value)
+        if is_empty(value):
+            continue
+        if key in DEFAULTS and value == DEFAULTS[key] and type(value) is type(DEFAULTS[key]):
+            continue
+        result[key] = value
+    return result
+
+
+def minify(sources: list) -> list:
+    """精简书源列表"""
+    return [minify_source(s) for s in sources]
+
+
+def blank(value) -> bool:
+    """阅读中视同 null 的值（字符串经 isNullOrBlank 判断）"""
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def legado_view(source: dict) -> dict:
+    """按阅读导入书源的方式读取：只取已知字段，缺失取默认值，空白字符串视同 null，规则块取非空规则"""
+    view = {}
+    for key, default in DEFAULTS.items():
+        value = source.get(key, default)
+        if value is None:
+            value = default
+        view[key] = None if default is None and blank(value) else value
+    for key in RULE_BLOCKS:
+        rule = source.get(key)
+        view[key] = {k: v for k, v in rule.items() if not blank(v)} if isinstance(rule, dict) else {}
+    return view
+
+
+def verify(sources: list, minified: list) -> list:
+    """等价性校验，返回阅读读取结果不同的书源名称"""
+    if len(sources) != len(minified):
+        return ["（书源数不同）"]
+    return [s.get("bookSourceName") or s.get("bookSourceUrl") or "?"
+            for s, m in zip(sources, minified) if legado_view(s) != legado_view(m)]
+
+
+def entry_bytes(key: str, value) -> int:
+    """紧凑格式下 "key":value 的字节数（含分隔逗号）"""
+    return len(jsonio.dumps({key: value}, compact=True)) - 1
+
+
+def field_savings(sources: list, minified: list) -> dict:
+    """按字段统计节省的字节数（紧凑格式下），按节省量降序"""
+    saved = {}
+    for source, small in zip(sources, minified):
+        for key, value in source.items():
+            diff = entry_bytes(key, value) - (entry_bytes(key, small[key]) if key in small else 0)
+            if diff:
+                saved[key] = saved.get(key, 0) + diff
+    return dict(sorted(saved.items(), key=lambda x: -x[1]))
+
+
+def write_compressed(path: Path, payload: bytes) -> list:
+    """写出预压缩文件（内容未变化时不重写），返回写出的路径"""
+    written = []
+    for suffix, compress in COMPRESSORS.items():
+        if compress is None:
+            continue
+        target = path.with_name(path.name + suffix)
+        data = compress(payload)
+        if not target.exists() or target.read_bytes() != data:
+            with jsonio.atomic_open(target) as f:
+                f.write(data)
+        written.append(target)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发布用书源精简（删除默认值、空值与旧版重复规则块）")
+    parser.add_argument("--input", "-i", required=True, help="书源文件路径")
+    parser.add_argument("--output", "-o", help="精简后的输出路径（不指定时只统计）")
+    parser.add_argument("--compress", "-z", action="store_true", help="同时写出 .gz / .br 预压缩文件")
+    parser.add_argument("--top", type=int, default=15, help="列出节省最多的字段数，默认 15")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"错误：输入文件不存在 {input_path}")
+        return 1
+
+    sources = jsonio.load(input_path)
+    minified = minify(sources)
+
+    mismatched = verify(sources, minified)
+    if mismatched:
+        print(f"错误：{len(mismatched)} 个书源精简后与原书源不等价：{', '.join(mismatched[:10])}")
+        return 1
+
+    original = input_path.stat().st_size
+    compact = len(jsonio.dumps(sources, compact=True))
+    payload = jsonio.dumps(minified, compact=True)
+    print(f"书源：{len(sources)} 个，精简后阅读读取结果一致")
+    print(f"  原文件     {original / 1024:>9.1f} KB")
+    print(f"  紧凑格式   {compact / 1024:>9.1f} KB（空白 {(original - compact) / 1024:.1f} KB）")
+    print(f"  精简后     {len(payload) / 1024:>9.1f} KB（共节省 {(1 - len(payload) / original) * 100:.1f}%）")
+    for suffix, compress in COMPRESSORS.items():
+        if compress:
+            print(f"  {suffix[1:]:<10} {len(compress(payload)) / 1024:>9.1f} KB")
+
+    print(f"\n节省最多的字段：")
+    for key, saved in list(field_savings(sources, minified).items())[:args.top]:
+        print(f"  {key:<20} {saved / 1024:>8.1f} KB")
+
+    if args.output:
+        output_path = Path(args.output)
+        with jsonio.atomic_open(output_path) as f:
+            f.write(payload)
+        print(f"\n输出到：{output_path}")
+        if args.compress:
+            for path in write_compressed(output_path, payload):
+                print(f"预压缩：{path}")
+    if args.compress and not brotli:
+        print("提示：未安装 brotli，跳过 .br")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+书源更新流水线
+- 在一个进程内依次执行 筛选 -> 清洗 -> 合并 -> 整合 -> 校验（-> 评分分组），
+  书源对象在阶段之间直接传递，每个输入文件只解析一次，最终输出只序列化一次
+- 流程由声明式配置描述（默认 pipeline.json；--config 指定的配置按阶段覆盖默认值），路径相对于仓库根目录
+- 新书源（inputs）经筛选、清洗、合并后与现有书源（existing）一起整合，规则与 integrate.py 相同
+- 校验与 CPU 阶段重叠：筛选完成后即在后台线程的事件循环中按源站开始探测（overlap），
+  整合选出书源后只等待这些书源的结果，用不到的探测直接取消
+- 中间结果只在配置 artifacts 或 --artifacts 时写出
+- 运行指标（各阶段耗时、内存、条数与计数器）：--metrics / --profile，见 metrics.py
+"""
+
+import copy
+import time
+import shutil
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from argparse import Namespace
+
+import jsonio
+import metrics
+import integrate
+from filter import filter_novel_sources
+from clean import clean_sources, sort_sources
+from merge import smart_merge, simple_merge, sources_of, fingerprint_dedupe
+from domains import normalize_origin
+from manifest import Manifest, code_digest
+
+# 默认配置与路径基准
+BASE_DIR = Path(__file__).parent.parent
+CONFIG_PATH = Path(__file__).parent / "pipeline.json"
+
+# 阶段（顺序即执行顺序，键也用于 artifacts）与显示名称
+STAGES = {
+    "filter": "筛选",
+    "clean": "清洗",
+    "merge": "合并",
+    "integrate": "整合",
+    "validate": "校验",
+    "grade": "评分分组"
+}
+
+
+def load_config(path: Path = None) -> dict:
+    """
+    读取默认配置，path 不为空时按阶段覆盖（未列出的阶段与选项保持默认）
+
+    校验阶段开启 rewrite_respond_time 而 probes 为 0 时，与 validate.py --rewrite-respond-time 相同，
+    按 DEFAULT_PROBES 次计时探测
+    """
+    config = jsonio.load(CONFIG_PATH)
+    if path is not None:
+        override = jsonio.load(path)
+        unknown = set(override.get("stages", {})) - set(STAGES)
+        if unknown:
+            raise ValueError(f"未知阶段：{', '.join(sorted(unknown))}")
+        for key, value in override.items():
+            if key == "stages":
+                for name, options in value.items():
+                    config["stages"][name] = {**config["stages"][name], **options}
+            else:
+                config[key] = value
+
+    options = config["stages"]["validate"]
+    if options.get("rewrite_respond_time") and not options.get("probes"):
+        from validate import DEFAULT_PROBES
+        options["probes"] = DEFAULT_PROBES
+    return config
+
+
+def resolve(path) -> Path:
+    """配置中的路径（相对于仓库根目录）"""
+    return BASE_DIR / path if path else None
+
+
+class BackgroundValidator:
+    """
+    后台校验器：独立线程运行事件循环与共享的 Prober（见 probe.py），主线程随时提交书源
+
+    书源按源站去重，每个源站只探测一次（与 validate.validate_sources 相同）；
+    提交后立即开始探测，与主线程的 CPU 阶段重叠
+    """
+
+    def __init__(self, timeout: int, floor: int, ceiling: int, probes: int = 0):
+        from probe import Prober
+
+        self.probes = probes
+        self.futures = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.prober = Prober(timeout, floor, ceiling)
+        self._run(self.prober.__aenter__())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _check(self, origin: str) -> tuple:
+        from probe import BreakerOpen
+
+        try:
+            is_valid, error = await self.prober.check(origin)
+        except BreakerOpen as e:
+            return None, str(e), None
+        measured = None
+        if self.probes and is_valid:
+            measured = await self.prober.measure(origin, self.probes)
+        return is_valid, error, measured
+
+    def submit(self, sources: list) -> int:
+        """提交书源（已提交的源站跳过），返回新增的源站数"""
+        count = 0
+        for s in sources:
+            origin = normalize_origin(s.get("bookSourceUrl", ""))
+            if origin not in self.futures:
+                self.futures[origin] = asyncio.run_coroutine_threadsafe(self._check(origin), self.loop)
+                count += 1
+        return count
+
+    def wait(self, sources: list) -> tuple:
+        """
+        等待书源的校验结果（未提交的先提交）
+
+        返回: (与 sources 对应的是否有效列表, 错误信息, 延迟结果)；主机已熔断、未探测的书源算作有效
+        """
+        self.submit(sources)
+        valid, errors, latency = [], {}, {}
+        for s in sources:
+            url = s.get("bookSourceUrl", "")
+            is_valid, error, measured = self.futures[normalize_origin(url)].result()
+            if is_valid is None:
+                metrics.count("validate.untested")
+                is_valid = True
+            valid.append(is_valid)
+            if not is_valid:
+                errors[url] = error
+            elif measured:
+                latency[url] = measured
+        return valid, errors, latency
+
+    def close(self) -> dict:
+        """取消未完成的探测，关闭连接池与事件循环，返回统计信息"""
+        pending = [f for f in self.futures.values() if not f.done()]
+        for future in pending:
+            future.cancel()
+        self._run(self.prober.__aexit__(None, None, None))
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        return {
+            "origins": len(self.futures),
+            "cancelled": len(pending),
+            **self.prober.report()
+        }
+
+
+class Pipeline:
+    """按配置执行各阶段，阶段的书源数与耗时记录在 metrics 中"""
+
+    def __init__(self, config: dict, full: bool = False):
+        self.config = config
+        self.stages = config["stages"]
+        self.full = full
+        self.records = []
+        self.validator = None
+
+    def enabled(self, stage: str) -> bool:
+        return self.stages[stage].get("enabled", True)
+
+    def artifact(self, stage: str, sources: list):
+        """按配置写出阶段的中间结果"""
+        path = resolve(self.config.get("artifacts", {}).get(stage))
+        if path:
+            jsonio.dump(sources, path, self.config.get("compact", False))
+            print(f"  中间结果输出到：{path}")
+
+    def stage(self, stage: str, count_in: int, func, per_file: bool = False):
+        """执行一个阶段：打印标题、计时、写出中间结果（per_file 时结果为每个输入文件的书源列表）"""
+        print(f"\n=== {STAGES[stage]} ===")
+        with metrics.stage(stage, count_in, "pipeline") as record:
+            result = func()
+            sources = [s for x in result for s in x] if per_file else result
+            record["items_out"] = len(sources)
+        self.records.append(record)
+        print(f"  {count_in} -> {len(sources)} 个，{record['wall_seconds']:.2f} 秒")
+        self.artifact(stage, sources)
+        return result
+
+    def read(self) -> tuple:
+        """并发读取现有书源与全部输入文件"""
+        existing_path = resolve(self.config.get("existing"))
+        paths = [resolve(p) for p in self.config["inputs"]]
+        missing = [p for p in paths if not p.exists()]
+        if missing:
+            raise FileNotFoundError(missing[0])
+
+        if existing_path and existing_path.exists():
+            existing, *inputs = jsonio.load_many([existing_path] + paths)
+            existing = sources_of(existing)
+        else:
+            existing, inputs = [], jsonio.load_many(paths)
+
+        inputs = [sources_of(data) or [] for data in inputs]
+        print(f"读取书源：现有 {len(existing)} 个，新书源 {sum(map(len, inputs))} 个（{len(paths)} 个文件）")
+        return existing, inputs
+
+    def filter(self, inputs: list) -> list:
+        return [filter_novel_sources(sources)[0] for sources in inputs]
+
+    def clean(self, inputs: list) -> list:
+        return [clean_sources(sources) for sources in inputs]
+
+    def merge(self, inputs: list) -> list:
+        options = self.stages["merge"]
+        if options.get("simple"):
+            merged = simple_merge(*inputs)
+        else:
+            merged, replaced = smart_merge(*inputs)
+            print(f"  智能替换：{replaced} 个")
+        if options.get("fingerprint"):
+            merged = [merged[i] for i in fingerprint_dedupe(merged, options.get("threshold"))]
+        return merged
+
+    def integrate(self, existing: list, new_sources: list) -> list:
+        options = self.stages["integrate"]
+        args = Namespace(
+            max=options["max"],
+            domains=options["domains"],
+            index=str(resolve(options["index"])),
+            resolve=options.get("resolve", False),
+            fingerprint=options.get("fingerprint", False),
+            check=False,
+            validate=self.validator is not None
+        )
+        manifest_path = resolve(options["manifest"])
+        salt = code_digest(integrate.DERIVED_FROM)
+        manifest = Manifest(salt) if self.full else Manifest.load(manifest_path, salt)
+
+        final, _, _ = integrate.integrate(existing, new_sources, args, manifest, time.time() * 1000,
+                                          validator=self.validate)
+        manifest.save(manifest_path)
+        return final
+
+    def validate(self, sources: list) -> list:
+        """等待后台校验结果，返回与 sources 对应的是否有效列表（同时记录错误与延迟）"""
+        valid, errors, latency = self.validator.wait(sources)
+        metrics.count("validate.invalid", len(errors))
+        self.errors.update(errors)
+        self.latency.update(latency)
+        self.checked += len(sources)
+        return valid
+
+    def validate_only(self, sources: list) -> list:
+        """未启用整合阶段时单独校验"""
+        return [s for s, ok in zip(sources, self.validate(sources)) if ok]
+
+    def grade(self, sources: list) -> list:
+        """按评分分组并排序（与 clean.py --grade 相同）"""
+        return sort_sources(clean_sources(sources, grade=True))
+
+    def run(self) -> list:
+        existing, inputs = self.read()
+
+        options = self.stages["validate"]
+        if self.enabled("validate"):
+            self.validator = BackgroundValidator(options["timeout"], options["min_concurrency"],
+                                                 options["max_concurrency"], options.get("probes", 0))
+            self.errors, self.latency, self.checked = {}, {}, 0
+
+        try:
+            if self.enabled("filter"):
+                inputs = self.stage("filter", sum(map(len, inputs)), lambda: self.filter(inputs), per_file=True)
+            if self.validator and options.get("overlap", True):
+                # 现有书源最可能保留，先提交
+                count = self.validator.submit(existing) + self.validator.submit([s for x in inputs for s in x])
+                print(f"\n后台校验：已提交 {count} 个源站")
+            if self.enabled("clean"):
+                inputs = self.stage("clean", sum(map(len, inputs)), lambda: self.clean(inputs), per_file=True)
+
+            if self.enabled("merge"):
+                new_sources = self.stage("merge", sum(map(len, inputs)), lambda: self.merge(inputs))
+            else:
+                new_sources = [s for sources in inputs for s in sources]
+
+            if self.enabled("integrate"):
+                final = self.stage("integrate", len(existing) + len(new_sources),
+                                   lambda: self.integrate(existing, new_sources))
+            else:
+                final = existing + new_sources
+                if self.validator:
+                    final = self.stage("validate", len(final), lambda: self.validate_only(final))
+
+            stats = self.validator.close() if self.validator else None
+            self.validator = None
+        except BaseException:
+            if self.validator:
+                self.validator.close()
+            raise
+
+        if stats is not None:
+            if options.get("rewrite_respond_time"):
+                from validate import rewrite_respond_time
+                print(f"  改写 respondTime：{rewrite_respond_time(final, self.latency)} 个")
+            self.report(stats)
+
+        if self.enabled("grade"):
+            final = self.stage("grade", len(final), lambda: self.grade(final))
+        return final
+
+    def report(self, stats: dict):
+        """校验统计与报告（格式与 validate.py 的报告相同）"""
+        options = self.stages["validate"]
+        print(f"\n后台校验：{stats['origins']} 个源站，取消 {stats['cancelled']} 个未用到的探测，"
+              f"无效书源 {len(self.errors)} 个")
+        metrics.count("validate.origins", stats["origins"])
+        metrics.count("validate.cancelled", stats["cancelled"])
+        metrics.count("validate.tripped_hosts", len(stats["tripped"]))
+        path = resolve(options.get("report"))
+        if not path:
+            return
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "total": self.checked,
+            "valid": self.checked - len(self.errors),
+            "invalid": len(self.errors),
+            "timeout": options["timeout"],
+            "errors": self.errors,
+            **stats
+        }
+        if options.get("probes"):
+            report["probes"] = options["probes"]
+            report["latency"] = self.latency
+        jsonio.dump(report, path)
+        print(f"校验报告输出到：{path}")
+
+    def write(self, sources: list) -> Path:
+        """备份现有书源并写出最终结果"""
+        output_path = resolve(self.config["output"])
+        existing_path = resolve(self.config.get("existing"))
+        backup_path = resolve(self.config.get("backup"))
+        if backup_path and existing_path and existing_path.exists():
+            shutil.copy(existing_path, backup_path)
+            print(f"\n已备份到：{backup_path}")
+        jsonio.dump(sources, output_path, self.config.get("compact", False))
+        print(f"输出到：{output_path}")
+        return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源更新流水线（筛选 -> 清洗 -> 合并 -> 整合 -> 校验）")
+    parser.add_argument("--config", "-c", help="流水线配置文件（按阶段覆盖默认的 pipeline.json）")
+    parser.add_argument("--artifacts", "-a", help="写出每个阶段中间结果的目录（<阶段>.json）")
+    parser.add_argument("--full", action="store_true", help="忽略整合的增量清单，全量重建")
+    parser.add_argument("--no-validate", action="store_true", help="跳过网络校验")
+    parser.add_argument("--compact", action="store_true", help="紧凑输出（不缩进）")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    try:
+        config = load_config(Path(args.config) if args.config else None)
+    except (OSError, ValueError) as e:
+        print(f"错误：配置无效 {e}")
+        return 1
+
+    config = copy.deepcopy(config)
+    if args.no_validate:
+        config["stages"]["validate"]["enabled"] = False
+    if args.compact:
+        config["compact"] = True
+    if args.artifacts:
+        directory = Path(args.artifacts).resolve()
+        config["artifacts"] = {stage: str(directory / f"{stage}.json") for stage in STAGES}
+
+    pipeline = Pipeline(config, args.full)
+    try:
+        final = pipeline.run()
+    except FileNotFoundError as e:
+        print(f"错误：输入文件不存在 {e}")
+        return 1
+    pipeline.write(final)
+
+    print("\n=== 统计 ===")
+    for record in pipeline.records:
+        print(f"  {STAGES[record['name']]}: {record['items_in']} -> {record['items_out']} 个，"
+              f"{record['wall_seconds']:.2f} 秒，CPU {record['cpu_seconds']:.2f} 秒，峰值内存 {record['peak_rss_mb']} MB")
+    print(f"最终输出: {len(final)}")
+
+    metrics.finish(args)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+共享异步 HTTP 探测库（validate.py、functional.py、integrate.py --validate 共用）
+- 统一连接池：连接保活，共享 SSLContext，同一连接上的请求不再重复 TLS 握手
+- 全局自适应并发（AIMD）+ 每主机并发上限，主机连续失败后熔断
+- 统一超时、重试（仅连接重置等瞬时错误）与请求头策略（默认 UA + 书源 header）
+- 计时请求：连接/首字节/总耗时
+"""
+
+import json
+import math
+import time
+import errno
+import asyncio
+import ssl
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    print("请先安装 aiohttp: pip install aiohttp")
+    exit(1)
+
+import rule
+
+
+# 默认超时时间（秒）
+DEFAULT_TIMEOUT = 10
+
+# 并发数量（自适应并发的初始值）
+CONCURRENCY = 20
+
+# 自适应并发的下限与上限（可由命令行覆盖）
+MIN_CONCURRENCY = 4
+MAX_CONCURRENCY = 64
+
+# 自适应并发：减半系数、延迟容忍倍数、错误率容忍（倍数 + 余量）
+BACKOFF = 0.5
+LATENCY_TOLERANCE = 1.5
+ERROR_TOLERANCE = 2
+ERROR_MARGIN = 0.05
+
+# 自适应并发：短期/长期指数滑动平均系数
+SHORT_ALPHA = 0.2
+LONG_ALPHA = 0.02
+
+# 每主机并发上限
+HOST_CONCURRENCY = 4
+
+# 连接保活时间（秒）
+KEEPALIVE_TIMEOUT = 30
+
+# 熔断阈值：同一主机连续网络错误次数
+BREAKER_THRESHOLD = 3
+
+# 重试次数（仅连接重置/服务端断开等瞬时错误，超时不重试）与重试间隔（秒）
+RETRIES = 1
+RETRY_DELAY = 0.5
+
+# 默认请求头（书源 header 字段覆盖）
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Linux; Android 10) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.106 Mobile Safari/537.36"
+}
+
+# 延迟指标
+LATENCY_METRICS = ("connect", "ttfb", "total")
+
+def percentile(values: list, p: float) -> int:
+    """计算百分位数（最近秩）"""
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def latency_trace() -> aiohttp.TraceConfig:
+    """记录新建连接耗时（含 DNS、TCP、TLS）的 TraceConfig，结果写入 trace_request_ctx["connect"]"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_connection_create_start(session, ctx, params):
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx["connect_start"] = time.perf_counter()
+
+    async def on_connection_create_end(session, ctx, params):
+        timing = ctx.trace_request_ctx
+        if timing is not None and "connect_start" in timing:
+            # 重定向可能新建多个连接，累加
+            timing["connect"] = timing.get("connect", 0) + time.perf_counter() - timing.pop("connect_start")
+
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    return trace
+
+
+class CircuitBreaker:
+    """
+    按主机熔断
+
+    同一主机连续出现 threshold 次连接重置/超时等网络错误后熔断，
+    该主机余下的探测直接失败，不再逐个等待超时
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD):
+        self.threshold = threshold
+        self.failures = {}
+        self.tripped = set()
+
+    def is_open(self, host: str) -> bool:
+        return host in self.tripped
+
+    def record_success(self, host: str):
+        self.failures[host] = 0
+
+    def record_failure(self, host: str):
+        self.failures[host] = self.failures.get(host, 0) + 1
+        if self.failures[host] >= self.threshold:
+            self.tripped.add(host)
+
+
+def is_congestion(exc: Exception) -> bool:
+    """超时与连接重置视为拥塞信号（连接被拒、DNS 失败等与并发无关）"""
+    if isinstance(exc, (asyncio.TimeoutError, aiohttp.ServerDisconnectedError, ConnectionResetError)):
+        return True
+    return isinstance(exc, aiohttp.ClientOSError) and exc.errno in (errno.ECONNRESET, errno.EPIPE)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发
+
+    用作全局并发闸门（async with limiter）。每个请求完成后记录延迟与是否拥塞：
+    - 短期延迟不超过长期延迟的 LATENCY_TOLERANCE 倍、错误率平稳时，每轮（约 limit 个请求）并发 +1
+    - 拥塞错误率明显高于长期水平时并发乘以 BACKOFF，每轮最多减一次
+    失效源站本身的超时计入长期错误率，不会持续压低并发
+    """
+
+    def __init__(self, floor: int = MIN_CONCURRENCY, ceiling: int = MAX_CONCURRENCY, start: int = CONCURRENCY):
+        self.floor = floor
+        self.ceiling = max(floor, ceiling)
+        self.limit = float(min(self.ceiling, max(floor, start)))
+        self.in_flight = 0
+        self.completed = 0
+        self.recover_at = 0
+        self.condition = asyncio.Condition()
+        self.latency = {"short": None, "long": None}
+        self.errors = {"short": 0.0, "long": 0.0}
+        self.started = time.monotonic()
+        self.trace = [[0.0, int(self.limit)]]
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.in_flight -= 1
+            self.completed += 1
+            self.condition.notify_all()
+
+    def _update(self, averages: dict, value: float):
+        for key, alpha in (("short", SHORT_ALPHA), ("long", LONG_ALPHA)):
+            averages[key] = value if averages[key] is None else averages[key] * (1 - alpha) + value * alpha
+
+    def _set_limit(self, limit: float):
+        limit = min(self.ceiling, max(self.floor, limit))
+        if int(limit) != int(self.limit):
+            self.trace.append([round(time.monotonic() - self.started, 2), int(limit)])
+        self.limit = limit
+
+    def _error_spike(self) -> bool:
+        return self.errors["short"] > self.errors["long"] * ERROR_TOLERANCE + ERROR_MARGIN
+
+    def record_success(self, latency: float):
+        self._update(self.errors, 0)
+        self._update(self.latency, latency)
+        if self.latency["short"] <= self.latency["long"] * LATENCY_TOLERANCE and not self._error_spike():
+            self._set_limit(self.limit + 1 / self.limit)
+
+    def record_failure(self, congested: bool):
+        self._update(self.errors, 1 if congested else 0)
+        if congested and self._error_spike() and self.completed >= self.recover_at:
+            self._set_limit(self.limit * BACKOFF)
+            # 本轮在途请求完成前不再重复减半
+            self.recover_at = self.completed + self.in_flight
+
+    def report(self) -> dict:
+        return {
+            "floor": self.floor,
+            "ceiling": self.ceiling,
+            "final": int(self.limit),
+            "peak": max(limit for _, limit in self.trace),
+            "trace": self.trace
+        }
+
+def is_transient(exc: Exception) -> bool:
+    """可重试的瞬时错误：连接重置、服务端断开（超时不重试）"""
+    return is_congestion(exc) and not isinstance(exc, asyncio.TimeoutError)
+
+
+def source_headers(source: dict) -> dict:
+    """
+    书源请求头：默认请求头 + 书源 header 字段（JSON 字符串或对象）
+
+    header 依赖 JS 时抛出 rule.Unverifiable
+    """
+    headers = dict(DEFAULT_HEADERS)
+    raw = source.get("header")
+    if not raw:
+        return headers
+    if isinstance(raw, dict):
+        headers.update({str(k): str(v) for k, v in raw.items()})
+        return headers
+    raw = raw.strip()
+    if rule.is_js(raw):
+        raise rule.Unverifiable("请求头含 JS")
+    try:
+        headers.update({str(k): str(v) for k, v in json.loads(raw).items()})
+    except (ValueError, AttributeError):
+        pass
+    return headers
+
+
+class ProbeError(Exception):
+    """探测失败（超时、连接错误、熔断等）"""
+
+
+class BreakerOpen(ProbeError):
+    """主机已熔断，请求未发出"""
+
+
+class Prober:
+    """
+    共享探测会话
+
+    async with Prober(timeout) as prober:
+        ok, error = await prober.check(url)
+
+    - 所有请求共用一个保活连接池，受全局 AdaptiveLimiter 与每主机并发上限约束（排队时间不计入超时）
+    - 计时请求走独立的不复用连接池，每次都计入连接耗时
+    - host_concurrency：每主机并发上限（计时探测可设为 1，避免探测自身的负载计入延迟）
+    """
+
+    def __init__(self, timeout: int = DEFAULT_TIMEOUT, floor: int = MIN_CONCURRENCY, ceiling: int = MAX_CONCURRENCY,
+                 start: int = CONCURRENCY, retries: int = RETRIES, host_concurrency: int = HOST_CONCURRENCY):
+        self.timeout = timeout
+        self.retries = retries
+        self.host_concurrency = host_concurrency
+        self.limiter = AdaptiveLimiter(floor, ceiling, start)
+        self.breaker = CircuitBreaker()
+        self.host_semaphores = {}
+        self.session = None
+        self.timing_session = None
+
+    async def __aenter__(self):
+        # 书源站点证书问题很多，不校验证书
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+        connector = aiohttp.TCPConnector(limit=self.limiter.ceiling, limit_per_host=self.host_concurrency,
+                                         keepalive_timeout=KEEPALIVE_TIMEOUT, ssl=ssl_context)
+        timing_connector = aiohttp.TCPConnector(limit=self.limiter.ceiling, force_close=True, ssl=ssl_context)
+        self.session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+        self.timing_session = aiohttp.ClientSession(connector=timing_connector, headers=DEFAULT_HEADERS,
+                                                    trace_configs=[latency_trace()])
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        await self.timing_session.close()
+
+    async def request(self, method: str, url: str, headers: dict = None, data: bytes = None,
+                      read: bool = True, timed: bool = False) -> dict:
+        """
+        发送请求，瞬时错误按 retries 重试
+
+        返回: {"status", "url", "body", "charset", "content_type", "connect", "ttfb", "total"}（耗时为毫秒）
+        失败抛出 ProbeError（主机已熔断、请求未发出时为 BreakerOpen）
+        """
+        if not url:
+            raise ProbeError("URL 为空")
+
+        host = urlsplit(url).hostname or url
+        host_semaphore = self.host_semaphores.setdefault(host, asyncio.Semaphore(self.host_concurrency))
+        session = self.timing_session if timed else self.session
+
+        for attempt in range(self.retries + 1):
+            timing = {}
+            try:
+                async with host_semaphore:
+                    # 排队期间主机可能已熔断，拿到名额后再检查
+                    if self.breaker.is_open(host):
+                        raise BreakerOpen("熔断：主机多次连接失败")
+                    async with self.limiter:
+                        start = time.perf_counter()
+                        async with session.request(method, url, headers=headers, data=data, allow_redirects=True,
+                                                   timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                   trace_request_ctx=timing) as resp:
+                            ttfb = time.perf_counter() - start
+                            body = await resp.read() if read else b""
+                            total = time.perf_counter() - start
+                            self.breaker.record_success(host)
+                            self.limiter.record_success(total)
+                            return {
+                                "status": resp.status,
+                                "url": str(resp.url),
+                                "body": body,
+                                "charset": resp.charset,
+                                "content_type": resp.content_type,
+                                "connect": round(timing.get("connect", 0) * 1000),
+                                "ttfb": round(ttfb * 1000),
+                                "total": round(total * 1000)
+                            }
+            except BreakerOpen:
+                raise
+            except asyncio.TimeoutError as e:
+                error, exc = "超时", e
+            except (aiohttp.ClientConnectionError, ConnectionError) as e:
+                error, exc = str(e)[:50], e
+            except Exception as e:
+                raise ProbeError(str(e)[:50])
+
+            self.limiter.record_failure(is_congestion(exc))
+            if attempt < self.retries and is_transient(exc):
+                await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+                continue
+            # 重试用尽才算主机的一次失败，重试本身不计入熔断
+            self.breaker.record_failure(host)
+            raise ProbeError(error)
+
+    async def check(self, url: str, headers: dict = None) -> tuple:
+        """
+        HEAD 探测是否可访问
+
+        返回: (是否有效, 错误信息)；主机已熔断、请求未发出时抛出 BreakerOpen（未探测，不能算失效）
+        """
+        try:
+            resp = await self.request("HEAD", url, headers, read=False)
+        except BreakerOpen:
+            raise
+        except ProbeError as e:
+            return False, str(e)
+        if resp["status"] < 400:
+            return True, None
+        return False, f"HTTP {resp['status']}"
+
+    async def measure(self, url: str, probes: int) -> dict:
+        """
+        probes 次计时探测（GET 并读完响应体），汇总各指标的 p50/p95
+
+        返回: {"samples", "failed", "connect": {"p50", "p95"}, "ttfb": {...}, "total": {...}}
+        """
+        samples = []
+        for _ in range(probes):
+            try:
+                resp = await self.request("GET", url, timed=True)
+            except ProbeError:
+                continue
+            if resp["status"] < 400:
+                samples.append(resp)
+
+        latency = {"samples": len(samples), "failed": probes - len(samples)}
+        for metric in LATENCY_METRICS:
+            values = [r[metric] for r in samples]
+            latency[metric] = {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        return latency
+
+    def report(self) -> dict:
+        """熔断主机与并发轨迹"""
+        return {
+            "tripped": sorted(self.breaker.tripped),
+            "concurrency": self.limiter.report()
+        }
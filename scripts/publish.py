@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+书源分包发布
+- 按评分分级（精选/标准/备用，见 scoring.grade_groups）与分组（bookSourceGroup）拆分书源
+- 每个分包都是可直接导入阅读的书源数组，精简（删除默认值、空值与旧版重复规则块，见 minify.py）后紧凑 JSON 输出
+- 精简后的全量书源写到输出目录的 full.json；发布前校验精简前后阅读读取结果一致
+- 可选同时写出 .gz / .br 预压缩文件（--compress）
+- manifest.json 记录精简全量与各分包的书源数、字节数与 SHA-256，客户端和网页据此只下载需要的分包
+- 分组字段含多个分组时（逗号、分号分隔），书源出现在每个分组的分包中
+- 上次清单中列出、本次不再写出的分包（及其预压缩文件）会被删除，输出目录中的其他文件不受影响
+"""
+
+import re
+import hashlib
+import argparse
+from pathlib import Path
+
+import jsonio
+import minify
+from scoring import score_sources, grade_groups
+
+# 默认输入与输出目录
+BASE_DIR = Path(__file__).parent.parent
+INPUT_PATH = BASE_DIR / "sources/legado/full.json"
+OUTPUT_DIR = BASE_DIR / "sources/legado/bundles"
+
+# 清单文件名与格式版本（2：全量与分包均为精简书源，全量位于输出目录）
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# 精简全量书源的文件名（相对于输出目录）
+FULL_NAME = "full.json"
+
+# 分组分隔符（与阅读相同）
+GROUP_SEPARATOR = re.compile(r"[,;，；]")
+
+# 没有分组的书源
+UNGROUPED = "未分组"
+
+# 可直接用作文件名的分包名称
+SAFE_NAME = re.compile(r"[\w-]+")
+
+
+def source_groups(source: dict) -> list:
+    """书源的分组列表（去重，保持顺序）"""
+    names = (g.strip() for g in GROUP_SEPARATOR.split(source.get("bookSourceGroup") or ""))
+    return list(dict.fromkeys(n for n in names if n)) or [UNGROUPED]
+
+
+def file_name(name: str) -> str:
+    """分包文件名：名称可作为文件名时直接使用，否则取名称的哈希"""
+    if SAFE_NAME.fullmatch(name):
+        return f"{name}.json"
+    return f"{hashlib.sha1(name.encode('utf-8')).hexdigest()[:10]}.json"
+
+
+def describe(path: str, payload: bytes, count: int) -> dict:
+    """清单条目"""
+    return {"path": path, "count": count, "bytes": len(payload), "sha256": hashlib.sha256(payload).hexdigest()}
+
+
+def listed_paths(output_dir: Path) -> list:
+    """上次清单列出的文件（含可能存在的预压缩文件），清单不存在或无法读取时为空"""
+    try:
+        manifest = jsonio.load(output_dir / MANIFEST_NAME)
+        entries = [manifest["full"]] + [e for kind in manifest["bundles"].values() for e in kind.values()]
+        paths = [output_dir / e["path"] for e in entries]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return []
+    return [p.with_name(p.name + suffix) for p in paths for suffix in ("", *minify.COMPRESSORS)]
+
+
+def build_bundles(sources: list) -> dict:
+    """
+    拆分书源
+
+    返回: {"grade": {分级: [书源, ...]}, "group": {分组: [书源, ...]}}（保持 sources 中的顺序）
+    """
+    bundles = {"grade": {}, "group": {}}
+    for source, grade in zip(sources, grade_groups(score_sources(sources))):
+        bundles["grade"].setdefault(grade, []).append(source)
+        for group in source_groups(source):
+            bundles["group"].setdefault(group, []).append(source)
+    return bundles
+
+
+def write(target: Path, payload: bytes, compress: bool) -> list:
+    """写出文件（内容未变化时不重写，保持文件时间戳与 CDN 缓存），返回写出的路径（含预压缩文件）"""
+    if not target.exists() or target.read_bytes() != payload:
+        with jsonio.atomic_open(target) as f:
+            f.write(payload)
+    return [target] + (minify.write_compressed(target, payload) if compress else [])
+
+
+def publish(sources: list, output_dir: Path, compress: bool = False) -> dict:
+    """
+    写出精简全量、分包与清单，返回清单（路径相对于清单所在目录）
+
+    精简前后阅读读取结果不一致时抛出 ValueError，不写出任何文件
+    """
+    minified = minify.minify(sources)
+    mismatched = minify.verify(sources, minified)
+    if mismatched:
+        raise ValueError(f"{len(mismatched)} 个书源精简后与原书源不等价：{', '.join(mismatched[:10])}")
+
+    payload = jsonio.dumps(minified, compact=True)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "full": describe(FULL_NAME, payload, len(sources)),
+        "bundles": {}
+    }
+    previous = listed_paths(output_dir)
+    written = set(write(output_dir / FULL_NAME, payload, compress))
+
+    # 分包按原书源评分拆分，写出对应的精简书源
+    small = {id(s): m for s, m in zip(sources, minified)}
+    for kind, bundles in build_bundles(sources).items():
+        entries = manifest["bundles"][kind] = {}
+        for name, members in bundles.items():
+            path = f"{kind}/{file_name(name)}"
+            payload = jsonio.dumps([small[id(s)] for s in members], compact=True)
+            entries[name] = describe(path, payload, len(members))
+            written.update(write(output_dir / path, payload, compress))
+
+    # 删除上次清单中列出、本次未写出的分包与预压缩文件
+    for stale in previous:
+        if stale not in written and stale.exists():
+            stale.unlink()
+
+    jsonio.dump(manifest, output_dir / MANIFEST_NAME)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源分包发布（分级 + 分组 + 清单）")
+    parser.add_argument("--input", "-i", default=str(INPUT_PATH), help="全量书源文件路径")
+    parser.add_argument("--output", "-o", default=str(OUTPUT_DIR), help="分包输出目录")
+    parser.add_argument("--compress", "-z", action="store_true", help="同时写出 .gz / .br 预压缩文件（.br 需要安装 brotli）")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_dir = Path(args.output)
+
+    if not input_path.exists():
+        print(f"错误：输入文件不存在 {input_path}")
+        return 1
+
+    sources = jsonio.load(input_path)
+    print(f"读取书源：{len(sources)} 个（{input_path.stat().st_size / 1024:.0f} KB）")
+
+    try:
+        manifest = publish(sources, output_dir, args.compress)
+    except ValueError as e:
+        print(f"错误：{e}")
+        return 1
+
+    full = manifest["full"]
+    print(f"精简全量：{full['bytes'] / 1024:.0f} KB -> {full['path']}")
+
+    labels = {"grade": "分级", "group": "分组"}
+    for kind, entries in manifest["bundles"].items():
+        print(f"\n{labels[kind]}分包：{len(entries)} 个")
+        for name, entry in sorted(entries.items(), key=lambda x: -x[1]["count"]):
+            print(f"  {name}: {entry['count']} 个，{entry['bytes'] / 1024:.0f} KB -> {entry['path']}")
+
+    print(f"\n清单输出到：{output_dir / MANIFEST_NAME}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+替换净化规则引擎
+- 读取 Legado 替换规则（rules/legado/purify.json、antonym.json 等）：按 order 排序，跳过未启用的；
+  scopeTitle / scopeContent 决定作用于章节标题还是正文（缺省只作用于正文），
+  scope / excludeScope 按书名、书源地址筛选（未指定书籍时全部适用，与 Legado 相同）
+- isRegex 为假时按普通文本替换；为真时按 Java 语法编译正则（\\h、\\x{HHHH}、变长后顾、
+  模式中间的内联标志），需要 regex 模块，未安装时退回标准库 re，其不支持的规则记为不支持；
+  regex 模块下 timeoutMillisecond 生效，超时的替换不生效并计数
+- 纯文本分支的正则（如反义替换 是是是|上|下|…）编译为前缀树正则：一次扫描同时匹配所有分支
+  （Aho–Corasick 式多模式匹配），替换查表；同一位置的匹配结果与按分支顺序匹配相同
+- @js: 替换中的查表写法（xx={...};xx[result]||result）转为查表替换，其余 @js: 替换记为不支持
+- 预过滤：从正则语法树中提取必需的字面量（任一出现才可能匹配），章节中不含这些字面量时跳过该规则；
+  含几乎每章都有的单个字符（换行、常用标点）的字面量集合起不到过滤作用，不作为预过滤
+- 批量执行按规则逐个处理所有章节（每条规则只计时一次），统计每条规则的耗时、跳过与改动的章节数
+"""
+
+import re
+import json
+import time
+import argparse
+import warnings
+from pathlib import Path
+
+import metrics
+from rule import RuleError, Unverifiable, java_regex, java_replacement
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# 默认规则文件
+BASE_DIR = Path(__file__).parent.parent
+RULE_FILES = [BASE_DIR / "rules/legado/purify.json", BASE_DIR / "rules/legado/antonym.json"]
+
+# 正则后端（regex 模块的 V1 语义：内联标志从出现处生效，与 Java 相同）
+BACKEND = "regex" if regex else "re"
+
+# Legado 默认的正则超时（毫秒）
+DEFAULT_TIMEOUT_MS = 3000
+
+# @js: 查表替换：xx={"a":"b",...};xx[result]||result
+JS_TABLE = re.compile(r'^@js:\s*(?:var\s+|let\s+|const\s+)?(\w+)\s*=\s*(\{.*\})\s*;?\s*\1\[result\]\s*\|\|\s*result\s*;?\s*$', re.DOTALL)
+
+# 内联标志组（如 (?mi)），分析语法树前去掉
+INLINE_FLAGS = re.compile(r'(?<!\\)\(\?([a-zA-Z]+)\)')
+
+# 正则元字符（不含 |）
+REGEX_META = frozenset(".^$*+?{}[]()\\")
+
+# Java 与标准库含义不同的转义（\v 在 Java 中是竖向空白类），含有时不分析语法树
+JAVA_ONLY_ESCAPE = re.compile(r'(?<!\\)(?:\\\\)*\\[vV]')
+
+# 预过滤可接受的字符类大小（更大的字符类几乎总能命中，不作为必需字面量）
+MAX_CLASS_CHARS = 16
+
+# 几乎每章都会出现的单个字符：必需字面量含其中之一时预过滤不会跳过任何章节
+NEAR_UNIVERSAL = frozenset("\n\r \u3000，。、：；！？“”‘’…—")
+
+# 章节标题（拆分 txt 文本用）
+CHAPTER_TITLE = re.compile(r'^[ \t\u3000]*(第[零〇一二三四五六七八九十百千万两\d]+[章节回卷集部篇][^\n]{0,30}|序章|楔子|尾声|番外[^\n]{0,20})[ \t\u3000]*$', re.MULTILINE)
+
+# 没有章节标题时按该长度（字符）切分
+CHUNK_CHARS = 5000
+
+# 语法树中的重复与分组节点
+REPEATS = tuple(getattr(sre_parse, name) for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+                if hasattr(sre_parse, name))
+ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+
+
+def load_rules(paths: list = None) -> list:
+    """读取替换规则文件（单个规则对象或数组）"""
+    rules = []
+    for path in paths or RULE_FILES:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rules.extend(data if isinstance(data, list) else [data])
+    return rules
+
+
+# ---------- 正则分析 ----------
+
+def parse_tree(pattern: str):
+    """
+    去掉内联标志后用标准库解析语法树，返回 (语法树, 是否忽略大小写)
+
+    无法解析，或含有标准库与 Java 理解不同的写法（嵌套字符类、字符类交集 && 等，标准库会警告）时语法树为 None
+    """
+    flags = "".join(INLINE_FLAGS.findall(pattern))
+    ignorecase = "i" in flags or bool(re.search(r'\(\?[a-zA-Z-]*i[a-zA-Z-]*:', pattern))
+    if "x" in flags or JAVA_ONLY_ESCAPE.search(pattern):
+        return None, ignorecase
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            return sre_parse.parse(INLINE_FLAGS.sub("", pattern)), ignorecase
+        except (re.error, FutureWarning, OverflowError, RecursionError):
+            return None, ignorecase
+
+
+def literal_words(pattern: str, ignorecase: bool) -> list:
+    """
+    纯文本分支（a|b|c，不含元字符，允许 \\| 这类标点转义）的各分支文本；不是纯文本分支时返回 None
+
+    直接扫描模式文本：标准库的语法树会合并公共前缀（ab|ac 解析为 a[bc]），看不出原来的分支
+    """
+    if ignorecase:
+        return None
+    words = []
+    word = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            escaped = pattern[i + 1:i + 2]
+            if not escaped or escaped.isalnum():
+                return None
+            word.append(escaped)
+            i += 2
+            continue
+        if c == "|":
+            words.append("".join(word))
+            word = []
+        elif c in REGEX_META:
+            return None
+        else:
+            word.append(c)
+        i += 1
+    words.append("".join(word))
+    return None if not all(words) else words
+
+
+def class_chars(items) -> set:
+    """字符类中的字符（只含字面量与小范围时）"""
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] < MAX_CLASS_CHARS:
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        else:
+            return None
+    return chars if len(chars) <= MAX_CLASS_CHARS else None
+
+
+def required_literals(items, ignorecase: bool):
+    """
+    序列匹配时文本中必然出现的字面量集合（出现任一即可），无法确定时返回 None
+
+    序列取其中最有区分度的一项（最短字面量最长、其次集合最小），分支取各分支的并集，
+    至少重复一次的部分与正向断言取其内容；含 NEAR_UNIVERSAL 字符的集合几乎总能命中，不作为候选
+    """
+    candidates = []
+    run = []
+
+    def flush():
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        found = None
+        if op is sre_parse.SUBPATTERN:
+            found = required_literals(av[-1], ignorecase)
+        elif op in REPEATS:
+            if av[0] >= 1:
+                found = required_literals(av[2], ignorecase)
+        elif op is ATOMIC_GROUP:
+            found = required_literals(av, ignorecase)
+        elif op is sre_parse.ASSERT:
+            found = required_literals(av[1], ignorecase)
+        elif op is sre_parse.BRANCH:
+            found = set()
+            for branch in av[1]:
+                sub = required_literals(branch, ignorecase)
+                if sub is None:
+                    found = None
+                    break
+                found |= sub
+        elif op is sre_parse.IN:
+            found = class_chars(av)
+        if found:
+            candidates.append(found)
+    flush()
+
+    if ignorecase:
+        # 忽略大小写时只保留不区分大小写的字面量
+        candidates = [c for c in candidates if all(s.lower() == s.upper() for s in c)]
+    candidates = [c for c in candidates if not c & NEAR_UNIVERSAL]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def trie_pattern(words: list) -> str:
+    """前缀树正则：公共前缀只比较一次，同一位置取最长的匹配"""
+    trie = {}
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        leaves = [re.escape(c) for c, child in node.items() if c and list(child) == [""]]
+        branches = [re.escape(c) + build(child) for c, child in node.items() if c and list(child) != [""]]
+        if len(leaves) == 1:
+            branches.append(leaves[0])
+        elif leaves:
+            branches.append("[" + "".join(leaves) + "]")
+        if "" in node:
+            return "(?:" + "|".join(branches) + ")?"
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+def first_match_words(words: list) -> list:
+    """
+    去掉永远不会被选中的分支：Java 正则在同一位置按分支顺序取第一个匹配，
+    前面已有它的前缀（或相同文本）的分支不会被选中；去掉后同一位置的最长匹配即第一个匹配
+    """
+    trie = {}
+    kept = []
+    for word in words:
+        node = trie
+        shadowed = False
+        for c in word:
+            if "" in node:
+                shadowed = True
+                break
+            node = node.setdefault(c, {})
+        if shadowed or "" in node:
+            continue
+        node[""] = {}
+        kept.append(word)
+    return kept
+
+
+def compile_prefilter(literals: set):
+    """预过滤函数：文本中含任一必需字面量时为真"""
+    if len(literals) == 1:
+        literal = next(iter(literals))
+        return lambda text: literal in text
+    return re.compile(trie_pattern(sorted(literals))).search
+
+
+def js_table(replacement: str) -> dict:
+    """@js: 查表替换中的表，不是查表写法时返回 None"""
+    m = JS_TABLE.match(replacement)
+    if not m:
+        return None
+    try:
+        table = json.loads(m.group(2))
+    except ValueError:
+        return None
+    if not isinstance(table, dict) or not all(isinstance(v, str) for v in table.values()):
+        return None
+    return table
+
+
+# ---------- 规则 ----------
+
+class ReplaceRule:
+    """
+    编译后的替换规则
+
+    kind：text（普通文本）、regex（正则）、table（正则 + 查表替换）、trie（纯文本分支，前缀树正则）；
+    编译失败（@js: 替换、正则不支持）时记录异常，执行时跳过
+    """
+
+    __slots__ = ("name", "group", "order", "title", "content", "scope", "exclude", "pattern", "kind",
+                 "error", "compiled", "replacement", "table", "repl", "required", "prefilter", "timeout",
+                 "seconds", "chapters", "skipped", "changed", "timeouts")
+
+    def __init__(self, raw: dict, use_trie: bool = True, use_prefilter: bool = True):
+        self.name = raw.get("name") or ""
+        self.group = raw.get("group") or ""
+        self.order = raw.get("order") or 0
+        self.title = bool(raw.get("scopeTitle", False))
+        self.content = bool(raw.get("scopeContent", True))
+        self.scope = raw.get("scope") or ""
+        self.exclude = raw.get("excludeScope") or ""
+        self.pattern = raw.get("pattern") or ""
+        self.kind = "regex" if raw.get("isRegex") else "text"
+        self.error = None
+        self.compiled = None
+        self.replacement = raw.get("replacement") or ""
+        self.table = None
+        self.repl = None
+        self.required = None
+        self.prefilter = None
+        self.timeout = (raw.get("timeoutMillisecond") or DEFAULT_TIMEOUT_MS) / 1000
+        self.seconds = 0.0
+        self.chapters = 0
+        self.skipped = 0
+        self.changed = 0
+        self.timeouts = 0
+        try:
+            self.compile(use_trie, use_prefilter)
+        except (RuleError, Unverifiable) as e:
+            self.error = e
+
+    def compile(self, use_trie: bool, use_prefilter: bool):
+        if not self.pattern:
+            raise RuleError("替换规则为空")
+        if self.replacement.startswith("@js:"):
+            self.table = js_table(self.replacement)
+            if self.table is None:
+                raise Unverifiable(f"替换含 JS：{self.replacement[:30]}")
+        if self.kind == "text":
+            if self.table is not None:
+                raise Unverifiable("普通文本规则不支持 @js: 替换")
+            return
+
+        pattern = java_regex(self.pattern)
+        tree, ignorecase = parse_tree(pattern)
+        words = literal_words(pattern, ignorecase) if use_trie else None
+        if words:
+            # 纯文本分支：前缀树正则（不含 Java 特有语法，标准库即可）
+            self.kind = "trie"
+            words = first_match_words(words)
+            self.compiled = re.compile(trie_pattern(words))
+            if self.table is None:
+                self.table = {w: self.expand(w) for w in words}
+        else:
+            if self.table is not None:
+                self.kind = "table"
+            self.compiled = compile_java(pattern)
+            if self.table is None:
+                self.replacement = java_replacement(self.replacement)
+                refs = [int(n) for n in re.findall(r'\\g<(\d+)>', self.replacement)]
+                if refs and max(refs) > self.compiled.groups:
+                    raise RuleError(f"替换引用了不存在的分组：{self.replacement[:30]}")
+        if self.table is not None:
+            table = self.table
+            self.repl = lambda m: table.get(m.group(), m.group())
+        else:
+            self.repl = self.replacement
+
+        # 前缀树正则本身就是一次扫描，不再预过滤
+        if use_prefilter and tree is not None and self.kind != "trie":
+            self.required = required_literals(tree, ignorecase)
+            if self.required:
+                self.prefilter = compile_prefilter(self.required)
+
+    def expand(self, word: str) -> str:
+        """纯文本分支下普通替换串的展开（只能引用 $0）"""
+        replacement = java_replacement(self.replacement)
+        try:
+            return re.compile(re.escape(word)).sub(replacement, word)
+        except re.error:
+            raise RuleError(f"替换引用了不存在的分组：{self.replacement[:30]}")
+
+    def applies_to(self, name: str, origin: str) -> bool:
+        """scope / excludeScope 筛选（与 Legado 相同：作用范围包含书名或书源地址）"""
+        if self.exclude and any(v and v in self.exclude for v in (name, origin)):
+            return False
+        return not self.scope or not (name or origin) or any(v and v in self.scope for v in (name, origin))
+
+    def apply(self, text: str) -> str:
+        """替换单段文本（未通过预过滤时原样返回）"""
+        if self.prefilter is not None and not self.prefilter(text):
+            self.skipped += 1
+            return text
+        if self.kind == "text":
+            return text.replace(self.pattern, self.replacement)
+        if regex is not None and self.kind != "trie":
+            try:
+                return self.compiled.sub(self.repl, text, timeout=self.timeout)
+            except TimeoutError:
+                self.timeouts += 1
+                return text
+        return self.compiled.sub(self.repl, text)
+
+
+def compile_java(pattern: str, flags: int = 0):
+    """按 Java 语义编译正则（regex 模块 V1，未安装时用标准库 re）；flags 为 re.MULTILINE 等标准库标志"""
+    try:
+        if regex is not None:
+            return regex.compile(pattern, flags=regex.V1 | flags)
+        return re.compile(pattern, flags)
+    except (re.error, getattr(regex, "error", re.error)) as e:
+        raise RuleError(f"正则无效：{pattern[:30]} ({e})")
+
+
+class Engine:
+    """按 order 排序的启用规则，分为标题规则与正文规则"""
+
+    def __init__(self, raw_rules: list, name: str = "", origin: str = "",
+                 use_trie: bool = True, use_prefilter: bool = True):
+        enabled = sorted((r for r in raw_rules if r.get("isEnabled", True)), key=lambda r: r.get("order") or 0)
+        self.rules = [ReplaceRule(r, use_trie, use_prefilter) for r in enabled]
+        self.disabled = len(raw_rules) - len(enabled)
+        active = [r for r in self.rules if r.error is None and r.applies_to(name, origin)]
+        self.title_rules = [r for r in active if r.title]
+        self.content_rules = [r for r in active if r.content]
+
+    def unsupported(self) -> list:
+        """[(规则, 异常), ...]"""
+        return [(r, r.error) for r in self.rules if r.error is not None]
+
+    def apply(self, text: str, title: bool = False) -> str:
+        """对单段正文（或标题）依次执行规则"""
+        for r in self.title_rules if title else self.content_rules:
+            text = r.apply(text)
+        return text
+
+    def apply_chapters(self, chapters: list) -> list:
+        """
+        批量处理章节 [(标题, 正文), ...]，返回处理后的同结构列表
+
+        按规则逐个处理全部章节（结果与逐章处理相同，章节之间互不影响）
+        """
+        titles = [t for t, _ in chapters]
+        contents = [c for _, c in chapters]
+        with metrics.stage("purify", len(chapters)) as record:
+            for rules, texts in ((self.title_rules, titles), (self.content_rules, contents)):
+                for r in rules:
+                    start = time.perf_counter()
+                    skipped = r.skipped
+                    for i, text in enumerate(texts):
+                        result = r.apply(text)
+                        if result != text:
+                            texts[i] = result
+                            r.changed += 1
+                    r.seconds += time.perf_counter() - start
+                    r.chapters += len(texts)
+                    metrics.count("purify.skipped", r.skipped - skipped)
+            record["items_out"] = len(contents)
+        return list(zip(titles, contents))
+
+    def stats(self) -> list:
+        """每条规则的统计"""
+        return [{
+            "name": r.name,
+            "order": r.order,
+            "kind": r.kind,
+            "error": str(r.error) if r.error else None,
+            "required": sorted(r.required) if r.required else None,
+            "seconds": round(r.seconds, 4),
+            "chapters": r.chapters,
+            "skipped": r.skipped,
+            "changed": r.changed,
+            "timeouts": r.timeouts,
+        } for r in self.rules]
+
+
+def split_chapters(text: str) -> list:
+    """把 txt 文本拆成 [(标题, 正文), ...]：按章节标题行，没有标题时按固定长度"""
+    titles = list(CHAPTER_TITLE.finditer(text))
+    if not titles:
+        return [("", text[i:i + CHUNK_CHARS]) for i in range(0, len(text), CHUNK_CHARS)]
+    chapters = []
+    if text[:titles[0].start()].strip():
+        chapters.append(("", text[:titles[0].start()].strip("\n")))
+    for m, following in zip(titles, titles[1:] + [None]):
+        body = text[m.end():following.start() if following else len(text)]
+        chapters.append((m.group(1), body.strip("\n")))
+    return chapters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对 txt 文本执行替换净化规则")
+    parser.add_argument("input", nargs="?", help="txt 文本路径（不指定时只列出规则）")
+    parser.add_argument("--rules", "-r", nargs="+", help="替换规则文件，默认 purify.json 与 antonym.json")
+    parser.add_argument("--output", "-o", help="处理后的文本输出路径")
+    parser.add_argument("--name", default="", help="书名（按规则的 scope 筛选）")
+    parser.add_argument("--origin", default="", help="书源地址（按规则的 scope 筛选）")
+    parser.add_argument("--stats", help="每条规则的统计 JSON 输出路径")
+    args = parser.parse_args()
+
+    try:
+        raw_rules = load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法读取规则 {e}")
+        return 1
+
+    engine = Engine(raw_rules, args.name, args.origin)
+    print(f"正则后端：{BACKEND}")
+    print(f"规则：{len(raw_rules)} 条，启用 {len(engine.rules)} 条（标题 {len(engine.title_rules)}，正文 {len(engine.content_rules)}）")
+    for r in engine.rules:
+        if r.error:
+            status = f"不支持：{str(r.error).splitlines()[0]}"
+        else:
+            required = "、".join(sorted(r.required or ())).replace("\n", "\\n")
+            status = f"预过滤 {required[:40]}" if required else ""
+        print(f"  [{r.order:>4}] {r.kind:<5} {r.name[:24]:<24} {status}")
+
+    if not args.input:
+        return 0
+
+    text = Path(args.input).read_text(encoding="utf-8", errors="replace")
+    chapters = engine.apply_chapters(split_chapters(text))
+    print(f"\n章节：{len(chapters)} 个")
+    changed = sorted((r for r in engine.rules if r.changed), key=lambda r: -r.changed)
+    for r in changed:
+        print(f"  {r.name[:24]:<24} 改动 {r.changed} 章，跳过 {r.skipped} 章，耗时 {r.seconds * 1000:.1f} ms")
+
+    if args.output:
+        output = "\n\n".join(f"{title}\n{body}" if title else body for title, body in chapters)
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"\n输出到：{args.output}")
+    if args.stats:
+        import jsonio
+        jsonio.dump(engine.stats(), Path(args.stats))
+        print(f"统计输出到：{args.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,775 @@
+#!/usr/bin/env python3
+"""
+Legado 规则解析引擎
+- JSoup 默认语法：class./id./tag./text./children、CSS 选择器、索引（.0、!0、.0:1、[1:3]）
+- @css:、@XPath:（或 // 开头）、@json:（或 $. / $[ 开头）
+- ##正则##替换（### 结尾仅替换首个匹配）
+- &&（合并）、||（取首个非空）、%%（交错合并）
+- 含 JS 的规则（@js:、<js>、{{js}}、@put/@get）无法离线执行，抛出 Unverifiable
+
+规则只解析一次：compile_rule 把规则字符串编译为语法树（XPath 预编译、正则预编译），
+相同规则字符串在所有书源间共享同一棵语法树
+"""
+
+import re
+import json
+from functools import lru_cache
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import HTMLTranslator, SelectorError
+except ImportError:
+    print("请先安装 lxml 和 cssselect: pip install lxml cssselect")
+    exit(1)
+
+
+# JS 相关标记
+JS_PATTERN = re.compile(r'@js:|<js>|</js>|@put:|@get:|^:', re.IGNORECASE)
+
+# {{...}} 模板
+TEMPLATE_PATTERN = re.compile(r'\{\{(.*?)\}\}', re.DOTALL)
+
+# JSoup 允许不加引号的属性值（如 [property=og:image]）
+UNQUOTED_ATTRIBUTE = re.compile(r'\[\s*([\w:-]+)\s*([~^$*|]?=)\s*([^\]"\']+?)\s*\]')
+
+# EXSLT 正则命名空间（JSoup 的 [attr~=regex] 与 :matches）
+XPATH_NAMESPACES = {"re": "http://exslt.org/regular-expressions"}
+
+# Java 正则扩展：\h 水平空白、\x{HHHH}
+HORIZONTAL_SPACE = " \\t\\xa0\\u1680\\u180e\\u2000-\\u200a\\u202f\\u205f\\u3000"
+JAVA_HEX_ESCAPE = re.compile(r'\\x\{([0-9a-fA-F]+)\}')
+
+# 组合运算符
+COMBINATOR_PATTERN = re.compile(r'(&&|\|\||%%)')
+
+# 元素末尾索引（.0、!0、.0:1）
+INDEX_PATTERN = re.compile(r'([.!])(-?\d+(?::-?\d+)*)$')
+
+# 方括号索引（[1,2]、[!0]、[1:3]、[-1:0:2]）
+BRACKET_INDEX_PATTERN = re.compile(r'!?\s*-?\d*(\s*:\s*-?\d*){0,2}(\s*,\s*-?\d*(\s*:\s*-?\d*){0,2})*')
+
+# 单一 .class、#id、tag 形式的 CSS 选择器
+SIMPLE_SELECTOR = re.compile(r'([.#]?)([A-Za-z_][\w-]*)')
+
+# 文档索引缓存数量
+DOCUMENT_INDEX_CACHE = 8
+_DOCUMENT_INDEXES = {}
+
+# 取值方式（text/html 等或属性名）
+GETTER_PATTERN = re.compile(r'[A-Za-z_][\w:.-]*')
+
+# JSONPath 片段
+JSONPATH_TOKEN = re.compile(r"\.\.([\w\u4e00-\u9fa5-]+|\*)|\.([\w\u4e00-\u9fa5-]+|\*)|\[([^\]]*)\]")
+
+
+class RuleError(Exception):
+    """规则语法错误或不支持"""
+
+
+class Unverifiable(Exception):
+    """规则依赖 JS 等无法离线执行的部分"""
+
+
+def is_js(rule: str) -> bool:
+    """规则是否依赖 JS"""
+    if not rule:
+        return False
+    if JS_PATTERN.search(rule):
+        return True
+    return any(not is_inner_rule(m) for m in TEMPLATE_PATTERN.findall(rule))
+
+
+def is_inner_rule(text: str) -> bool:
+    """{{}} 内是否为可离线执行的规则（否则视为 JS）"""
+    text = text.strip()
+    return text.startswith(("$.", "$[", "//", "@@")) or text[:7].lower().startswith(("@css:", "@json:", "@xpath:"))
+
+
+def parse_document(text: str):
+    """解析响应文本：JSON 返回对象，否则返回 lxml 根元素"""
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return json.loads(stripped)
+        except ValueError:
+            pass
+    if not stripped:
+        return lxml.html.fromstring("<html></html>")
+    try:
+        return lxml.html.document_fromstring(text)
+    except (etree.ParserError, ValueError):
+        return lxml.html.fromstring("<html></html>")
+
+
+def is_element(content) -> bool:
+    return isinstance(content, etree._Element)
+
+
+def as_element(content):
+    """非 JSON 模式的规则需要 HTML 元素"""
+    if is_element(content):
+        return content
+    return parse_document(json_string(content))
+
+
+def as_json(content):
+    if is_element(content):
+        try:
+            return json.loads(content.text_content())
+        except ValueError:
+            raise RuleError("内容不是 JSON")
+    return content
+
+
+def json_string(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+# ---------- 正则替换 ----------
+
+def split_replace(rule: str) -> tuple:
+    """拆分 ##正则##替换###，返回 (规则, 正则, 替换, 是否仅替换首个)"""
+    parts = rule.split("##")
+    regex = parts[1] if len(parts) > 1 else ""
+    replacement = parts[2] if len(parts) > 2 else ""
+    first_only = len(parts) > 3
+    return parts[0], regex, replacement, first_only
+
+
+def java_replacement(replacement: str) -> str:
+    """Java 替换串（$1）转为 Python 替换串（\\g<1>）"""
+    replacement = replacement.replace("\\", "\\\\")
+    return re.sub(r'\$(\d+)', r'\\g<\1>', replacement)
+
+
+def java_regex(regex: str) -> str:
+    """Java 正则转 Python 正则：\\h 水平空白、\\x{HHHH} 码点"""
+    regex = JAVA_HEX_ESCAPE.sub(lambda m: "\\U%08x" % int(m.group(1), 16), regex)
+    parts = []
+    depth = 0
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\" and i + 1 < len(regex):
+            pair = regex[i:i + 2]
+            if pair == "\\h":
+                pair = HORIZONTAL_SPACE if depth else f"[{HORIZONTAL_SPACE}]"
+            parts.append(pair)
+            i += 2
+            continue
+        if c == "[":
+            depth += 1
+        elif c == "]" and depth:
+            depth -= 1
+        parts.append(c)
+        i += 1
+    return "".join(parts)
+
+
+class Replace:
+    """## 正则替换节点（正则与替换串预编译）"""
+
+    __slots__ = ("pattern", "replacement", "first_only")
+
+    def __init__(self, regex: str, replacement: str, first_only: bool):
+        try:
+            self.pattern = re.compile(java_regex(regex))
+        except re.error as e:
+            raise RuleError(f"正则无效：{regex[:30]} ({e})")
+        self.replacement = java_replacement(replacement)
+        self.first_only = first_only
+
+    def apply(self, value: str) -> str:
+        try:
+            if self.first_only:
+                match = self.pattern.search(value)
+                return match.expand(self.replacement) if match else ""
+            return self.pattern.sub(self.replacement, value)
+        except re.error as e:
+            raise RuleError(f"替换无效：{self.replacement[:30]} ({e})")
+
+
+# ---------- 组合 ----------
+
+def split_combinator(rule: str) -> tuple:
+    """按 &&、||、%% 拆分规则（同一规则只使用一种运算符）"""
+    parts = COMBINATOR_PATTERN.split(rule)
+    if len(parts) == 1:
+        return "", [rule]
+    ops = set(parts[1::2])
+    if len(ops) > 1:
+        raise RuleError(f"混用组合运算符：{rule[:30]}")
+    return ops.pop(), [p.strip() for p in parts[0::2] if p.strip()]
+
+
+def combine(op: str, results: list) -> list:
+    """按运算符合并多个子规则结果"""
+    if op == "||":
+        for r in results:
+            if r:
+                return r
+        return []
+    if op == "%%":
+        merged = []
+        for i in range(max((len(r) for r in results), default=0)):
+            for r in results:
+                if i < len(r):
+                    merged.append(r[i])
+        return merged
+    if len(results) == 1:
+        return results[0]
+    return [x for r in results for x in r]
+
+
+# ---------- 索引 ----------
+
+def parse_index(rule: str) -> tuple:
+    """
+    解析元素规则末尾的索引
+
+    返回: (选择部分, 是否排除, 索引元组)，索引为 int 或 (start, end, step) 区间
+    """
+    rule = rule.strip()
+    if rule.endswith("]"):
+        start = rule.rfind("[")
+        body = rule[start + 1:-1].strip()
+        if start > 0 and BRACKET_INDEX_PATTERN.fullmatch(body):
+            exclude = body.startswith("!")
+            indexes = []
+            for item in body.lstrip("!").split(","):
+                nums = [int(x) if x.strip() else None for x in item.split(":")]
+                if len(nums) == 1:
+                    if nums[0] is not None:
+                        indexes.append(nums[0])
+                else:
+                    step = nums[2] if len(nums) > 2 and nums[2] is not None else 1
+                    indexes.append((nums[0], nums[1], step))
+            return rule[:start], exclude, tuple(indexes)
+        return rule, False, ()
+
+    match = INDEX_PATTERN.search(rule)
+    if not match:
+        return rule, False, ()
+    indexes = tuple(int(x) for x in match.group(2).split(":"))
+    return rule[:match.start()], match.group(1) == "!", indexes
+
+
+def expand_indexes(indexes: tuple, size: int) -> list:
+    """把索引和区间展开为有效位置列表"""
+    positions = []
+    for idx in indexes:
+        if isinstance(idx, tuple):
+            start, end, step = idx
+            start = 0 if start is None else (start + size if start < 0 else start)
+            end = size - 1 if end is None else (end + size if end < 0 else end)
+            step = abs(step) or 1
+            if start <= end:
+                positions.extend(range(start, end + 1, step))
+            else:
+                positions.extend(range(start, end - 1, -step))
+        else:
+            positions.append(idx + size if idx < 0 else idx)
+    return [p for p in positions if 0 <= p < size]
+
+
+def apply_indexes(elements: list, exclude: bool, indexes: tuple) -> list:
+    if not indexes:
+        return elements
+    positions = expand_indexes(indexes, len(elements))
+    if exclude:
+        dropped = set(positions)
+        return [e for i, e in enumerate(elements) if i not in dropped]
+    return [elements[i] for i in positions]
+
+
+# ---------- CSS / XPath 编译 ----------
+
+def xpath_literal(text: str) -> str:
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return "concat('" + "', \"'\", '".join(text.split("'")) + "')"
+
+
+class JsoupTranslator(HTMLTranslator):
+    """兼容 JSoup 扩展的 CSS 转换：[attr~=regex]、:lt/:gt/:eq、:containsOwn、:matches"""
+
+    def xpath_attrib_includes(self, xpath, name, value):
+        return xpath.add_condition(f"re:test({name}, {self.xpath_literal(value or '')})")
+
+    def sibling_index(self, xpath, function, op):
+        if function.argument_types() != ["NUMBER"]:
+            raise SelectorError(f":{function.name}() 需要数字参数")
+        index = int(function.arguments[0].value)
+        return xpath.add_condition(f"count(preceding-sibling::*) {op} {index}")
+
+    def xpath_lt_function(self, xpath, function):
+        return self.sibling_index(xpath, function, "<")
+
+    def xpath_gt_function(self, xpath, function):
+        return self.sibling_index(xpath, function, ">")
+
+    def xpath_eq_function(self, xpath, function):
+        return self.sibling_index(xpath, function, "=")
+
+    def xpath_containsown_function(self, xpath, function):
+        value = self.xpath_literal(function.arguments[0].value)
+        return xpath.add_condition(f"text()[contains(., {value})]")
+
+    def xpath_matches_function(self, xpath, function):
+        value = self.xpath_literal(function.arguments[0].value)
+        return xpath.add_condition(f"re:test(string(.), {value})")
+
+    def xpath_matchesown_function(self, xpath, function):
+        value = self.xpath_literal(function.arguments[0].value)
+        return xpath.add_condition(f"text()[re:test(., {value})]")
+
+
+CSS_TRANSLATOR = JsoupTranslator()
+
+
+def compile_xpath(path: str) -> etree.XPath:
+    try:
+        return etree.XPath(path, namespaces=XPATH_NAMESPACES, smart_strings=False)
+    except etree.XPathError as e:
+        raise RuleError(f"XPath 无效：{path[:30]} ({e})")
+
+
+def compile_css(selector: str) -> etree.XPath:
+    selector = UNQUOTED_ATTRIBUTE.sub(lambda m: f'[{m.group(1)}{m.group(2)}"{m.group(3)}"]', selector)
+    try:
+        return compile_xpath(CSS_TRANSLATOR.css_to_xpath(selector))
+    except (SelectorError, ValueError, RuleError) as e:
+        raise RuleError(f"CSS 选择器不支持：{selector[:30]} ({e})")
+
+
+# ---------- 语法树节点 ----------
+
+class Select:
+    """单段元素选择（如 class.xxx.0、li!-1、.title），XPath 预编译"""
+
+    __slots__ = ("xpath", "exclude", "indexes", "key")
+
+    def __init__(self, rule: str):
+        selector, self.exclude, self.indexes = parse_index(rule)
+        self.xpath = None
+        self.key = None
+        if not selector:
+            return
+        kind, _, name = selector.partition(".")
+        if kind == "children":
+            path = "*"
+        elif kind == "class" and name:
+            name = name.split(".")[0]
+            self.key = ("class", name)
+            path = f"descendant-or-self::*[contains(concat(' ', normalize-space(@class), ' '), {xpath_literal(' ' + name + ' ')})]"
+        elif kind == "tag" and name:
+            self.key = ("tag", name)
+            path = f"descendant-or-self::*[local-name()={xpath_literal(name)}]"
+        elif kind == "id" and name:
+            self.key = ("id", name)
+            path = f"descendant-or-self::*[@id={xpath_literal(name)}]"
+        elif kind == "text" and name:
+            path = f"descendant-or-self::*[text()[contains(., {xpath_literal(name)})]]"
+        else:
+            self.key = simple_selector_key(selector)
+            self.xpath = compile_css(selector)
+            return
+        self.xpath = compile_xpath(path)
+
+    def select(self, element) -> list:
+        if self.xpath is None:
+            elements = [element]
+        elif self.key is not None and element.getparent() is None:
+            elements = document_index(element).get(self.key, [])
+        else:
+            elements = self.xpath(element)
+        return apply_indexes(elements, self.exclude, self.indexes)
+
+
+def simple_selector_key(selector: str):
+    """单一 .class、#id、tag 形式的 CSS 选择器可直接查文档索引"""
+    match = SIMPLE_SELECTOR.fullmatch(selector.strip())
+    if not match:
+        return None
+    prefix, name = match.groups()
+    return ({".": "class", "#": "id"}.get(prefix, "tag"), name if prefix else name.lower())
+
+
+def document_index(root) -> dict:
+    """
+    根元素的 tag/class/id 索引（文档顺序），在根节点上执行的选择直接查表
+
+    最近解析的少量文档的索引常驻缓存
+    """
+    index = _DOCUMENT_INDEXES.get(root)
+    if index is not None:
+        return index
+    index = {}
+    for el in root.iter(etree.Element):
+        index.setdefault(("tag", el.tag), []).append(el)
+        cls = el.get("class")
+        if cls:
+            for name in dict.fromkeys(cls.split()):
+                index.setdefault(("class", name), []).append(el)
+        el_id = el.get("id")
+        if el_id:
+            index.setdefault(("id", el_id), []).append(el)
+    if len(_DOCUMENT_INDEXES) >= DOCUMENT_INDEX_CACHE:
+        _DOCUMENT_INDEXES.pop(next(iter(_DOCUMENT_INDEXES)))
+    _DOCUMENT_INDEXES[root] = index
+    return index
+
+
+class JsoupPath:
+    """按 @ 分段的逐级选择"""
+
+    __slots__ = ("steps",)
+
+    def __init__(self, rule: str):
+        self.steps = tuple(Select(p.strip()) for p in rule.split("@") if p.strip())
+
+    def elements(self, element) -> list:
+        elements = [element]
+        for step in self.steps:
+            if len(elements) == 1:
+                elements = step.select(elements[0])
+            else:
+                elements = [e for el in elements for e in step.select(el)]
+        return elements
+
+
+class CssPath:
+    """@css: 选择"""
+
+    __slots__ = ("xpath",)
+
+    def __init__(self, rule: str):
+        self.xpath = compile_css(rule) if rule.strip() else None
+
+    def elements(self, element) -> list:
+        return self.xpath(element) if self.xpath is not None else [element]
+
+
+class XPathNode:
+    """@XPath: 选择"""
+
+    __slots__ = ("xpath",)
+
+    def __init__(self, rule: str):
+        self.xpath = compile_xpath(rule)
+
+    def elements(self, element) -> list:
+        return [r for r in self.xpath(element) if is_element(r)]
+
+    def strings(self, element) -> list:
+        values = []
+        for r in self.xpath(element):
+            if is_element(r):
+                values.append(" ".join(r.text_content().split()))
+            else:
+                values.append(str(r))
+        return [v for v in values if v]
+
+
+class JsonPath:
+    """JSONPath（常用子集）：$、.key、..key、[n]、[*]、['key']、[a,b]、[start:end]"""
+
+    __slots__ = ("ops",)
+
+    def __init__(self, path: str):
+        path = path.strip()
+        if path.startswith("$"):
+            path = path[1:]
+        elif path and not path.startswith((".", "[")):
+            path = "." + path
+
+        ops = []
+        pos = 0
+        while pos < len(path):
+            match = JSONPATH_TOKEN.match(path, pos)
+            if not match:
+                raise RuleError(f"JSONPath 不支持：{path[:30]}")
+            pos = match.end()
+            deep, key, bracket = match.groups()
+            if deep is not None:
+                ops.append(("deep", deep))
+            elif key is not None:
+                ops.append(("key", key))
+            else:
+                ops.append(("bracket", self.compile_bracket(bracket.strip())))
+        self.ops = tuple(ops)
+
+    @staticmethod
+    def compile_bracket(expr: str) -> tuple:
+        if expr.startswith(("?", "(")):
+            raise RuleError(f"JSONPath 过滤器不支持：{expr[:30]}")
+        if expr == "*":
+            return (("key", "*"),)
+        items = []
+        for item in expr.split(","):
+            item = item.strip()
+            if item[:1] in ("'", '"'):
+                items.append(("key", item[1:-1]))
+            elif ":" in item:
+                start, _, end = item.partition(":")
+                try:
+                    items.append(("slice", slice(int(start) if start else None, int(end) if end else None)))
+                except ValueError:
+                    raise RuleError(f"JSONPath 切片无效：{expr[:30]}")
+            else:
+                try:
+                    items.append(("index", int(item)))
+                except ValueError:
+                    raise RuleError(f"JSONPath 不支持：{expr[:30]}")
+        return tuple(items)
+
+    def find(self, data) -> list:
+        nodes = [data]
+        for op, arg in self.ops:
+            if op == "key":
+                nodes = [v for n in nodes for v in json_children(n, arg)]
+            elif op == "deep":
+                nodes = [v for n in nodes for v in json_descendants(n, arg)]
+            else:
+                nodes = [v for n in nodes for v in json_bracket(n, arg)]
+        return nodes
+
+
+def json_children(node, key: str) -> list:
+    if key == "*":
+        if isinstance(node, dict):
+            return list(node.values())
+        return list(node) if isinstance(node, list) else []
+    if isinstance(node, dict) and key in node:
+        return [node[key]]
+    return []
+
+
+def json_descendants(node, key: str) -> list:
+    found = []
+    stack = [node]
+    while stack:
+        n = stack.pop(0)
+        found.extend(json_children(n, key))
+        if isinstance(n, dict):
+            stack.extend(n.values())
+        elif isinstance(n, list):
+            stack.extend(n)
+    return found
+
+
+def json_bracket(node, items: tuple) -> list:
+    results = []
+    for kind, arg in items:
+        if kind == "key":
+            results.extend(json_children(node, arg))
+        elif not isinstance(node, list):
+            continue
+        elif kind == "slice":
+            results.extend(node[arg])
+        else:
+            try:
+                results.append(node[arg])
+            except IndexError:
+                pass
+    return results
+
+
+def flatten(values: list) -> list:
+    return [x for v in values for x in (v if isinstance(v, list) else [v])]
+
+
+def element_string(element, getter: str) -> str:
+    """按取值方式获取元素字符串"""
+    if getter == "text":
+        return " ".join(element.text_content().split())
+    if getter == "ownText":
+        return " ".join("".join(element.xpath("text()")).split())
+    if getter == "textNodes":
+        return "\n".join(t.strip() for t in element.xpath("text()") if t.strip())
+    if getter in ("html", "all"):
+        return lxml.html.tostring(element, encoding="unicode", with_tail=False)
+    return element.get(getter, "")
+
+
+class Part:
+    """
+    组合运算符拆分后的单个子规则
+
+    默认模式的规则在 JSON 内容上按 JSONPath 执行，JSON 语法树按需编译
+    """
+
+    __slots__ = ("mode", "text", "path", "getter", "_json")
+
+    def __init__(self, mode: str, text: str, strings_mode: bool):
+        self.mode = mode
+        self.text = text
+        self.getter = None
+        self._json = None
+
+        if mode == "json":
+            self.path = JsonPath(text)
+        elif mode == "xpath":
+            self.path = XPathNode(text)
+        elif strings_mode:
+            head, _, getter = text.rpartition("@")
+            self.getter = getter.strip()
+            if self.getter.startswith("abs:"):
+                self.getter = self.getter[4:]
+            if not GETTER_PATTERN.fullmatch(self.getter):
+                raise RuleError(f"取值方式不支持：{text[:30]}")
+            self.path = CssPath(head) if mode == "css" else JsoupPath(head)
+        else:
+            self.path = CssPath(text) if mode == "css" else JsoupPath(text)
+
+    def json_path(self) -> JsonPath:
+        if self._json is None:
+            self._json = self.path if self.mode == "json" else JsonPath(self.text)
+        return self._json
+
+    def elements(self, content) -> list:
+        if self.mode == "json" or (self.mode == "default" and not is_element(content)):
+            return flatten(self.json_path().find(as_json(content)))
+        return self.path.elements(as_element(content))
+
+    def strings(self, content) -> list:
+        if self.mode == "json" or (self.mode == "default" and not is_element(content)):
+            values = [json_string(x) for x in flatten(self.json_path().find(as_json(content)))]
+        elif self.mode == "xpath":
+            values = self.path.strings(as_element(content))
+        else:
+            values = [element_string(e, self.getter) for e in self.path.elements(as_element(content))]
+        return [v for v in values if v]
+
+
+def rule_mode(rule: str) -> tuple:
+    """判断规则模式，返回 (模式, 去除前缀后的规则)"""
+    if rule.startswith("@@"):
+        return "default", rule[2:]
+    prefix = rule[:7].lower()
+    if prefix.startswith("@css:"):
+        return "css", rule[5:]
+    if prefix.startswith("@xpath:"):
+        return "xpath", rule[7:]
+    if prefix.startswith("@json:"):
+        return "json", rule[6:]
+    if rule.startswith(("$.", "$[")):
+        return "json", rule
+    if rule.startswith("//"):
+        return "xpath", rule
+    return "default", rule
+
+
+class CompiledRule:
+    """
+    编译后的规则
+
+    编译失败（JS、语法不支持）时记录异常，执行时再抛出，保证同一规则只编译一次
+    """
+
+    __slots__ = ("source", "error", "reverse", "op", "parts", "replace", "template")
+
+    def __init__(self, source: str, strings_mode: bool):
+        self.source = source
+        self.error = None
+        self.reverse = False
+        self.op = ""
+        self.parts = ()
+        self.replace = None
+        self.template = None
+        try:
+            self.compile(source.strip(), strings_mode)
+        except (RuleError, Unverifiable) as e:
+            self.error = e
+
+    def compile(self, rule: str, strings_mode: bool):
+        if is_js(rule):
+            raise Unverifiable(f"规则含 JS：{rule[:30]}")
+
+        if strings_mode:
+            rule, regex, replacement, first_only = split_replace(rule)
+            if regex:
+                self.replace = Replace(regex, replacement, first_only)
+            if "{{" in rule:
+                self.template = tuple(
+                    compile_rule(seg, True) if i % 2 else seg
+                    for i, seg in enumerate(TEMPLATE_PATTERN.split(rule))
+                )
+                return
+        elif rule[:1] in ("-", "+"):
+            self.reverse = rule[0] == "-"
+            rule = rule[1:]
+
+        if not rule:
+            return
+        mode, rule = rule_mode(rule)
+        self.op, texts = split_combinator(rule)
+        self.parts = tuple(Part(mode, t, strings_mode) for t in texts)
+
+    def elements(self, content) -> list:
+        """按规则获取元素（或 JSON 节点）列表"""
+        if self.error:
+            raise self.error
+        elements = combine(self.op, [p.elements(content) for p in self.parts])
+        return elements[::-1] if self.reverse else elements
+
+    def strings(self, content) -> list:
+        """按规则获取字符串列表"""
+        if self.error:
+            raise self.error
+        if self.template is not None:
+            values = ["".join(seg if isinstance(seg, str) else seg.string(content) for seg in self.template)]
+        elif not self.parts:
+            values = [element_string(content, "text") if is_element(content) else json_string(content)]
+        else:
+            values = combine(self.op, [p.strings(content) for p in self.parts])
+        if self.replace:
+            values = [self.replace.apply("\n".join(values))]
+        return [v for v in values if v]
+
+    def string(self, content) -> str:
+        """按规则获取字符串（多个结果以换行连接）"""
+        return "\n".join(self.strings(content)).strip()
+
+
+@lru_cache(maxsize=None)
+def compile_rule(rule: str, strings_mode: bool = True) -> CompiledRule:
+    """编译规则（相同规则字符串共享同一语法树）"""
+    return CompiledRule(rule, strings_mode)
+
+
+def cache_info():
+    """规则编译缓存统计"""
+    return compile_rule.cache_info()
+
+
+# ---------- 统一入口 ----------
+
+def get_elements(content, rule: str) -> list:
+    """按规则获取元素（或 JSON 节点）列表"""
+    if not rule or not rule.strip():
+        return []
+    return compile_rule(rule, False).elements(content)
+
+
+def get_strings(content, rule: str) -> list:
+    """按规则获取字符串列表"""
+    if not rule or not rule.strip():
+        return []
+    return compile_rule(rule, True).strings(content)
+
+
+def get_string(content, rule: str) -> str:
+    """按规则获取字符串（多个结果以换行连接）"""
+    if not rule or not rule.strip():
+        return ""
+    return compile_rule(rule, True).string(content)
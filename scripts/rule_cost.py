@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+正则规则耗时分析与灾难性回溯检测
+- 收集 rules/legado/*.json 中的全部正则：替换规则（isRegex 的 pattern）与目录规则（toc.json 的 rule，
+  与 Legado 相同按 MULTILINE 编译）；未启用的规则也检查（用户随时可能启用）
+- 语料：--corpus 目录下的 txt 文本按章节拆分，未指定时使用 bench_purify 的示例章节；
+  每条规则逐章执行 finditer CORPUS_REPEAT 次取中位数，记录每 KB 耗时的 p50 / p90 / p99 / 最大值；
+  同样逐章计时一个廉价的基准正则，除以基准正则每 KB 耗时的中位数得到与机器快慢无关的倍数
+- 对抗输入：从正则语法树生成——每个可重复的子表达式取一个能匹配它的样本作为"泵"，
+  按 前缀 + 泵 × n + 失配后缀 构造；另有正则字符集上的随机文本、不含换行的长行与放大的语料；
+  先在几个递增的短长度上粗测（增长指数 = log 耗时比 / log 长度比），可疑的输入族再复核：
+  把长度加倍到单次耗时不低于 MIN_SECONDS，在 n、2n、4n 上各取 REPEAT 次的中位数，
+  两组相邻长度的增长指数都超过阈值才视为超线性（短输入上几毫秒的计时噪声不会误判）
+- 单次执行用 regex 模块的超时中止，超时直接记为灾难性回溯
+- --gate：有超时或超线性的规则时返回 1（规则提交的 CI 检查）；语料上的耗时（p99 倍数超过 --slow）
+  随机器与负载波动，只提示不阻断；已知问题记在 data/rule_cost_allow.json 中，按规则键（文件名 + id，没有 id 时为文件名 + 位置 + 正则哈希，
+  规则名可能重复）匹配，只提示不阻断
+- 计时基于 Python 的 regex 模块，与手机上的 Java（ICU）引擎不完全相同，但同为回溯引擎，
+  超线性增长在两者上通常一致
+"""
+
+import re
+import hashlib
+import math
+import time
+import random
+import argparse
+from pathlib import Path
+
+import jsonio
+import purify
+import bench_purify
+
+# 默认规则目录与已知问题列表
+RULES_DIR = Path(__file__).parent.parent / "rules/legado"
+ALLOW_PATH = Path(__file__).parent / "data" / "rule_cost_allow.json"
+
+# 对抗输入粗测的长度（字符）
+SIZES = (1000, 4000, 16000)
+
+# 增长指数超过该值视为超线性（1 为线性，2 为平方）
+SUPERLINEAR = 1.5
+
+# 粗测：最大长度上耗时低于该值（秒）的输入族不复核；粗测增长指数超过该值时复核
+SCREEN_SECONDS = 0.001
+SCREEN_EXPONENT = 1.2
+
+# 粗测每个长度的重复次数（取最短耗时）
+SCREEN_REPEAT = 2
+
+# 复核：起始长度的单次耗时下限（秒）、长度上限（字符）与每个长度的重复次数（取中位数）
+MIN_SECONDS = 0.05
+MAX_SIZE = 1 << 21
+REPEAT = 5
+
+# 每条规则最多复核的输入族（按粗测增长指数从高到低）
+MAX_CONFIRM = 3
+
+# 单次执行的超时（秒）
+TIMEOUT = 2.0
+
+# 语料上每章的重复次数（取中位数）
+CORPUS_REPEAT = 3
+
+# 基准正则：逐章扫描常用标点，耗时用于折算机器快慢
+BASELINE_PATTERN = "[，。！？]"
+
+# 语料上每 KB 耗时（p99）超过基准正则中位数的该倍数时提示“slow”（不阻断）
+SLOW_RATIO = 500
+
+# 每条规则最多生成的泵
+MAX_PUMPS = 12
+
+# 失配后缀
+SUFFIXES = ("\n", " !", "\x00")
+
+# 随机输入的种子
+SEED = 20240601
+
+# 字符类别的代表字符（取样用）与判断（取反字符类用）
+CATEGORY_SAMPLES = {
+    "CATEGORY_DIGIT": "1", "CATEGORY_NOT_DIGIT": "a", "CATEGORY_SPACE": " ", "CATEGORY_NOT_SPACE": "a",
+    "CATEGORY_WORD": "a", "CATEGORY_NOT_WORD": "，", "CATEGORY_LINEBREAK": "\n", "CATEGORY_NOT_LINEBREAK": "a",
+}
+CATEGORY_TESTS = {
+    "CATEGORY_DIGIT": re.compile(r"\d").match, "CATEGORY_NOT_DIGIT": re.compile(r"\D").match,
+    "CATEGORY_SPACE": re.compile(r"\s").match, "CATEGORY_NOT_SPACE": re.compile(r"\S").match,
+    "CATEGORY_WORD": re.compile(r"\w").match, "CATEGORY_NOT_WORD": re.compile(r"\W").match,
+    "CATEGORY_LINEBREAK": lambda c: c == "\n", "CATEGORY_NOT_LINEBREAK": lambda c: c != "\n",
+}
+
+# 取反字符类的候选字符
+NEGATED_CANDIDATES = "a中1 ，。x　"
+
+sre_parse = purify.sre_parse
+
+
+# ---------- 规则收集 ----------
+
+def rule_key(file: str, position: int, item: dict, pattern: str) -> str:
+    """规则键：文件名 + id；没有 id 时为文件名 + 位置 + 正则哈希（规则名可能重复，不能作键）"""
+    if item.get("id") is not None:
+        return f"{file}#{item['id']}"
+    return f"{file}@{position}:{hashlib.sha1(pattern.encode('utf-8')).hexdigest()[:8]}"
+
+
+def collect_rules(paths: list) -> list:
+    """[{key, file, name, enabled, pattern, flags}, ...]：替换规则与目录规则中的正则"""
+    rules = []
+    for path in paths:
+        data = jsonio.load(path)
+        for position, item in enumerate(data if isinstance(data, list) else [data]):
+            if not isinstance(item, dict):
+                continue
+            if item.get("isRegex") and item.get("pattern"):
+                pattern, flags = item["pattern"], 0
+                enabled = item.get("isEnabled", True)
+            elif "serialNumber" in item and item.get("rule"):
+                pattern, flags = item["rule"], re.MULTILINE
+                enabled = item.get("enable", True)
+            else:
+                continue
+            rules.append({"key": rule_key(path.name, position, item, pattern), "file": path.name,
+                          "name": item.get("name") or "", "enabled": bool(enabled), "pattern": pattern, "flags": flags})
+    return rules
+
+
+# ---------- 对抗输入 ----------
+
+def class_sample(items) -> str:
+    """字符类中的一个字符"""
+    if items and items[0][0] is sre_parse.NEGATE:
+        for c in NEGATED_CANDIDATES:
+            if not class_contains(items[1:], c):
+                return c
+        return "\x01"
+    op, av = items[0]
+    if op is sre_parse.LITERAL:
+        return chr(av)
+    if op is sre_parse.RANGE:
+        return chr(av[0])
+    return CATEGORY_SAMPLES.get(str(av), "a")
+
+
+def class_contains(items, c: str) -> bool:
+    for op, av in items:
+        if op is sre_parse.LITERAL and ord(c) == av:
+            return True
+        if op is sre_parse.RANGE and av[0] <= ord(c) <= av[1]:
+            return True
+        if op is sre_parse.CATEGORY and CATEGORY_TESTS.get(str(av), lambda _: False)(c):
+            return True
+    return False
+
+
+def sample(items) -> str:
+    """能匹配该序列的一个最短样本（断言与锚点不占字符）"""
+    out = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            out.append(chr(av))
+        elif op is sre_parse.NOT_LITERAL:
+            out.append("a" if av != ord("a") else "b")
+        elif op is sre_parse.ANY:
+            out.append("a")
+        elif op is sre_parse.IN:
+            out.append(class_sample(av))
+        elif op in purify.REPEATS:
+            out.append(sample(av[2]) * av[0])
+        elif op is sre_parse.SUBPATTERN:
+            out.append(sample(av[-1]))
+        elif op is purify.ATOMIC_GROUP:
+            out.append(sample(av))
+        elif op is sre_parse.BRANCH:
+            out.append(sample(av[1][0]))
+    return "".join(out)
+
+
+def pumps(items, prefix: str = "", suffix: str = "", found: list = None) -> list:
+    """
+    [(前缀, 泵, 后缀), ...]：每个可多次重复的子表达式
+
+    前缀为到达它所需的文本，后缀为其后必须出现的文本（引擎常先检查必需的字面量，缺了会直接失配）
+    """
+    found = [] if found is None else found
+    for i, (op, av) in enumerate(items):
+        before = prefix + sample(items[:i])
+        after = sample(items[i + 1:]) + suffix
+        if op in purify.REPEATS:
+            if av[1] > 1:
+                body = sample(av[2]) or class_alphabet(av[2])[:1]
+                if body and (before, body, after) not in found:
+                    found.append((before, body, after))
+            pumps(av[2], before, after, found)
+        elif op is sre_parse.SUBPATTERN:
+            pumps(av[-1], before, after, found)
+        elif op is purify.ATOMIC_GROUP:
+            pumps(av, before, after, found)
+        elif op is sre_parse.ASSERT or op is sre_parse.ASSERT_NOT:
+            pumps(av[1], before, after, found)
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                pumps(branch, before, after, found)
+    return found
+
+
+def class_alphabet(items) -> str:
+    """正则中出现的字面量与字符类字符（随机输入的字符集）"""
+    chars = []
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.append(chr(av))
+        elif op is sre_parse.IN:
+            for sub_op, sub_av in av:
+                if sub_op is sre_parse.LITERAL:
+                    chars.append(chr(sub_av))
+                elif sub_op is sre_parse.RANGE:
+                    chars.extend(chr(c) for c in range(sub_av[0], min(sub_av[1], sub_av[0] + 8) + 1))
+                elif sub_op is sre_parse.CATEGORY:
+                    chars.append(CATEGORY_SAMPLES.get(str(sub_av), "a"))
+        elif op in purify.REPEATS:
+            chars.append(class_alphabet(av[2]))
+        elif op is sre_parse.SUBPATTERN:
+            chars.append(class_alphabet(av[-1]))
+        elif op is purify.ATOMIC_GROUP:
+            chars.append(class_alphabet(av))
+        elif op is sre_parse.ASSERT or op is sre_parse.ASSERT_NOT:
+            chars.append(class_alphabet(av[1]))
+        elif op is sre_parse.BRANCH:
+            chars.extend(class_alphabet(b) for b in av[1])
+    return "".join(dict.fromkeys("".join(chars)))
+
+
+def fill(unit: str, size: int) -> str:
+    return (unit * (size // max(len(unit), 1) + 1))[:size]
+
+
+def adversarial_inputs(pattern: str, corpus_text: str) -> dict:
+    """{输入族: 生成函数(长度) -> 文本}"""
+    tree, _ = purify.parse_tree(pattern)
+    families = {}
+    if tree is not None:
+        for k, (prefix, pump, after) in enumerate(pumps(tree)[:MAX_PUMPS]):
+            # 失配字符直接接在泵后，或接在泵之后的必需文本后
+            for tail in dict.fromkeys([*SUFFIXES, *(after + suffix for suffix in SUFFIXES)]):
+                families[f"pump{k}{tail[-8:]!r}"] = (
+                    lambda n, head=prefix, pump=pump, tail=tail: head + fill(pump, n - len(head)) + tail)
+        alphabet = class_alphabet(tree) + "　\n"
+        families["alphabet"] = lambda n, alphabet=alphabet: "".join(random.Random(SEED).choices(alphabet, k=n))
+    families["line"] = lambda n: fill(corpus_text.replace("\n", "，"), n)
+    families["corpus"] = lambda n: fill(corpus_text, n)
+    return families
+
+
+# ---------- 计时 ----------
+
+def run_once(compiled, text: str, timeout: float) -> float:
+    """finditer 遍历全部匹配的耗时（秒），超时返回 None"""
+    start = time.perf_counter()
+    try:
+        if purify.regex is not None:
+            for _ in compiled.finditer(text, timeout=timeout):
+                pass
+        else:
+            for _ in compiled.finditer(text):
+                pass
+    except TimeoutError:
+        return None
+    return time.perf_counter() - start
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(math.ceil(p / 100 * len(values))) - 1)]
+
+
+def chapter_costs(compiled, texts: list, timeout: float) -> list:
+    """每章 CORPUS_REPEAT 次耗时的中位数折算为每 KB 微秒数，超时的章节为 None"""
+    costs = []
+    for text in texts:
+        times = []
+        for _ in range(CORPUS_REPEAT):
+            seconds = run_once(compiled, text, timeout)
+            if seconds is None:
+                break
+            times.append(seconds)
+        if len(times) < CORPUS_REPEAT:
+            costs.append(None)
+            continue
+        median = sorted(times)[len(times) // 2]
+        costs.append(median * 1e6 / max(len(text.encode("utf-8")) / 1024, 0.001))
+    return costs
+
+
+def corpus_cost(compiled, texts: list, timeout: float, reference: float) -> dict:
+    """
+    语料上每章的每 KB 耗时（微秒）分布，以及相对基准正则的倍数（ratio_*）
+
+    reference 为基准正则每 KB 耗时的中位数
+    """
+    per_kb = [c for c in chapter_costs(compiled, texts, timeout) if c is not None]
+    ratios = [c / reference for c in per_kb] if reference else []
+    return {
+        "p50": round(percentile(per_kb, 50), 1),
+        "p90": round(percentile(per_kb, 90), 1),
+        "p99": round(percentile(per_kb, 99), 1),
+        "max": round(max(per_kb, default=0), 1),
+        "ratio_p50": round(percentile(ratios, 50), 1),
+        "ratio_p99": round(percentile(ratios, 99), 1),
+        "timeouts": len(texts) - len(per_kb),
+    }
+
+
+def exponent(t1: float, t2: float, n1: int, n2: int) -> float:
+    """增长指数：log(耗时比) / log(长度比)"""
+    return math.log(t2 / t1) / math.log(n2 / n1) if t1 > 0 and t2 > 0 else 0.0
+
+
+def screen(compiled, make, sizes: tuple, timeout: float):
+    """粗测：各长度上 SCREEN_REPEAT 次的最短耗时，超时返回 None"""
+    times = []
+    for n in sizes:
+        text = make(n)
+        best = float("inf")
+        for _ in range(SCREEN_REPEAT):
+            seconds = run_once(compiled, text, timeout)
+            if seconds is None:
+                return None
+            best = min(best, seconds)
+        times.append(best)
+    return times
+
+
+def confirm(compiled, make, start: int, timeout: float) -> dict:
+    """
+    复核：长度加倍到单次耗时不低于 MIN_SECONDS，在 n、2n、4n 上各取 REPEAT 次的中位数
+
+    返回: {"exponent"（两组相邻长度中较小的增长指数）, "seconds", "size", "timeout"}；
+    到 MAX_SIZE 仍低于 MIN_SECONDS 时增长指数记为 0（足够快，不判断）
+    """
+    n = start
+    while True:
+        seconds = run_once(compiled, make(n), timeout)
+        if seconds is None:
+            return {"exponent": None, "seconds": timeout, "size": n, "timeout": True}
+        if seconds >= MIN_SECONDS or n >= MAX_SIZE:
+            break
+        n *= 2
+    if seconds < MIN_SECONDS:
+        return {"exponent": 0.0, "seconds": round(seconds, 4), "size": n, "timeout": False}
+
+    sizes = (n, 2 * n, 4 * n)
+    medians = []
+    for size in sizes:
+        text = make(size)
+        times = []
+        for _ in range(REPEAT):
+            seconds = run_once(compiled, text, timeout)
+            if seconds is None:
+                return {"exponent": None, "seconds": timeout, "size": size, "timeout": True}
+            times.append(seconds)
+        medians.append(sorted(times)[len(times) // 2])
+    exponents = [exponent(medians[i], medians[i + 1], sizes[i], sizes[i + 1]) for i in range(2)]
+    return {"exponent": round(min(exponents), 2), "seconds": round(medians[-1], 4), "size": sizes[-1], "timeout": False}
+
+
+def growth(compiled, families: dict, sizes: tuple, timeout: float) -> dict:
+    """
+    各输入族的增长指数，返回最差的一族
+
+    先粗测全部输入族，粗测可疑（增长指数超过 SCREEN_EXPONENT 且耗时不低于 SCREEN_SECONDS）的
+    最多 MAX_CONFIRM 族再复核，以复核结果为准
+    """
+    worst = {"family": None, "exponent": 0.0, "seconds": 0.0, "timeout": False}
+    suspects = []
+    for family, make in families.items():
+        times = screen(compiled, make, sizes, timeout)
+        if times is None:
+            return {"family": family, "exponent": None, "seconds": timeout, "timeout": True, "size": sizes[-1]}
+        rough = exponent(times[-2], times[-1], sizes[-2], sizes[-1]) if times[-1] >= SCREEN_SECONDS else 0.0
+        if rough > SCREEN_EXPONENT:
+            suspects.append((rough, family))
+        elif (round(rough, 2), times[-1]) > (worst["exponent"], worst["seconds"]):
+            worst = {"family": family, "exponent": round(rough, 2), "seconds": round(times[-1], 4), "timeout": False}
+
+    for _, family in sorted(suspects, reverse=True)[:MAX_CONFIRM]:
+        result = confirm(compiled, families[family], sizes[-1], timeout)
+        if result["timeout"]:
+            return {"family": family, **result}
+        if (result["exponent"], result["seconds"]) > (worst["exponent"], worst["seconds"]):
+            worst = {"family": family, **result}
+    return worst
+
+
+def profile(rules: list, texts: list, sizes: tuple, timeout: float, slow: float) -> list:
+    """
+    逐条分析规则
+
+    problems 为阻断问题（timeout / superlinear / invalid），warnings 为提示（slow：p99 超过基准正则的 slow 倍）
+    """
+    corpus_text = "\n".join(texts[:20])
+    reference = percentile([c for c in chapter_costs(purify.compile_java(BASELINE_PATTERN), texts, timeout)
+                            if c is not None], 50)
+    results = []
+    for r in rules:
+        result = {k: r[k] for k in ("key", "file", "name", "enabled")}
+        try:
+            compiled = purify.compile_java(purify.java_regex(r["pattern"]), r["flags"])
+        except purify.RuleError as e:
+            result.update(error=str(e), problems=["invalid"], warnings=[])
+            results.append(result)
+            continue
+        result["corpus"] = corpus_cost(compiled, texts, timeout, reference)
+        result["growth"] = growth(compiled, adversarial_inputs(purify.java_regex(r["pattern"]), corpus_text), sizes, timeout)
+        problems = []
+        if result["corpus"]["timeouts"] or result["growth"]["timeout"]:
+            problems.append("timeout")
+        elif result["growth"]["exponent"] > SUPERLINEAR:
+            problems.append("superlinear")
+        result["problems"] = problems
+        result["warnings"] = ["slow"] if result["corpus"]["ratio_p99"] > slow else []
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="正则规则耗时分析与灾难性回溯检测")
+    parser.add_argument("--rules", "-r", nargs="+", help="规则文件，默认 rules/legado/*.json")
+    parser.add_argument("--corpus", "-c", help="txt 文本目录（默认使用生成的示例章节）")
+    parser.add_argument("--chapters", type=int, default=100, help="示例章节数，默认 100")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help=f"对抗输入的长度（字符，逗号分隔），默认 {','.join(map(str, SIZES))}")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help=f"单次执行超时（秒），默认 {TIMEOUT}")
+    parser.add_argument("--slow", type=float, default=SLOW_RATIO,
+                        help=f"语料上每章耗时相对基准正则的倍数（p99）超过该值时提示，默认 {SLOW_RATIO}")
+    parser.add_argument("--allow", default=str(ALLOW_PATH), help="已知问题列表")
+    parser.add_argument("--gate", action="store_true", help="有未列入已知问题的规则出问题时返回 1")
+    parser.add_argument("--write-allow", action="store_true", help="把本次有问题的规则写为已知问题列表")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    if purify.regex is None:
+        print("提示：未安装 regex 模块，Java 语法的正则可能无法编译，且无法设置超时（pip install regex）")
+
+    paths = [Path(p) for p in args.rules] if args.rules else sorted(RULES_DIR.glob("*.json"))
+    try:
+        rules = collect_rules(paths)
+    except (OSError, ValueError) as e:
+        print(f"错误：无法读取规则 {e}")
+        return 1
+    if not rules:
+        print("错误：没有找到正则规则")
+        return 1
+
+    chapters = bench_purify.load_corpus(args.corpus) if args.corpus else bench_purify.sample_chapters(args.chapters)
+    texts = [f"{title}\n{body}" for title, body in chapters]
+    sizes = tuple(sorted(int(s) for s in args.sizes.split(",")))
+    if len(sizes) < 2:
+        print("错误：--sizes 至少需要两个长度")
+        return 1
+
+    allowed = set()
+    if Path(args.allow).exists():
+        # 旧格式（按文件名 + 规则名）的条目没有 key，不再匹配，用 --write-allow 重新生成
+        allowed = {a["key"] for a in jsonio.load(Path(args.allow)) if "key" in a}
+
+    print(f"规则：{len(rules)} 条正则（{len(paths)} 个文件），语料：{len(texts)} 章")
+    results = profile(rules, texts, sizes, args.timeout, args.slow)
+
+    print(f"\n{'文件':<20}{'规则':<22}{'p50':>8}{'p99':>8}{'最大':>9}  微秒/KB{'p99':>8} ×基准   最差输入（增长指数）")
+    for r in results:
+        if "error" in r:
+            print(f"{r['file']:<20}{r['name'][:20]:<22}  无法编译：{r['error'].splitlines()[0]}")
+            continue
+        c, g = r["corpus"], r["growth"]
+        worst = "超时" if g["timeout"] else f"{g['exponent']}"
+        mark = f"  ← {'、'.join(r['problems'] + r['warnings'])}" if r["problems"] or r["warnings"] else ""
+        print(f"{r['file']:<20}{r['name'][:20]:<22}{c['p50']:>8}{c['p99']:>8}{c['max']:>9}         "
+              f"{c['ratio_p99']:>8}        {g['family'] or '-'}（{worst}）{mark}")
+
+    flagged = [r for r in results if r["problems"]]
+    blocking = [r for r in flagged if r["key"] not in allowed]
+    print(f"\n有问题的规则：{len(flagged)} 条，其中已知 {len(flagged) - len(blocking)} 条")
+    for r in blocking:
+        print(f"  {r['key']}（{r['name']}）：{'、'.join(r['problems'])}")
+    slow = [r for r in results if r["warnings"]]
+    if slow:
+        print(f"\n提示：{len(slow)} 条规则在语料上较慢（p99 超过基准正则的 {args.slow:g} 倍，不阻断）")
+        for r in slow:
+            print(f"  {r['key']}（{r['name']}）：p99 {r['corpus']['p99']} 微秒/KB，×{r['corpus']['ratio_p99']}")
+
+    if args.output:
+        jsonio.dump({"sizes": sizes, "timeout": args.timeout, "slow_ratio": args.slow, "baseline": BASELINE_PATTERN,
+                     "chapters": len(texts), "rules": results}, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    if args.write_allow:
+        jsonio.dump([{"key": r["key"], "file": r["file"], "name": r["name"], "problems": r["problems"]} for r in flagged],
+                    Path(args.allow))
+        print(f"已知问题列表已保存：{args.allow}")
+        return 0
+
+    if args.gate and blocking:
+        print(f"\n错误：{len(blocking)} 条规则耗时不合格")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
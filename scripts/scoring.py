@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+书源质量评分
+- 评分特征、权重与阈值来自 scoring.json
+- 先把评分字段读成列（NumPy 数组），再对整个书源列表逐特征向量化计算
+- 可返回每个特征的得分明细（--explain）
+- clean.py、integrate.py、merge.py 共用
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("请先安装 numpy: pip install numpy")
+    exit(1)
+
+import metrics
+
+# 默认配置文件
+CONFIG_PATH = Path(__file__).parent / "scoring.json"
+
+# 一天的毫秒数
+DAY_MS = 86400000
+
+_config_cache = {}
+
+
+def load_config(path=None) -> dict:
+    """读取评分配置（按路径缓存）"""
+    path = Path(path) if path else CONFIG_PATH
+    if path not in _config_cache:
+        with open(path, "r", encoding="utf-8") as f:
+            _config_cache[path] = json.load(f)
+    return _config_cache[path]
+
+
+def raw_column(sources: list, field: str, default=None) -> list:
+    """按字段取出一列原始值"""
+    return [s.get(field, default) for s in sources]
+
+
+def flag_column(columns: dict, sources: list, fields: list, default=None) -> np.ndarray:
+    """任一字段为真值时为 True"""
+    flags = np.zeros(len(sources), dtype=bool)
+    for field in fields:
+        key = (field, default)
+        if key not in columns:
+            columns[key] = raw_column(sources, field, default)
+        flags |= np.fromiter(map(bool, columns[key]), dtype=bool, count=len(sources))
+    return flags
+
+
+def number_column(columns: dict, sources: list, field: str, missing=0) -> np.ndarray:
+    """数值字段，缺失或非数值时取 missing"""
+    key = (field, missing)
+    if key not in columns:
+        columns[key] = raw_column(sources, field, missing)
+    values = columns[key]
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([v if isinstance(v, (int, float)) else missing for v in values], dtype=np.float64)
+
+
+def step_points(values: np.ndarray, steps: list) -> np.ndarray:
+    """阶梯得分：values 小于第一个满足的阈值时取对应分数，都不满足为 0"""
+    return np.select([values < limit for limit, _ in steps], [points for _, points in steps], default=0)
+
+
+def score_feature(columns: dict, sources: list, spec: dict, now: float) -> np.ndarray:
+    """
+    计算单个特征的得分列
+
+    columns 为已读取的原始列缓存：{(字段, 默认值): [值, ...]}，同一字段只遍历书源一次
+    """
+    kind = spec["type"]
+    if kind == "flag":
+        return flag_column(columns, sources, spec["fields"], spec.get("default")) * spec["points"]
+    if kind == "below":
+        return step_points(number_column(columns, sources, spec["field"], spec.get("missing", 0)), spec["steps"])
+    if kind == "age":
+        last = number_column(columns, sources, spec["field"])
+        days = np.maximum(0, (now - last) / DAY_MS)
+        return np.where(last != 0, step_points(days, spec["steps"]), 0)
+    if kind == "divided":
+        values = number_column(columns, sources, spec["field"])
+        return np.minimum(np.floor_divide(values, spec["divisor"]), spec["max"])
+    raise ValueError(f"未知的评分特征类型：{kind}")
+
+
+def score_sources(sources: list, bonus=0, config: dict = None, now: float = None, explain: bool = False):
+    """
+    批量计算质量评分
+
+    bonus 可以是整数或与 sources 等长的数组；now 为毫秒时间戳，默认当前时间（整批只取一次）
+
+    返回: 整数评分数组；explain 为 True 时返回 (评分数组, {特征名: 得分数组})
+    """
+    config = config or load_config()
+    now = time.time() * 1000 if now is None else now
+
+    with metrics.stage("score", len(sources)) as record:
+        columns = {}
+        contributions = {}
+        total = np.zeros(len(sources), dtype=np.float64) + bonus
+        for name, spec in config["features"].items():
+            points = score_feature(columns, sources, spec, now)
+            contributions[name] = points.astype(np.int64)
+            total += points
+
+        total = total.astype(np.int64)
+        record["items_out"] = len(total)
+    if explain:
+        return total, contributions
+    return total
+
+
+def stable_until(sources: list, now: float = None, config: dict = None) -> np.ndarray:
+    """
+    评分保持不变的截止时间（毫秒时间戳）
+
+    只有按天衰减的特征（age）随时间变化：天数跨过下一个阶梯阈值之前评分不变；没有后续阈值时为 inf
+    """
+    config = config or load_config()
+    now = time.time() * 1000 if now is None else now
+    until = np.full(len(sources), np.inf)
+    for spec in config["features"].values():
+        if spec["type"] != "age":
+            continue
+        last = number_column({}, sources, spec["field"])
+        days = np.maximum(0, (now - last) / DAY_MS)
+        following = np.full(len(sources), np.inf)
+        for limit, _ in spec["steps"]:
+            following = np.where(days < limit, np.minimum(following, limit), following)
+        until = np.minimum(until, np.where(last != 0, last + following * DAY_MS, np.inf))
+    return until
+
+
+def score_source(source: dict, bonus: int = 0, config: dict = None) -> int:
+    """单个书源的质量评分"""
+    return int(score_sources([source], bonus, config)[0])
+
+
+def grade_groups(scores, config: dict = None) -> list:
+    """按评分返回分组名称列表（精选/标准/备用）"""
+    config = config or load_config()
+    scores = np.asarray(scores)
+    conditions = []
+    groups = []
+    for grade in config["grades"]:
+        conditions.append(scores >= grade["min"] if grade["min"] is not None else np.ones(len(scores), dtype=bool))
+        groups.append(grade["group"])
+    return np.select(conditions, groups, default=groups[-1]).tolist()
+
+
+def merge_keys(sources: list, config: dict = None) -> list:
+    """
+    合并比较用的元组（越大越好）：
+
+    (是否启用, lastUpdateTime, 规则完整性, weight, -customOrder)
+    """
+    config = (config or load_config())["merge"]
+
+    columns = {}
+    completeness = np.zeros(len(sources), dtype=np.int64)
+    for item in config["completeness"]:
+        if item["section"] is None:
+            completeness += flag_column(columns, sources, [item["field"]]) * item["points"]
+            continue
+        blocks = columns.setdefault((item["section"], None), raw_column(sources, item["section"]))
+        field = item["field"]
+        present = [isinstance(block, dict) and bool(block.get(field)) for block in blocks]
+        completeness += np.array(present, dtype=bool) * item["points"]
+
+    enabled = [1 if s.get("enabled", True) else 0 for s in sources]
+    last_update = [s.get("lastUpdateTime", 0) for s in sources]
+    weight = [s.get("weight", 0) for s in sources]
+    order = [-s.get("customOrder", config["customOrder"]) for s in sources]
+    return list(zip(enabled, last_update, completeness.tolist(), weight, order))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="书源质量评分")
+    parser.add_argument("--input", "-i", required=True, help="书源文件路径")
+    parser.add_argument("--config", "-c", help=f"评分配置文件，默认 {CONFIG_PATH.name}")
+    parser.add_argument("--explain", "-e", type=int, default=0, help="输出前 N 个书源的得分明细")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        sources = json.load(f)
+
+    config = load_config(args.config)
+
+    start = time.perf_counter()
+    scores, contributions = score_sources(sources, config=config, explain=True)
+    elapsed = time.perf_counter() - start
+
+    print(f"书源：{len(sources)} 个，评分耗时 {elapsed * 1000:.1f} ms")
+
+    groups = grade_groups(scores, config)
+    print("\n分组统计：")
+    for grade in config["grades"]:
+        print(f"  {grade['group']}: {groups.count(grade['group'])}")
+
+    print("\n各特征平均得分：")
+    for name, points in contributions.items():
+        print(f"  {name}: {points.mean() if len(points) else 0:.2f}")
+
+    for i in np.argsort(-scores, kind="stable")[:args.explain]:
+        detail = "，".join(f"{name} {int(points[i])}" for name, points in contributions.items() if points[i])
+        print(f"\n{sources[i].get('bookSourceName', '')} = {int(scores[i])}")
+        print(f"  {detail}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+朗读引擎（HttpTTS）探测与延迟排序
+- 用固定的短文本展开 url 模板中的 {{...}}：支持 speakText、speakSpeed、字符串/数字字面量、+ 拼接，
+  以及 java.encodeURI、encodeURI、encodeURIComponent、String；其他表达式视为 JS
+- 支持 url,{json 参数}（method/body/headers/charset）；header 字段与参数 headers 合并到默认请求头
+- 地址、参数或请求头依赖 JS（@js:、<js>、webView 等）时标记为“无法校验”，不发请求
+- 按 concurrentRate 限制同一引擎的请求频率（“N”：间隔 N 毫秒；“次数/毫秒”：时间窗内最多若干次；空或 0 不限）
+- 每个引擎计时探测若干次（不复用连接），记录连接、首字节（TTFB）与完整音频耗时的 p50/p95；
+  多个引擎常共用同一主机，计时请求每主机只并发 HOST_CONCURRENCY 个，探测自身的负载不计入延迟；
+  主机熔断后未发出请求的引擎单独计为“熔断未测”，不算失效
+  响应须为音频（contentType 字段的正则，未设置时按 Content-Type audio/* 或文件头识别）
+- 有效引擎按完整音频耗时（阅读下载完整段落音频后才开始播放）、其次首字节耗时排序，并按耗时分档
+- --reorder 按排序结果写出规则文件（HttpTTS 没有分组字段，以顺序代替分组）
+- --stand-in 启动本地替身服务（按地址哈希给出不同延迟的 WAV 音频），所有请求改发到替身服务，离线验证探测流程
+"""
+
+import re
+import json
+import time
+import zlib
+import struct
+import asyncio
+import argparse
+from pathlib import Path
+from urllib.parse import quote, quote_plus, urlsplit
+
+from aiohttp import web
+
+import jsonio
+import rule
+from functional import OPTION_SPLIT
+from probe import Prober, ProbeError, BreakerOpen, source_headers, percentile, DEFAULT_TIMEOUT, LATENCY_METRICS
+
+# 默认规则文件
+BASE_DIR = Path(__file__).parent.parent
+TTS_PATH = BASE_DIR / "rules/legado/tts.json"
+
+# 探测用的朗读文本与语速（阅读中 speakSpeed 为朗读设置的语速值）
+SPEAK_TEXT = "第一章 春风十里，不如你。"
+SPEAK_SPEED = 5
+
+# 每个引擎的计时探测次数
+PROBES = 3
+
+# 计时请求的每主机并发数
+HOST_CONCURRENCY = 1
+
+# 耗时分档：(档位, 完整音频耗时 p50 上限毫秒)，超出最后一档为“慢”
+TIERS = (("快", 1000), ("中", 3000))
+SLOW_TIER = "慢"
+
+# 常见音频文件头
+AUDIO_MAGIC = (b"RIFF", b"ID3", b"OggS", b"fLaC", b"\xff\xfb", b"\xff\xf3", b"\xff\xf2", b"\xff\xf1", b"\xff\xf9")
+
+# 模板表达式的词法单元：字符串、数字、标识符（可带点号）、运算符与括号
+TOKEN_PATTERN = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|(\d+(?:\.\d+)?)|([A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)|(.))')
+
+# 替身服务：基础延迟、按地址哈希附加的延迟（毫秒）、音频时长（秒）与分块数
+STAND_IN_DELAY = 50
+STAND_IN_SPREAD = 400
+STAND_IN_SECONDS = 1
+STAND_IN_CHUNKS = 4
+
+
+def java_encode_uri(text: str, charset: str = "utf-8") -> str:
+    """java.encodeURI：与 Java URLEncoder.encode 相同（空格为 +，只保留字母数字与 .-*_）"""
+    return quote_plus(text, safe="*", encoding=charset).replace("~", "%7E")
+
+
+# 支持的函数
+FUNCTIONS = {
+    "java.encodeURI": java_encode_uri,
+    "encodeURI": lambda text: quote(text, safe=";,/?:@&=+$-_.!~*'()#"),
+    "encodeURIComponent": lambda text: quote(text, safe="-_.!~*'()"),
+    "String": str,
+}
+
+
+def literal(string: str):
+    """字符串字面量（单引号或双引号，JSON 转义）；无法解析时返回 None（计算时视为 JS）"""
+    inner = string[1:-1]
+    if string[0] == "'":
+        inner = re.sub(r'\\\'|"', lambda m: "'" if m.group() != '"' else '\\"', inner)
+    try:
+        return json.loads(f'"{inner}"')
+    except ValueError:
+        return None
+
+
+def tokenize(expr: str) -> list:
+    """拆分模板表达式"""
+    tokens = []
+    for m in TOKEN_PATTERN.finditer(expr):
+        string, number, name, op = m.groups()
+        if string is not None:
+            tokens.append(("value", literal(string)))
+        elif number is not None:
+            tokens.append(("value", float(number) if "." in number else int(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        elif op.strip():
+            tokens.append(("op", op))
+    return tokens
+
+
+def evaluate(expr: str, variables: dict):
+    """
+    计算模板表达式（只支持 FUNCTIONS 中的函数、variables 中的变量、字面量与 + 拼接）
+
+    其他表达式抛出 rule.Unverifiable
+    """
+    tokens = tokenize(expr)
+    pos = 0
+
+    def unverifiable():
+        return rule.Unverifiable(f"模板含 JS：{expr.strip()[:30]}")
+
+    def peek(kind, value=None):
+        return pos < len(tokens) and tokens[pos][0] == kind and (value is None or tokens[pos][1] == value)
+
+    def take(kind, value=None):
+        nonlocal pos
+        if not peek(kind, value):
+            raise unverifiable()
+        pos += 1
+        return tokens[pos - 1][1]
+
+    def term():
+        if peek("value"):
+            value = take("value")
+            if value is None:
+                raise unverifiable()
+            return value
+        if peek("op", "("):
+            take("op", "(")
+            value = add()
+            take("op", ")")
+            return value
+        name = take("name")
+        if not peek("op", "("):
+            if name not in variables:
+                raise unverifiable()
+            return variables[name]
+        if name not in FUNCTIONS:
+            raise unverifiable()
+        take("op", "(")
+        args = [] if peek("op", ")") else [add()]
+        while peek("op", ","):
+            take("op", ",")
+            args.append(add())
+        take("op", ")")
+        try:
+            return FUNCTIONS[name](*[a if isinstance(a, str) else str(a) for a in args])
+        except (TypeError, LookupError):
+            raise unverifiable()
+
+    def add():
+        value = term()
+        while peek("op", "+"):
+            take("op", "+")
+            right = term()
+            if isinstance(value, str) or isinstance(right, str):
+                value = f"{value}{right}"
+            else:
+                value += right
+        return value
+
+    value = add()
+    if pos != len(tokens):
+        raise unverifiable()
+    return value
+
+
+def render(template: str, variables: dict) -> str:
+    """展开模板中的 {{...}}"""
+    def replace(match):
+        value = evaluate(match.group(1), variables)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+
+    return rule.TEMPLATE_PATTERN.sub(replace, template)
+
+
+def build_request(engine: dict, text: str = SPEAK_TEXT, speed: int = SPEAK_SPEED) -> dict:
+    """
+    按朗读引擎的 url 构造请求
+
+    返回: {"url", "method", "body", "headers", "charset"}；依赖 JS 时抛出 rule.Unverifiable
+    """
+    url_rule = (engine.get("url") or "").strip()
+    if not url_rule:
+        raise ValueError("地址为空")
+    if rule.JS_PATTERN.search(url_rule):
+        raise rule.Unverifiable("地址含 JS")
+
+    parts = OPTION_SPLIT.split(url_rule, maxsplit=1)
+    options = {}
+    if len(parts) > 1:
+        try:
+            options = json.loads(parts[1])
+        except ValueError:
+            raise rule.Unverifiable("请求参数无法解析")
+        if not isinstance(options, dict):
+            raise rule.Unverifiable("请求参数无法解析")
+    if options.get("webView") or options.get("js"):
+        raise rule.Unverifiable("请求依赖 webView/JS")
+
+    variables = {"speakText": text, "speakSpeed": speed}
+    headers = source_headers(engine)
+    if isinstance(options.get("headers"), dict):
+        headers.update({str(k): str(v) for k, v in options["headers"].items()})
+
+    body = options.get("body")
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, ensure_ascii=False)
+    if body:
+        body = render(body, variables)
+        json_body = body.lstrip()[:1] in ("{", "[")
+        headers.setdefault("Content-Type", "application/json" if json_body else "application/x-www-form-urlencoded")
+
+    return {
+        "url": render(parts[0], variables),
+        "method": (options.get("method") or ("POST" if body else "GET")).upper(),
+        "body": body,
+        "headers": headers,
+        "charset": options.get("charset") or "",
+    }
+
+
+def is_audio(resp: dict, content_type: str = "") -> bool:
+    """响应是否为音频：设置了 contentType 时按其正则匹配 Content-Type，否则看 Content-Type 或文件头"""
+    if not resp["body"]:
+        return False
+    if content_type:
+        try:
+            return re.fullmatch(content_type, resp["content_type"] or "") is not None
+        except re.error:
+            pass
+    return (resp["content_type"] or "").startswith("audio/") or resp["body"].startswith(AUDIO_MAGIC)
+
+
+def tier(total_ms: int) -> str:
+    """按完整音频耗时分档"""
+    return next((name for name, limit in TIERS if total_ms <= limit), SLOW_TIER)
+
+
+class RateLimit:
+    """
+    concurrentRate 频率限制（与阅读相同）
+
+    - "N"：两次请求至少间隔 N 毫秒
+    - "次数/毫秒"：从窗口内第一次请求起，该时长内最多发出若干次
+    - 空、0 或无法解析：不限
+    """
+
+    def __init__(self, rate: str):
+        self.count, self.window = 0, 0.0
+        rate = str(rate or "").strip()
+        try:
+            if "/" in rate:
+                count, window = rate.split("/", 1)
+                self.count, self.window = int(count), int(window) / 1000
+            elif rate:
+                self.count, self.window = 1, int(rate) / 1000
+        except ValueError:
+            self.count, self.window = 0, 0.0
+        self.started = None
+        self.used = 0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if self.count <= 0 or self.window <= 0:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            if self.started is not None and self.used >= self.count:
+                delay = self.started + self.window - now
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    now = time.monotonic()
+            if self.started is None or now >= self.started + self.window:
+                self.started, self.used = now, 0
+            self.used += 1
+
+
+def rewrite_host(url: str, base: str) -> str:
+    """把地址的协议与主机替换为 base（替身服务）"""
+    target = urlsplit(base)
+    return urlsplit(url)._replace(scheme=target.scheme, netloc=target.netloc).geturl()
+
+
+async def probe_engine(prober: Prober, engine: dict, probes: int, text: str, speed: int, base: str = None) -> dict:
+    """
+    计时探测单个引擎
+
+    返回: {"status": "valid"|"invalid"|"unverifiable"|"tripped", "samples", "failed", "tripped", "bytes",
+           "connect"/"ttfb"/"total": {"p50", "p95"}, "error"}；所有请求都因主机熔断未发出时为 tripped
+    """
+    try:
+        request = build_request(engine, text, speed)
+    except rule.Unverifiable as e:
+        return {"status": "unverifiable", "error": str(e)}
+    except ValueError as e:
+        return {"status": "invalid", "error": str(e)}
+
+    url = rewrite_host(request["url"], base) if base else request["url"]
+    data = request["body"].encode(request["charset"] or "utf-8", errors="replace") if request["body"] else None
+    limit = RateLimit(engine.get("concurrentRate"))
+
+    samples, error, tripped = [], None, 0
+    for _ in range(probes):
+        await limit.wait()
+        try:
+            resp = await prober.request(request["method"], url, request["headers"], data, timed=True)
+        except BreakerOpen as e:
+            tripped += 1
+            error = error or str(e)
+            continue
+        except ProbeError as e:
+            error = str(e)
+            continue
+        if resp["status"] >= 400:
+            error = f"HTTP {resp['status']}"
+        elif not is_audio(resp, engine.get("contentType")):
+            error = f"非音频响应（{resp['content_type'] or '无 Content-Type'}）"
+        else:
+            samples.append(resp)
+
+    status = "valid" if samples else "tripped" if tripped == probes else "invalid"
+    result = {"status": status, "samples": len(samples), "failed": probes - len(samples) - tripped, "tripped": tripped}
+    if samples:
+        result["bytes"] = percentile([len(r["body"]) for r in samples], 50)
+        for metric in LATENCY_METRICS:
+            values = [r[metric] for r in samples]
+            result[metric] = {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        result["tier"] = tier(result["total"]["p50"])
+    if error:
+        result["error"] = error
+    return result
+
+
+async def probe_engines(engines: list, probes: int = PROBES, timeout: int = DEFAULT_TIMEOUT, text: str = SPEAK_TEXT,
+                        speed: int = SPEAK_SPEED, base: str = None, host_concurrency: int = HOST_CONCURRENCY) -> tuple:
+    """并发探测所有引擎（同一主机的计时请求最多并发 host_concurrency 个），返回 (与 engines 对应的结果列表, 探测器报告)"""
+    async with Prober(timeout, host_concurrency=host_concurrency) as prober:
+        done = 0
+
+        async def one(engine):
+            nonlocal done
+            result = await probe_engine(prober, engine, probes, text, speed, base)
+            done += 1
+            print(f"\r进度：{done}/{len(engines)} ({done * 100 // len(engines)}%)", end="", flush=True)
+            return result
+
+        results = await asyncio.gather(*(one(e) for e in engines))
+        print()
+        return results, prober.report()
+
+
+def rank(engines: list, results: list) -> list:
+    """排序：有效引擎按完整音频、首字节耗时，其后为无法校验、熔断未测与失效引擎（保持原顺序），返回下标列表"""
+    order = {"valid": 0, "unverifiable": 1, "tripped": 2, "invalid": 3}
+
+    def key(i):
+        r = results[i]
+        if r["status"] != "valid":
+            return order[r["status"]], 0, 0, i
+        return 0, r["total"]["p50"], r["ttfb"]["p50"], i
+
+    return sorted(range(len(engines)), key=key)
+
+
+def wav(seconds: float, rate: int = 8000) -> bytes:
+    """静音 WAV（8 位单声道）"""
+    frames = int(seconds * rate)
+    header = b"RIFF" + struct.pack("<I", 36 + frames) + b"WAVEfmt " + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate, 1, 8)
+    return header + b"data" + struct.pack("<I", frames) + b"\x80" * frames
+
+
+async def start_stand_in() -> tuple:
+    """
+    启动本地替身服务，返回 (runner, 基础地址, 并发记录)，并发记录的 "peak" 为同时处理的最多请求数
+
+    每个请求按路径与参数的哈希先等待 STAND_IN_DELAY + [0, STAND_IN_SPREAD) 毫秒再返回首块，
+    其余分块间隔同样时长，音频为 STAND_IN_SECONDS 秒静音 WAV
+    """
+    audio = wav(STAND_IN_SECONDS)
+    size = -(-len(audio) // STAND_IN_CHUNKS)
+    load = {"active": 0, "peak": 0}
+
+    async def handle(request):
+        load["active"] += 1
+        load["peak"] = max(load["peak"], load["active"])
+        try:
+            return await respond(request)
+        finally:
+            load["active"] -= 1
+
+    async def respond(request):
+        delay = (STAND_IN_DELAY + zlib.crc32(request.path_qs.encode()) % STAND_IN_SPREAD) / 1000
+        await request.read()
+        await asyncio.sleep(delay)
+        resp = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        resp.content_length = len(audio)
+        await resp.prepare(request)
+        for i in range(0, len(audio), size):
+            if i:
+                await asyncio.sleep(delay / STAND_IN_CHUNKS)
+            await resp.write(audio[i:i + size])
+        return resp
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", load
+
+
+async def run(engines: list, args) -> tuple:
+    """按命令行参数执行探测（--stand-in 时先启动替身服务）"""
+    runner, base, load = (await start_stand_in()) if args.stand_in else (None, args.base, None)
+    try:
+        return await probe_engines(engines, args.probes, args.timeout, args.text, args.speed, base, args.host_concurrency)
+    finally:
+        if runner:
+            await runner.cleanup()
+            print(f"替身服务：同时处理的请求最多 {load['peak']} 个")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="朗读引擎（HttpTTS）探测与延迟排序")
+    parser.add_argument("--input", "-i", default=str(TTS_PATH), help="朗读引擎规则文件，默认 rules/legado/tts.json")
+    parser.add_argument("--probes", "-n", type=int, default=PROBES, help=f"每个引擎的计时探测次数，默认 {PROBES}")
+    parser.add_argument("--timeout", "-t", type=int, default=DEFAULT_TIMEOUT, help=f"超时时间（秒），默认 {DEFAULT_TIMEOUT}")
+    parser.add_argument("--text", default=SPEAK_TEXT, help="朗读文本")
+    parser.add_argument("--speed", type=int, default=SPEAK_SPEED, help=f"语速 speakSpeed，默认 {SPEAK_SPEED}")
+    parser.add_argument("--host-concurrency", type=int, default=HOST_CONCURRENCY,
+                        help=f"同一主机的计时请求并发数，默认 {HOST_CONCURRENCY}")
+    parser.add_argument("--base", help="把所有请求改发到该地址（协议与主机），如本地替身服务")
+    parser.add_argument("--stand-in", action="store_true", help="启动本地替身服务并把所有请求改发到它")
+    parser.add_argument("--output", "-o", help="结果 JSON 输出路径")
+    parser.add_argument("--reorder", help="按排序结果写出规则文件的路径")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"错误：输入文件不存在 {input_path}")
+        return 1
+    engines = jsonio.load(input_path)
+    if not isinstance(engines, list):
+        print(f"错误：规则文件应为数组 {input_path}")
+        return 1
+
+    print(f"朗读引擎：{len(engines)} 个" + ("（替身服务）" if args.stand_in else f"（改发到 {args.base}）" if args.base else ""))
+    results, report = asyncio.run(run(engines, args))
+    order = rank(engines, results)
+
+    counts = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("valid", "invalid", "unverifiable", "tripped")}
+    print(f"有效 {counts['valid']} 个，失效 {counts['invalid']} 个，无法校验 {counts['unverifiable']} 个，"
+          f"熔断未测 {counts['tripped']} 个")
+
+    print(f"\n排序（完整音频 p50 / 首字节 p50，毫秒）：")
+    for n, i in enumerate(order, 1):
+        r = results[i]
+        name = engines[i].get("name", "")
+        if r["status"] == "valid":
+            print(f"  {n:>3}. [{r['tier']}] {r['total']['p50']:>6} / {r['ttfb']['p50']:>6}  "
+                  f"{r['bytes'] / 1024:>7.1f} KB  {name}")
+        else:
+            label = {"unverifiable": "无法校验", "tripped": "熔断未测"}.get(r["status"], "失效")
+            print(f"  {n:>3}. [{label}] {r.get('error', '')}  {name}")
+
+    if report["tripped"]:
+        print(f"\n熔断主机：{', '.join(report['tripped'])}")
+
+    if args.output:
+        jsonio.dump({
+            "text": args.text,
+            "probes": args.probes,
+            "host_concurrency": args.host_concurrency,
+            "counts": counts,
+            "tiers": {name: limit for name, limit in TIERS},
+            "engines": [{"name": engines[i].get("name", ""), "id": engines[i].get("id"), **results[i]} for i in order],
+            **report,
+        }, Path(args.output))
+        print(f"\n结果输出到：{args.output}")
+
+    if args.reorder:
+        jsonio.dump([engines[i] for i in order], Path(args.reorder))
+        print(f"排序后的规则输出到：{args.reorder}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
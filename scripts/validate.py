@@ -4,110 +4,462 @@
 - 异步并发检测书源 URL 可访问性
 - 标记失效书源
 - 输出校验报告
+- 按源站去重探测，每个源站只探测一次
+- 网络探测（连接池、自适应并发、每主机并发上限、熔断、重试、请求头）见 probe.py；
+  主机熔断后未探测的书源保留在有效列表中（报告 untested），不计为失效
+- 功能校验模式（--functional）：搜索 -> 详情 -> 目录 -> 正文，见 functional.py
+- 支持分片校验（--shard i/N）及合并分片结果（merge 子命令）
+- 结果逐条写入 JSONL 日志（--journal），中断后可续跑（--resume）
+- 延迟测量（--probes N）：每个源站 N 次计时探测（连接/首字节/总耗时），记录 p50/p95，
+  可用实测 p50 改写 respondTime（--rewrite-respond-time）
+- 运行指标（各阶段耗时、内存、条数与计数器）：--metrics / --profile，见 metrics.py
 """
 
+import os
+import sys
 import json
+import time
 import asyncio
+import hashlib
 import argparse
 from pathlib import Path
 from datetime import datetime
 
-try:
-    import aiohttp
-except ImportError:
-    print("请先安装 aiohttp: pip install aiohttp")
-    exit(1)
+import jsonio
+import metrics
+from domains import normalize_origin
+from probe import Prober, BreakerOpen, percentile, DEFAULT_TIMEOUT, CONCURRENCY, MIN_CONCURRENCY, MAX_CONCURRENCY
 
+# 改写 respondTime 时的默认计时探测次数
+DEFAULT_PROBES = 3
 
-# 默认超时时间（秒）
-DEFAULT_TIMEOUT = 10
+# 校验日志：每 N 条或每 T 秒刷新到磁盘
+JOURNAL_FLUSH_EVERY = 50
+JOURNAL_FLUSH_INTERVAL = 5
 
-# 并发数量
-CONCURRENCY = 20
 
+def parse_shard(value: str) -> tuple:
+    """解析分片参数 i/N（i 从 1 开始），返回 (i, N)"""
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N：{value}")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"分片编号超出范围：{value}")
+    return index, count
 
-async def check_source(session: aiohttp.ClientSession, source: dict, timeout: int) -> tuple:
-    """
-    检查单个书源是否有效
 
-    返回: (书源, 是否有效, 错误信息)
-    """
-    url = source.get("bookSourceUrl", "")
-    if not url:
-        return source, False, "URL 为空"
+def shard_of(source: dict, count: int) -> int:
+    """按规范化源站的哈希计算书源所属分片（1..N），同一源站总在同一分片"""
+    origin = normalize_origin(source.get("bookSourceUrl", ""))
+    digest = hashlib.sha1(origin.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
 
-    try:
-        async with session.head(url, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=True) as resp:
-            if resp.status < 400:
-                return source, True, None
-            else:
-                return source, False, f"HTTP {resp.status}"
-    except asyncio.TimeoutError:
-        return source, False, "超时"
-    except aiohttp.ClientError as e:
-        return source, False, str(e)[:50]
-    except Exception as e:
-        return source, False, str(e)[:50]
+
+def select_shard(sources: list, index: int, count: int) -> list:
+    """选取第 index 个分片的书源（保持原有顺序）"""
+    return [s for s in sources if shard_of(s, count) == index]
 
 
-async def validate_sources(sources: list, timeout: int = DEFAULT_TIMEOUT, sample: int = None) -> tuple:
+class Journal:
     """
-    批量校验书源
+    追加写入的 JSONL 校验日志
 
-    返回: (有效书源列表, 无效书源列表)
+    每个书源完成后写一行 {"url", "valid", "error", ...}，每 JOURNAL_FLUSH_EVERY 条或
+    JOURNAL_FLUSH_INTERVAL 秒 flush + fsync 一次，进程被杀时最多丢失最近一批；
+    读取时跳过中断时未写完的行
     """
-    # 采样模式
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = None
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def load(self) -> dict:
+        """读取已有记录：{bookSourceUrl: 记录}"""
+        records = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["url"]] = record
+        return records
+
+    def open(self, resume: bool = False):
+        """打开日志；resume 时追加写入，否则清空重写"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 末行未写完时先补换行，避免与新记录粘连
+        broken = False
+        if resume and self.path.exists() and self.path.stat().st_size:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                broken = f.read(1) != b"\n"
+        self.file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if broken:
+            self.file.write("\n")
+        return self
+
+    def append(self, record: dict):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending += 1
+        if self.pending >= JOURNAL_FLUSH_EVERY or time.monotonic() - self.last_flush >= JOURNAL_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def collect_results(sources: list, records: dict) -> tuple:
+    """
+    按原始顺序从日志记录还原校验结果（未出现在日志中的书源忽略）
+
+    返回: (有效书源列表, 无效书源列表, 错误信息, 延迟结果, 功能校验结果)
+    """
+    valid = []
+    invalid = []
+    errors = {}
+    latency = {}
+    functional = {}
+    for s in sources:
+        url = s.get("bookSourceUrl", "")
+        record = records.get(url)
+        if record is None:
+            continue
+        if record["valid"]:
+            valid.append(s)
+        else:
+            invalid.append(s)
+            errors[url] = record.get("error")
+        if "latency" in record:
+            latency[url] = record["latency"]
+        if "functional" in record:
+            functional[url] = record["functional"]
+    return valid, invalid, errors, latency, functional
+
+
+def group_by_origin(sources: list) -> dict:
+    """按规范化源站分组：{源站: [书源, ...]}"""
+    groups = {}
+    for s in sources:
+        origin = normalize_origin(s.get("bookSourceUrl", ""))
+        groups.setdefault(origin, []).append(s)
+    return groups
+
+
+def rewrite_respond_time(sources: list, latency: dict) -> int:
+    """用实测总耗时 p50 改写 respondTime，返回改写数量"""
+    count = 0
+    for s in sources:
+        measured = latency.get(s.get("bookSourceUrl", ""))
+        if measured and measured["samples"]:
+            s["respondTime"] = measured["total"]["p50"]
+            count += 1
+    return count
+
+
+def sample_sources(sources: list, sample: int = None) -> list:
+    """采样模式：随机选取部分书源"""
     if sample and sample < len(sources):
         import random
         sources = random.sample(sources, sample)
         print(f"采样模式：随机选取 {sample} 个书源进行校验")
+    return sources
+
+
+async def validate_sources(sources: list, timeout: int = DEFAULT_TIMEOUT, sample: int = None, probes: int = 0,
+                           floor: int = MIN_CONCURRENCY, ceiling: int = MAX_CONCURRENCY,
+                           journal: Journal = None) -> tuple:
+    """
+    批量校验书源
+
+    书源先按源站去重，每个源站只探测一次，结果回填到该源站下的所有书源
+    probes > 0 时对有效源站追加计时探测，延迟结果记录在统计信息的 latency 中
+    全局并发在 [floor, ceiling] 内自适应调整，轨迹记录在统计信息的 concurrency 中
+    journal 不为空时每个书源的结果在完成时写入日志
+    所在主机已熔断、未探测的书源保留在有效列表中，计入统计信息的 untested（日志中标记 untested，续跑时重新探测）
+
+    返回: (有效书源列表, 无效书源列表, 错误信息, 统计信息)
+    """
+    sources = sample_sources(sources, sample)
 
     valid = []
     invalid = []
     errors = {}
+    latency = {}
 
-    # 创建信号量控制并发
-    semaphore = asyncio.Semaphore(CONCURRENCY)
+    groups = group_by_origin(sources)
+    print(f"源站去重：{len(sources)} 个书源 -> {len(groups)} 个源站")
 
-    async def check_with_semaphore(session, source):
-        async with semaphore:
-            return await check_source(session, source, timeout)
+    async def check_one(prober, origin):
+        try:
+            result = await prober.check(origin)
+        except BreakerOpen as e:
+            return origin, None, str(e), None
+        measured = None
+        if probes and result[0]:
+            measured = await prober.measure(origin, probes)
+        return origin, *result, measured
 
-    connector = aiohttp.TCPConnector(limit=CONCURRENCY, ssl=False)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        tasks = [check_with_semaphore(session, s) for s in sources]
+    async with Prober(timeout, floor, ceiling) as prober:
+        tasks = [check_one(prober, o) for o in groups]
 
-        total = len(tasks)
+        total = len(sources)
         completed = 0
+        untested = 0
 
         for coro in asyncio.as_completed(tasks):
-            source, is_valid, error = await coro
-            completed += 1
-
-            if is_valid:
-                valid.append(source)
-            else:
-                invalid.append(source)
-                errors[source.get("bookSourceUrl", "")] = error
+            origin, is_valid, error, measured = await coro
+
+            for source in groups[origin]:
+                completed += 1
+                url = source.get("bookSourceUrl", "")
+                if is_valid is None:
+                    # 主机已熔断、未探测：保留，不计为失效
+                    valid.append(source)
+                    untested += 1
+                elif is_valid:
+                    valid.append(source)
+                    if measured:
+                        latency[url] = measured
+                else:
+                    invalid.append(source)
+                    errors[url] = error
+
+                if journal:
+                    record = {"url": url, "valid": is_valid is not False, "error": error}
+                    if is_valid is None:
+                        record["untested"] = True
+                    if is_valid and measured:
+                        record["latency"] = measured
+                    journal.append(record)
 
             # 进度显示
-            if completed % 10 == 0 or completed == total:
-                print(f"\r进度：{completed}/{total} ({completed*100//total}%)", end="", flush=True)
+            print(f"\r进度：{completed}/{total} ({completed*100//total}%)", end="", flush=True)
 
     print()  # 换行
 
-    return valid, invalid, errors
+    stats = {
+        "origins": len(groups),
+        "untested": untested,
+        **prober.report()
+    }
+    metrics.count("validate.origins", len(groups))
+    metrics.count("validate.invalid", len(invalid))
+    metrics.count("validate.untested", untested)
+    metrics.count("validate.tripped_hosts", len(stats["tripped"]))
+    if probes:
+        stats["probes"] = probes
+        stats["latency"] = latency
+    return valid, invalid, errors, stats
+
+
+def load_json(path: Path) -> list:
+    """读取 JSON 文件，文件不存在时返回 None"""
+    if not path.exists():
+        print(f"警告：文件不存在，跳过 {path}")
+        return None
+    return jsonio.load(path)
+
+
+def load_jsons(paths: list) -> list:
+    """并发读取多个 JSON 文件，跳过不存在的文件"""
+    existing = []
+    for path in map(Path, paths):
+        if path.exists():
+            existing.append(path)
+        else:
+            print(f"警告：文件不存在，跳过 {path}")
+    return jsonio.load_many(existing)
+
+
+def write_json(path: Path, data):
+    """原子写出 JSON 文件（自动创建目录）"""
+    jsonio.dump(data, path)
+
+
+def merge_concurrency(reports: list) -> dict:
+    """
+    合并各分片的并发报告为单次运行的结构
+
+    floor/ceiling 取并集范围，peak 取最大值，final 取最小值（最保守）
+    trace 保留一个起点，其后为各分片的调整点按时间排序
+    """
+    trace = [min((r["trace"][0] for r in reports), key=lambda p: p[1])]
+    trace += sorted((p for r in reports for p in r["trace"][1:]), key=lambda p: p[0])
+    return {
+        "floor": min(r["floor"] for r in reports),
+        "ceiling": max(r["ceiling"] for r in reports),
+        "final": min(r["final"] for r in reports),
+        "peak": max(r["peak"] for r in reports),
+        "trace": trace
+    }
+
+
+def merge_shards(valid_lists: list, invalid_lists: list, reports: list, order: list = None) -> tuple:
+    """
+    合并各分片的校验结果
+
+    order 为原始书源列表时，按原始顺序排列合并结果
+
+    返回: (有效书源列表, 无效书源列表, 合并后的报告)
+    """
+    valid = [s for lst in valid_lists for s in lst]
+    invalid = [s for lst in invalid_lists for s in lst]
+
+    if order is not None:
+        position = {}
+        for i, s in enumerate(order):
+            position.setdefault(s.get("bookSourceUrl", ""), i)
+        key = lambda s: position.get(s.get("bookSourceUrl", ""), len(position))
+        valid.sort(key=key)
+        invalid.sort(key=key)
+
+    errors = {}
+    for r in reports:
+        errors.update(r.get("errors", {}))
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "total": sum(r.get("total", 0) for r in reports),
+        "valid": len(valid),
+        "invalid": len(invalid),
+        "sample": reports[0].get("sample") if reports else None,
+        "timeout": max((r.get("timeout", DEFAULT_TIMEOUT) for r in reports), default=DEFAULT_TIMEOUT),
+        "errors": errors,
+        "origins": sum(r.get("origins", 0) for r in reports),
+        "untested": sum(r.get("untested", 0) for r in reports),
+        "tripped": sorted({h for r in reports for h in r.get("tripped", [])})
+    }
+
+    # 并发轨迹：合并为与单次运行相同的结构，各分片明细另存于 shard_concurrency
+    concurrency = {r.get("shard", str(i)): r["concurrency"] for i, r in enumerate(reports) if "concurrency" in r}
+    if concurrency:
+        report["concurrency"] = merge_concurrency(list(concurrency.values()))
+        report["shard_concurrency"] = concurrency
+
+    # 延迟测量结果
+    if any("latency" in r for r in reports):
+        report["probes"] = max(r.get("probes", 0) for r in reports)
+        report["latency"] = {}
+        for r in reports:
+            report["latency"].update(r.get("latency", {}))
+
+    # 功能校验模式的分片报告
+    if any("functional" in r for r in reports):
+        from functional import summarize_steps
+        results = {}
+        for r in reports:
+            results.update(r.get("functional", {}))
+        del report["origins"]
+        del report["untested"]
+        report["unverifiable"] = sum(1 for r in results.values() if r["status"] == "unverifiable")
+        report["steps"] = summarize_steps(results)
+        report["functional"] = results
+    return valid, invalid, report
+
+
+def merge_main(argv: list) -> int:
+    """merge 子命令：合并分片校验结果"""
+    parser = argparse.ArgumentParser(prog="validate.py merge", description="合并分片校验结果")
+    parser.add_argument("--valid", nargs="+", default=[], help="各分片有效书源文件")
+    parser.add_argument("--invalid", nargs="*", default=[], help="各分片无效书源文件")
+    parser.add_argument("--reports", nargs="+", required=True, help="各分片校验报告")
+    parser.add_argument("--input", "-i", help="原始书源文件（用于恢复原始顺序，可选）")
+    parser.add_argument("--output", "-o", help="有效书源输出路径")
+    parser.add_argument("--invalid-output", help="无效书源输出路径")
+    parser.add_argument("--report", "-r", help="校验报告输出路径")
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    metrics.start(args)
+
+    valid_lists = load_jsons(args.valid)
+    invalid_lists = load_jsons(args.invalid)
+    reports = load_jsons(args.reports)
+
+    if not reports:
+        print("错误：没有有效的分片报告")
+        return 1
+
+    shards = sorted(r.get("shard", "") for r in reports)
+    print(f"合并分片：{len(reports)} 个 {shards}")
+
+    order = load_json(Path(args.input)) if args.input else None
+    with metrics.stage("merge", sum(map(len, valid_lists + invalid_lists)), "shards") as record:
+        valid, invalid, report = merge_shards(valid_lists, invalid_lists, reports, order)
+        record["items_out"] = len(valid)
+
+    print(f"  有效：{len(valid)} 个")
+    print(f"  无效：{len(invalid)} 个")
+
+    if args.output:
+        write_json(Path(args.output), valid)
+        print(f"\n有效书源输出到：{args.output}")
+
+    if args.invalid_output and invalid:
+        write_json(Path(args.invalid_output), invalid)
+        print(f"无效书源输出到：{args.invalid_output}")
+
+    if args.report:
+        write_json(Path(args.report), report)
+        print(f"校验报告输出到：{args.report}")
+
+    metrics.finish(args)
+    return 0
 
 
 def main():
-    parser = argparse.ArgumentParser(description="书源有效性校验脚本")
+    if sys.argv[1:2] == ["merge"]:
+        return merge_main(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="书源有效性校验脚本（合并分片结果：validate.py merge -h）")
     parser.add_argument("--input", "-i", required=True, help="输入文件路径")
     parser.add_argument("--output", "-o", help="有效书源输出路径")
     parser.add_argument("--invalid", help="无效书源输出路径")
     parser.add_argument("--timeout", "-t", type=int, default=DEFAULT_TIMEOUT, help=f"超时时间（秒），默认 {DEFAULT_TIMEOUT}")
     parser.add_argument("--sample", "-s", type=int, help="采样数量（用于测试）")
     parser.add_argument("--report", "-r", help="校验报告输出路径")
+    parser.add_argument("--shard", type=parse_shard, help="分片校验 i/N（按源站哈希划分，i 从 1 开始）")
+    parser.add_argument("--functional", "-f", action="store_true", help="功能校验：搜索 -> 详情 -> 目录 -> 正文")
+    parser.add_argument("--keyword", "-k", help="功能校验的搜索关键词（书源未设置 checkKeyWord 时使用）")
+    parser.add_argument("--probes", "-p", type=int, default=0, help="每个源站的计时探测次数，记录连接/首字节/总耗时 p50/p95")
+    parser.add_argument("--rewrite-respond-time", action="store_true",
+                        help=f"用实测总耗时 p50 改写有效书源的 respondTime（未指定 --probes 时探测 {DEFAULT_PROBES} 次）")
+    parser.add_argument("--journal", "-j", help="JSONL 校验日志路径（逐条写入结果，最终输出由日志生成）")
+    parser.add_argument("--resume", action="store_true", help="从 --journal 续跑：跳过日志中已有结果的书源")
+    parser.add_argument("--min-concurrency", type=int, default=MIN_CONCURRENCY, help=f"自适应并发下限，默认 {MIN_CONCURRENCY}")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help=f"自适应并发上限，默认 {MAX_CONCURRENCY}")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
+    metrics.start(args)
+
+    if args.resume and not args.journal:
+        print("错误：--resume 需要同时指定 --journal")
+        return 1
+
+    if args.min_concurrency < 1 or args.max_concurrency < args.min_concurrency:
+        print(f"错误：并发范围无效 {args.min_concurrency}..{args.max_concurrency}")
+        return 1
+
+    if args.rewrite_respond_time and not args.probes:
+        args.probes = DEFAULT_PROBES
+    if args.functional and args.probes:
+        print("警告：功能校验模式不做计时探测，忽略 --probes / --rewrite-respond-time")
+        args.probes = 0
+        args.rewrite_respond_time = False
 
     input_path = Path(args.input)
 
@@ -116,42 +468,109 @@ def main():
         return 1
 
     # 读取书源
-    with open(input_path, "r", encoding="utf-8") as f:
-        sources = json.load(f)
+    sources = jsonio.load(input_path)
 
     print(f"读取书源：{len(sources)} 个")
+
+    if args.shard:
+        index, count = args.shard
+        sources = select_shard(sources, index, count)
+        print(f"分片 {index}/{count}：{len(sources)} 个")
+
     print(f"超时设置：{args.timeout} 秒")
-    print(f"并发数量：{CONCURRENCY}")
+    if args.functional:
+        print(f"并发数量：{CONCURRENCY}")
+    else:
+        print(f"并发数量：自适应 {args.min_concurrency}..{args.max_concurrency}（初始 {CONCURRENCY}）")
+    if args.probes:
+        print(f"计时探测：每个源站 {args.probes} 次")
+
+    # 校验日志与续跑
+    journal = None
+    records = {}
+    pending = sources
+    if args.journal:
+        journal = Journal(Path(args.journal))
+        if args.resume:
+            records = journal.load()
+            # 熔断未探测的书源重新探测
+            done = {url for url, r in records.items() if not r.get("untested")}
+            pending = [s for s in sources if s.get("bookSourceUrl", "") not in done]
+            print(f"续跑：日志中已有 {len(sources) - len(pending)} 个，剩余 {len(pending)} 个")
+        journal.open(args.resume)
+        print(f"校验日志：{args.journal}")
     print()
 
     # 校验
-    valid, invalid, errors = asyncio.run(validate_sources(sources, args.timeout, args.sample))
+    try:
+        with metrics.stage("validate", len(pending), "functional" if args.functional else None) as record:
+            if args.functional:
+                from functional import functional_validate, summarize_steps, DEFAULT_KEYWORD
+                print("功能校验模式：搜索 -> 详情 -> 目录 -> 正文")
+                checked = sample_sources(pending, args.sample)
+                valid, invalid, errors, stats = asyncio.run(
+                    functional_validate(checked, args.timeout, args.keyword or DEFAULT_KEYWORD, journal))
+            else:
+                valid, invalid, errors, stats = asyncio.run(validate_sources(
+                    pending, args.timeout, args.sample, args.probes, args.min_concurrency, args.max_concurrency, journal))
+            record["items_out"] = len(valid)
+    finally:
+        if journal:
+            journal.close()
+
+    # 最终结果由日志生成（包含之前运行的结果，按原始顺序）
+    if journal:
+        records = journal.load()
+        valid, invalid, errors, latency, functional = collect_results(sources, records)
+        if args.functional:
+            stats["unverifiable"] = sum(1 for r in functional.values() if r["status"] == "unverifiable")
+            stats["steps"] = summarize_steps(functional)
+            stats["functional"] = functional
+        else:
+            recorded = [s for s in sources if s.get("bookSourceUrl", "") in records]
+            stats["origins"] = len(group_by_origin(recorded))
+            stats["untested"] = sum(1 for s in recorded if records[s.get("bookSourceUrl", "")].get("untested"))
+            if "latency" in stats:
+                stats["latency"] = latency
 
     print(f"\n校验结果：")
     print(f"  有效：{len(valid)} 个")
     print(f"  无效：{len(invalid)} 个")
     print(f"  有效率：{len(valid)*100//(len(valid)+len(invalid)) if valid or invalid else 0}%")
+    if "unverifiable" in stats:
+        print(f"  无法校验：{stats['unverifiable']} 个（保留）")
+    if stats["tripped"]:
+        print(f"  熔断主机：{len(stats['tripped'])} 个")
+    if stats.get("untested"):
+        print(f"  熔断未测：{stats['untested']} 个（保留）")
+    if "concurrency" in stats:
+        c = stats["concurrency"]
+        print(f"  并发：峰值 {c['peak']}，结束 {c['final']}，调整 {len(c['trace']) - 1} 次")
+    for name, step in stats.get("steps", {}).items():
+        print(f"  [{name}] 通过 {step['pass']} / 失败 {step['fail']} / 无法校验 {step['unverifiable']}"
+              f"，p50 {step['p50_ms']} ms，p95 {step['p95_ms']} ms")
+    if stats.get("latency"):
+        totals = [m["total"]["p50"] for m in stats["latency"].values() if m["samples"]]
+        print(f"  实测延迟：{len(totals)} 个书源，总耗时 p50 中位数 {percentile(totals, 50)} ms")
+    if args.rewrite_respond_time:
+        count = rewrite_respond_time(valid, stats.get("latency", {}))
+        print(f"  改写 respondTime：{count} 个")
 
     # 输出有效书源
     if args.output:
         output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(valid, f, ensure_ascii=False, indent=2)
+        write_json(output_path, valid)
         print(f"\n有效书源输出到：{output_path}")
 
     # 输出无效书源
     if args.invalid and invalid:
         invalid_path = Path(args.invalid)
-        invalid_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(invalid_path, "w", encoding="utf-8") as f:
-            json.dump(invalid, f, ensure_ascii=False, indent=2)
+        write_json(invalid_path, invalid)
         print(f"无效书源输出到：{invalid_path}")
 
     # 输出校验报告
     if args.report:
         report_path = Path(args.report)
-        report_path.parent.mkdir(parents=True, exist_ok=True)
 
         report = {
             "timestamp": datetime.now().isoformat(),
@@ -160,13 +579,16 @@ def main():
             "invalid": len(invalid),
             "sample": args.sample,
             "timeout": args.timeout,
-            "errors": errors
+            "errors": errors,
+            **stats
         }
+        if args.shard:
+            report["shard"] = "{}/{}".format(*args.shard)
 
-        with open(report_path, "w", encoding="utf-8") as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        write_json(report_path, report)
         print(f"校验报告输出到：{report_path}")
 
+    metrics.finish(args)
     return 0
 
 